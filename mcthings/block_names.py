@@ -0,0 +1,101 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+# Names of the legacy (id, data) blocks in the flattened Minecraft 1.13 block states
+
+UNKNOWN_BLOCK_NAME = "minecraft:stone"
+""" name used for the blocks without a known name """
+
+COLORS = ["white", "orange", "magenta", "light_blue", "yellow", "lime", "pink", "gray",
+          "light_gray", "cyan", "purple", "blue", "brown", "green", "red", "black"]
+""" colors of the blocks with a color in its data """
+
+COLORED_BLOCKS = {
+    35: "%s_wool",
+    95: "%s_stained_glass",
+    159: "%s_terracotta",
+    160: "%s_stained_glass_pane",
+    171: "%s_carpet",
+    251: "%s_concrete",
+    252: "%s_concrete_powder"
+}
+""" blocks with the color in its data """
+
+WOODS = ["oak", "spruce", "birch", "jungle", "acacia", "dark_oak"]
+
+VARIANT_BLOCKS = {
+    1: ["stone", "granite", "polished_granite", "diorite", "polished_diorite", "andesite", "polished_andesite"],
+    3: ["dirt", "coarse_dirt", "podzol"],
+    5: ["%s_planks" % wood for wood in WOODS],
+    6: ["%s_sapling" % wood for wood in WOODS],
+    12: ["sand", "red_sand"],
+    17: ["%s_log" % wood for wood in WOODS[0:4]],
+    18: ["%s_leaves" % wood for wood in WOODS[0:4]],
+    24: ["sandstone", "chiseled_sandstone", "cut_sandstone"],
+    98: ["stone_bricks", "mossy_stone_bricks", "cracked_stone_bricks", "chiseled_stone_bricks"],
+    126: ["%s_slab" % wood for wood in WOODS],
+    161: ["%s_leaves" % wood for wood in WOODS[4:6]],
+    162: ["%s_log" % wood for wood in WOODS[4:6]]
+}
+""" blocks with the variant in the lower bits of its data (the rest ones are the orientation) """
+
+BLOCKS = {
+    0: "air", 1: "stone", 2: "grass_block", 3: "dirt", 4: "cobblestone", 5: "oak_planks", 6: "oak_sapling",
+    7: "bedrock", 8: "water", 9: "water", 10: "lava", 11: "lava", 12: "sand", 13: "gravel", 14: "gold_ore",
+    15: "iron_ore", 16: "coal_ore", 17: "oak_log", 18: "oak_leaves", 19: "sponge", 20: "glass", 21: "lapis_ore",
+    22: "lapis_block", 23: "dispenser", 24: "sandstone", 25: "note_block", 26: "red_bed", 27: "powered_rail",
+    28: "detector_rail", 29: "sticky_piston", 30: "cobweb", 31: "grass", 32: "dead_bush", 33: "piston",
+    37: "dandelion", 38: "poppy", 39: "brown_mushroom", 40: "red_mushroom", 41: "gold_block", 42: "iron_block",
+    43: "smooth_stone", 44: "stone_slab", 45: "bricks", 46: "tnt", 47: "bookshelf", 48: "mossy_cobblestone",
+    49: "obsidian", 50: "torch", 51: "fire", 52: "spawner", 53: "oak_stairs", 54: "chest", 55: "redstone_wire",
+    56: "diamond_ore", 57: "diamond_block", 58: "crafting_table", 59: "wheat", 60: "farmland", 61: "furnace",
+    62: "furnace", 63: "sign", 64: "oak_door", 65: "ladder", 66: "rail", 67: "cobblestone_stairs", 68: "wall_sign",
+    69: "lever", 70: "stone_pressure_plate", 71: "iron_door", 72: "oak_pressure_plate", 73: "redstone_ore",
+    74: "redstone_ore", 75: "redstone_torch", 76: "redstone_torch", 77: "stone_button", 78: "snow", 79: "ice",
+    80: "snow_block", 81: "cactus", 82: "clay", 83: "sugar_cane", 84: "jukebox", 85: "oak_fence", 86: "pumpkin",
+    87: "netherrack", 88: "soul_sand", 89: "glowstone", 90: "nether_portal", 91: "jack_o_lantern", 92: "cake",
+    96: "oak_trapdoor", 97: "infested_stone", 98: "stone_bricks", 99: "brown_mushroom_block",
+    100: "red_mushroom_block", 101: "iron_bars", 102: "glass_pane", 103: "melon", 104: "pumpkin_stem",
+    105: "melon_stem", 106: "vine", 107: "oak_fence_gate", 108: "brick_stairs", 109: "stone_brick_stairs",
+    110: "mycelium", 111: "lily_pad", 112: "nether_bricks", 113: "nether_brick_fence", 114: "nether_brick_stairs",
+    115: "nether_wart", 116: "enchanting_table", 117: "brewing_stand", 118: "cauldron", 119: "end_portal",
+    120: "end_portal_frame", 121: "end_stone", 122: "dragon_egg", 123: "redstone_lamp", 124: "redstone_lamp",
+    125: "oak_planks", 126: "oak_slab", 127: "cocoa", 128: "sandstone_stairs", 129: "emerald_ore",
+    130: "ender_chest", 131: "tripwire_hook", 132: "tripwire", 133: "emerald_block", 134: "spruce_stairs",
+    135: "birch_stairs", 136: "jungle_stairs", 137: "command_block", 138: "beacon", 139: "cobblestone_wall",
+    140: "flower_pot", 141: "carrots", 142: "potatoes", 143: "oak_button", 144: "skeleton_skull", 145: "anvil",
+    146: "trapped_chest", 147: "light_weighted_pressure_plate", 148: "heavy_weighted_pressure_plate",
+    149: "comparator", 150: "comparator", 151: "daylight_detector", 152: "redstone_block",
+    153: "nether_quartz_ore", 154: "hopper", 155: "quartz_block", 156: "quartz_stairs", 157: "activator_rail",
+    158: "dropper", 161: "acacia_leaves", 162: "acacia_log", 163: "acacia_stairs", 164: "dark_oak_stairs",
+    165: "slime_block", 166: "barrier", 167: "iron_trapdoor", 168: "prismarine", 169: "sea_lantern",
+    170: "hay_block", 172: "terracotta", 173: "coal_block", 174: "packed_ice", 179: "red_sandstone",
+    188: "spruce_fence", 189: "birch_fence", 190: "jungle_fence", 191: "dark_oak_fence", 192: "acacia_fence",
+    193: "spruce_door", 194: "birch_door", 195: "jungle_door", 196: "acacia_door", 197: "dark_oak_door",
+    246: "obsidian", 247: "iron_block"
+}
+""" names of the blocks ids (Raspberry Pi specific ids are mapped to similar blocks) """
+
+
+def block_name(block_id, block_data=0):
+    """
+    Find the name of a legacy block. The orientation and state in the block data are not included.
+
+    :param block_id: id of the block
+    :param block_data: data of the block
+    :return: the name of the block (UNKNOWN_BLOCK_NAME if the block is not known)
+    """
+
+    if block_id in COLORED_BLOCKS:
+        return "minecraft:" + COLORED_BLOCKS[block_id] % COLORS[block_data & 0x0F]
+
+    variants = VARIANT_BLOCKS.get(block_id)
+    if variants:
+        # The number of variants defines the bits used for them
+        variant = block_data & (0x07 if len(variants) > 4 else 0x03 if len(variants) > 2 else 0x01)
+        if variant < len(variants):
+            return "minecraft:" + variants[variant]
+
+    name = BLOCKS.get(block_id)
+
+    return "minecraft:" + name if name else UNKNOWN_BLOCK_NAME
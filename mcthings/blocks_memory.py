@@ -1,12 +1,103 @@
 # Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
 # Author (©): Alvaro del Castillo
-import logging
-import math
 
+import struct
+
+import numpy as np
 from mcpi.vec3 import Vec3
 import mcpi.block
 
-from mcthings.utils import size_region, find_min_max_cuboid_vertex
+from mcthings.schematic_formats import SCHEMATIC_FORMAT, legacy_block_ids, schematic_format
+from mcthings.utils import build_schematic_nbt, size_region, find_min_max_cuboid_vertex
+
+EMPTY_BLOCK_ID = 0xFFFF
+""" Block id used in the arrays for the positions without a block """
+
+MEMORY_FILE_MAGIC = b"MCTHMEM1"
+""" First bytes of the files with a saved blocks memory """
+MEMORY_FILE_HEADER = struct.Struct("<8s3i3i")
+""" Header of the memory files: magic, origin and size. The ids (uint16) and data (uint8)
+arrays indexed [x, y, z] follow it without compression, so they can be memory mapped """
+
+ROTATIONS = {90: (0, 1), 180: (-1, 0), 270: (0, -1)}
+""" cos and sin for the valid rotation degrees """
+
+
+def rotate_xz(x, z, degrees, position):
+    """
+    Rotate x, z coordinates (ints or numpy arrays) around position
+
+    :param x: x coordinate/s
+    :param z: z coordinate/s
+    :param degrees: degrees to rotate (90, 180, 270)
+    :param position: base position from which to rotate
+    :return: rotated x, z
+    """
+
+    cos_degrees, sin_degrees = ROTATIONS[degrees]
+    x = x - position.x
+    z = z - position.z
+
+    return position.x + x * cos_degrees - z * sin_degrees, position.z + z * cos_degrees + x * sin_degrees
+
+
+def arrays_to_blocks(ids, data, origin):
+    """
+    Convert the blocks in numpy arrays indexed [x, y, z] to BlockMemory in Schematic order: x -> z -> y
+
+    :param ids: uint16 array with the blocks ids (EMPTY_BLOCK_ID for no block)
+    :param data: uint8 array with the blocks data
+    :param origin: position of the block [0, 0, 0] in the arrays
+    :return: list of BlockMemory
+    """
+
+    ids = ids.transpose(1, 2, 0)
+    data = data.transpose(1, 2, 0)
+    ys, zs, xs = np.nonzero(ids != EMPTY_BLOCK_ID)
+    block_ids = ids[ys, zs, xs].tolist()
+    block_data = data[ys, zs, xs].tolist()
+    xs = (xs + origin[0]).tolist()
+    ys = (ys + origin[1]).tolist()
+    zs = (zs + origin[2]).tolist()
+
+    return [BlockMemory(block_ids[i], block_data[i], Vec3(xs[i], ys[i], zs[i])) for i in range(0, len(block_ids))]
+
+
+def read_memory_file(file_path, mode='c'):
+    """
+    Open a memory file mapping its arrays in memory, so only the regions used are read from disk
+
+    :param file_path: path to the memory file
+    :param mode: np.memmap mode: copy on write by default, so the file is not changed
+    :return: origin tuple and the ids and data arrays (None if the memory is empty)
+    """
+
+    with open(file_path, 'rb') as memory_file:
+        header = memory_file.read(MEMORY_FILE_HEADER.size)
+
+    if len(header) < MEMORY_FILE_HEADER.size or header[:len(MEMORY_FILE_MAGIC)] != MEMORY_FILE_MAGIC:
+        raise RuntimeError("Bad memory file: %s" % file_path)
+
+    values = MEMORY_FILE_HEADER.unpack(header)
+    origin = values[1:4]
+    shape = values[4:7]
+
+    if not all(shape):
+        return origin, None, None
+
+    ids = np.memmap(file_path, dtype='<u2', mode=mode, offset=MEMORY_FILE_HEADER.size, shape=shape)
+    data = np.memmap(file_path, dtype=np.uint8, mode=mode, offset=MEMORY_FILE_HEADER.size + ids.nbytes,
+                     shape=shape)
+
+    return origin, ids, data
+
+
+def check_degrees(degrees):
+    """ Raise an error if degrees is not a valid rotation """
+    valid_degrees = [90, 180, 270]
+
+    if degrees not in valid_degrees:
+        raise RuntimeError("Invalid degrees: %s (valid: %s) " % (degrees, valid_degrees))
 
 
 class BlockMemory:
@@ -22,20 +113,74 @@ class BlocksMemory:
     Blocks memory for a Thing
     """
 
-    def __init__(self):
+    def __init__(self, final_state=False):
+        """
+        Create a blocks memory
+
+        :param final_state: keep only the last block added in each position
+        """
+
+        self.final_state = final_state
+        """ keep only the last block added in each position """
+        self._blocks = []
+        self._blocks_pos = {}
+        """ index in blocks of the last block added in each position """
+
+    @property
+    def blocks(self):
+        """ All the blocks added to the memory in order """
+        return self._blocks
 
-        self.blocks = []
+    @blocks.setter
+    def blocks(self, blocks):
+        self._blocks = []
         self._blocks_pos = {}
+        for block in blocks:
+            self.add(block)
 
     def add(self, block_memory):
         """
-        Add a new block to the memory.
+        Add a new block to the memory. The last block added in a position
+        is the one found in that position. In final state mode it replaces
+        the block overwritten.
 
         :param block_memory: memory for a block
+        :return: the block overwritten in the position or None
+        """
+
+        pos = block_memory.pos
+        key = (pos.x, pos.y, pos.z)
+        overwritten_block = None
+        index = self._blocks_pos.get(key)
+
+        if index is not None:
+            overwritten_block = self._blocks[index]
+
+        if index is not None and self.final_state:
+            self._blocks[index] = block_memory
+        else:
+            self._blocks_pos[key] = len(self._blocks)
+            self._blocks.append(block_memory)
+
+        return overwritten_block
+
+    def compact(self):
+        """
+        Remove the blocks overwritten by other blocks added later in the same position
+
         :return:
         """
 
-        self.blocks.append(block_memory)
+        indexes = sorted(self._blocks_pos.values())
+        self._blocks = [self._blocks[index] for index in indexes]
+        self._blocks_pos = {}
+        for index in range(0, len(self._blocks)):
+            pos = self._blocks[index].pos
+            self._blocks_pos[(pos.x, pos.y, pos.z)] = index
+
+    def is_empty(self):
+        """ Check if there are no blocks in the memory """
+        return not self._blocks
 
     def find_init_end_pos(self):
         """ Find the init and end cuboid positions from all the blocks in the memory """
@@ -94,6 +239,54 @@ class BlocksMemory:
 
         return equal
 
+    def _positions(self):
+        """ Positions of the blocks in memory as a numpy array with one x, y, z row per block """
+        return np.array([(block.pos.x, block.pos.y, block.pos.z) for block in self._blocks],
+                        dtype=np.int64).reshape(-1, 3)
+
+    def _move_blocks(self, positions, order=None):
+        """
+        Move the blocks to new positions. The Vec3 of the blocks are not modified,
+        so positions shared with other objects are not changed.
+
+        :param positions: numpy array with the new x, y, z row for each block
+        :param order: new order for the blocks (the last block in a position wins)
+        :return:
+        """
+
+        if order is None:
+            order = np.arange(0, len(self._blocks))
+
+        positions = positions[order].tolist()
+        blocks = [self._blocks[index] for index in order.tolist()]
+
+        self._blocks = [BlockMemory(block.id, block.data, Vec3(*pos)) for block, pos in zip(blocks, positions)]
+        self._blocks_pos = {tuple(pos): index for index, pos in enumerate(positions)}
+
+        if self.final_state:
+            # Moved blocks can overwrite other blocks
+            self.compact()
+
+    def _flip(self, axis, position):
+        """
+        Flip the blocks in memory in an axis: the blocks before position are not moved
+        and the rest ones are flipped over them.
+
+        :param axis: 0 for x, 1 for y and 2 for z
+        :param position: base position from which to flip
+        :return:
+        """
+
+        positions = self._positions()
+        coord = tuple(position)[axis]
+
+        # TODO: the flip could be done in two directions (left or right)
+        flipped = positions[:, axis] >= coord
+        positions[flipped, axis] = 2 * coord - positions[flipped, axis]
+        order = np.argsort(flipped, kind='stable') if self.final_state else None
+
+        self._move_blocks(positions, order)
+
     def flip_x(self, position):
         """
         Flip based on x-axis the blocks in memory using position as base position from which to rotate
@@ -101,13 +294,25 @@ class BlocksMemory:
         :return:
         """
 
-        for block in self.blocks:
-            # Find the x position and flip it
-            width = abs(block.pos.x - position.x)
-            # TODO: the flip could be done in two directions (left or right)
-            # This one the the flip to the right
-            x_flipped = position.x - width
-            block.pos.x = x_flipped
+        self._flip(0, position)
+
+    def flip_y(self, position):
+        """
+        Flip based on y-axis the blocks in memory using position as base position from which to rotate
+        :param position: base position from which to rotate
+        :return:
+        """
+
+        self._flip(1, position)
+
+    def flip_z(self, position):
+        """
+        Flip based on z-axis the blocks in memory using position as base position from which to rotate
+        :param position: base position from which to rotate
+        :return:
+        """
+
+        self._flip(2, position)
 
     def fill(self, fill_block):
         """
@@ -128,42 +333,26 @@ class BlocksMemory:
         :param position: base position from which to rotate
         :return:
         """
-        valid_degrees = [90, 180, 270]
-
-        if degrees not in [90, 180, 270]:
-            raise RuntimeError("Invalid degrees: %s (valid: %s) " % (degrees, valid_degrees))
 
-        cos_degrees = math.cos(math.radians(degrees))
-        sin_degrees = math.sin(math.radians(degrees))
+        check_degrees(degrees)
 
-        def rotate_x(pos_x, pos_z):
-            return pos_x * cos_degrees - pos_z * sin_degrees
+        positions = self._positions()
+        positions[:, 0], positions[:, 2] = rotate_xz(positions[:, 0], positions[:, 2], degrees, position)
 
-        def rotate_z(pos_x, pos_z):
-            return pos_z * cos_degrees + pos_x * sin_degrees
+        self._move_blocks(positions)
 
-        # Base position for the rotation
-        init_pos = position
-        rotated_blocks = []
-
-        # Rotate all blocks with respect the initial position and add them
-        for block in self.blocks:
-            b = block.id
-            d = block.data
+    def translate(self, offset):
+        """
+        Move all the blocks in memory
 
-            x = block.pos.x - init_pos.x
-            z = block.pos.z - init_pos.z
-            rotated_x = round(init_pos.x + rotate_x(x, z))
-            rotated_z = round(init_pos.z + rotate_z(x, z))
-            rotated_blocks.append(BlockMemory(b, d, Vec3(rotated_x, block.pos.y, rotated_z)))
+        :param offset: Vec3 with the blocks to move in each axis
+        :return:
+        """
 
-        # Replace all blocks in memory with the rotated ones
-        self.blocks = []
-        for rotated_block in rotated_blocks:
-            self.set_block(rotated_block.pos, rotated_block.id, rotated_block.data)
+        self._move_blocks(self._positions() + np.array(tuple(offset), dtype=np.int64))
 
     def set_block(self, pos, block_id, block_data=None):
-        self.add(BlockMemory(block_id, block_data, pos))
+        return self.add(BlockMemory(block_id, block_data, pos))
 
     def set_blocks(self, vertex, vertex_opposite, block_id):
         """ Add a cuboid with the same block for all blocks and without specific data """
@@ -182,74 +371,179 @@ class BlocksMemory:
                     block_pos = Vec3(vertex_min.x + x, vertex_min.y + y, vertex_min.z + z)
                     self.set_block(block_pos, block_id, block_data)
 
-    def _create_blocks_pos(self):
-        logging.info("Creating the memory cache with positions")
-        for block in self.blocks:
-            self._blocks_pos[str(block.pos)] = block
-        logging.info("Done memory cache with positions")
+    def set_arrays(self, init_pos, ids, data):
+        """
+        Add the blocks in numpy arrays indexed [x, y, z] from init_pos. The positions
+        with EMPTY_BLOCK_ID as id are not added.
+
+        :param init_pos: position of the block [0, 0, 0] in the arrays
+        :param ids: uint16 array with the blocks ids
+        :param data: uint8 array with the blocks data
+        :return:
+        """
+
+        for block in arrays_to_blocks(ids, data, tuple(init_pos)):
+            self.add(block)
+
+    def save(self, file_path, position=None):
+        """
+        Save the blocks to a memory file: a header with the origin and size of the blocks
+        and the uncompressed arrays with the ids and data.
+
+        :param file_path: path to the memory file
+        :param position: save the positions relative to this one (absolute if None)
+        :return:
+        """
+
+        origin = (0, 0, 0)
+        shape = (0, 0, 0)
+        if not self.is_empty():
+            init_pos, end_pos = self.find_init_end_pos()
+            ids, data = self.to_arrays(init_pos, end_pos)
+            origin = tuple(init_pos - position) if position else tuple(init_pos)
+            shape = ids.shape
+
+        with open(file_path, 'wb') as memory_file:
+            memory_file.write(MEMORY_FILE_HEADER.pack(MEMORY_FILE_MAGIC, *origin, *shape))
+            if all(shape):
+                memory_file.write(ids.astype('<u2').tobytes())
+                memory_file.write(data.tobytes())
+
+    @classmethod
+    def load(cls, file_path, position=None):
+        """
+        Create a memory with the blocks in a memory file
+
+        :param file_path: path to the memory file
+        :param position: position to which the saved positions are relative
+        :return: the new memory
+        """
+
+        memory = cls(final_state=True)
+        origin, ids, data = read_memory_file(file_path)
+
+        if ids is not None:
+            if position:
+                origin = tuple(Vec3(*origin) + position)
+            memory.set_arrays(origin, ids, data)
+
+        return memory
 
     def find_block_at_pos(self, pos):
         """
         Find a block in memory give its position
-        TODO: Improve performance
 
         :param pos: position for the block
-        :return: the block found or None
+        :return: the last block added in the position or None
         """
 
-        if not self._blocks_pos:
-            self._create_blocks_pos()
-
         block_found = None
-        if str(pos) in self._blocks_pos:
-            block_found = self._blocks_pos[str(pos)]
+        index = self._blocks_pos.get((pos.x, pos.y, pos.z))
+        if index is not None:
+            block_found = self._blocks[index]
 
         return block_found
 
+    def has_block_at_pos(self, pos):
+        """
+        Check if there is a block in memory at a given position
+
+        :param pos: position to check
+        :return: True if the position has a block
+        """
+
+        return self.find_block_at_pos(pos) is not None
+
+    def to_arrays(self, init_pos, end_pos):
+        """
+        Convert the blocks of memory inside a cuboid to numpy arrays indexed [x, y, z]
+        from init_pos. The positions without blocks have EMPTY_BLOCK_ID as id.
+
+        :param init_pos: min vertex of the cuboid
+        :param end_pos: max vertex of the cuboid
+        :return: uint16 array with blocks ids and uint8 array with blocks data
+        """
+
+        size = size_region(init_pos, end_pos)
+        ids = np.full((size.x, size.y, size.z), EMPTY_BLOCK_ID, dtype=np.uint16)
+        data = np.zeros((size.x, size.y, size.z), dtype=np.uint8)
+
+        # Only the last block in each position is in the index
+        blocks = [self._blocks[index] for index in self._blocks_pos.values()]
+        xs = np.array([block.pos.x for block in blocks], dtype=np.int64) - init_pos.x
+        ys = np.array([block.pos.y for block in blocks], dtype=np.int64) - init_pos.y
+        zs = np.array([block.pos.z for block in blocks], dtype=np.int64) - init_pos.z
+        block_ids = np.array([block.id for block in blocks], dtype=np.uint16)
+        block_data = np.array([block.data if block.data else 0 for block in blocks], dtype=np.uint8)
+
+        inside = (xs >= 0) & (xs < size.x) & (ys >= 0) & (ys < size.y) & (zs >= 0) & (zs < size.z)
+        ids[xs[inside], ys[inside], zs[inside]] = block_ids[inside]
+        data[xs[inside], ys[inside], zs[inside]] = block_data[inside]
+
+        return ids, data
+
+    def to_block_arrays(self, init_pos, end_pos):
+        """
+        Convert the blocks of memory inside a cuboid to numpy arrays indexed [x, y, z]
+        from init_pos with air in the positions without blocks
+
+        :param init_pos: min vertex of the cuboid
+        :param end_pos: max vertex of the cuboid
+        :return: uint16 array with blocks ids and uint8 array with blocks data
+        """
+
+        ids, data = self.to_arrays(init_pos, end_pos)
+
+        empty = ids == EMPTY_BLOCK_ID
+        ids[empty] = mcpi.block.AIR.id
+        data[empty] = 0
+
+        return ids, data
+
     def to_nbt(self, init_pos, end_pos):
         """
         Convert the blocks of memory to NBT format for exporting as Schematic
         The NBT must be a complete cuboid with air in the positions where
         there are no data in blocks memory.
 
-
+        :param init_pos: min vertex of the cuboid
+        :param end_pos: max vertex of the cuboid
         :return: bytearrays for blocks ids and block data
         """
 
-        size = size_region(init_pos, end_pos)
+        ids, data = self.to_block_arrays(init_pos, end_pos)
 
-        blocks_bytes = bytearray()
-        data_bytes = bytearray()
-
-        # Use the same loop than reading Schematic format: x -> z -> y
-        for y in range(0, size.y):
-            for z in range(0, size.z):
-                for x in range(0, size.x):
-                    block_data = 0
-                    block_id = mcpi.block.AIR.id
-                    block_pos = Vec3(init_pos.x + x, init_pos.y + y, init_pos.z + z)
-                    # Find if there is a block at block_pos
-                    mem_block = self.find_block_at_pos(block_pos)
-                    if mem_block:
-                        block_id = mem_block.id
-                        block_data = mem_block.data
-                    blocks_bytes.append(block_id)
-                    data_bytes.append(block_data)
+        # Schematic order is x -> z -> y
+        blocks_bytes = bytearray(legacy_block_ids(ids).transpose(1, 2, 0).tobytes())
+        data_bytes = bytearray(data.transpose(1, 2, 0).tobytes())
 
         return blocks_bytes, data_bytes
 
-    def build_schematic(self):
-        init_pos, end_pos = self.find_init_end_pos()
+    def build_schematic(self, file_format=SCHEMATIC_FORMAT, init_pos=None, end_pos=None):
+        """
+        Build the NBT object with the Schematic for the blocks in memory
+
+        :param file_format: SCHEMATIC_FORMAT, SPONGE_FORMAT or LITEMATIC_FORMAT
+        :param init_pos: min vertex of the cuboid to export (the bounding box of the blocks if None)
+        :param end_pos: max vertex of the cuboid to export
+        :return: the NBT object with the Schematic
+        """
+
+        if init_pos is None:
+            init_pos, end_pos = self.find_init_end_pos()
 
-        return self.to_nbt(init_pos, end_pos, self)
+        return build_schematic_nbt(init_pos, end_pos, memory_data=self, file_format=file_format)
 
     def to_schematic(self, file_path):
         """
-        Convert the blocks memory to a Schematic Object
+        Convert the blocks memory to a Schematic Object. The format is
+        selected from the extension: .schem, .litematic or .schematic
 
         :file_path: file in which to export the memory in Schematic format
         :return: the Schematic object
         """
 
-        self.build_schematic().write_file(file_path)
+        schematic = self.build_schematic(schematic_format(file_path))
+        schematic.write_file(file_path)
 
+        return schematic
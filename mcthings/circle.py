@@ -9,6 +9,8 @@ class Circle(Thing):
 
     radius = None
     """ radius of the Sphere """
+    uses_drawing = True
+    builds_in_memory = False
 
     def build(self):
         World.renderer.server.drawing.drawCircle(
@@ -0,0 +1,215 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import mcpi.block
+import numpy as np
+
+TERRACOTTA = mcpi.block.Block(159)
+CONCRETE = mcpi.block.Block(251)
+
+# https://gaming.stackexchange.com/questions/47212/what-are-the-color-values-for-dyed-wool
+BLOCK_COLORS = {
+    mcpi.block.WOOL.id: [
+        "e4e4e4", "ea7e35", "be49c9", "6387d2", "c2b51c", "39ba2e", "d98199", "414141",
+        "a0a7a7", "267191", "7e34bf", "253193", "56331c", "364b18", "9e2b27", "181414"
+    ],
+    mcpi.block.STAINED_GLASS.id: [
+        "ffffff", "d87f33", "b24cd8", "6699d8", "e5e533", "7fcc19", "f27fa5", "4c4c4c",
+        "999999", "4c7f99", "7f3fb2", "334cb2", "664c33", "667f33", "993333", "191919"
+    ],
+    TERRACOTTA.id: [
+        "d1b2a1", "a15325", "95586c", "716c8a", "ba8523", "677535", "a14e4e", "392a23",
+        "876b62", "575b5b", "764656", "4a3c5b", "4d3323", "4c532a", "8f3d2e", "251610"
+    ],
+    CONCRETE.id: [
+        "cfd5d6", "e06101", "a9309f", "2489c7", "f1af15", "5ea918", "d5658f", "373a3e",
+        "7d7d73", "157788", "64209c", "2d2f8f", "603c20", "495b24", "8e2121", "080a0f"
+    ]
+}
+""" RGB colors of the blocks with the color in its data (white, orange ... black) """
+
+
+def hex_to_rgb(hex_colors):
+    """
+    Convert colors in hex format to an array
+
+    :param hex_colors: list with the colors in RRGGBB[AA] hex format
+    :return: int array with the red, green and blue of each color (one row per color)
+    """
+
+    rgb = bytes.fromhex("".join(hex_color[0:6] for hex_color in hex_colors))
+
+    return np.frombuffer(rgb, dtype=np.uint8).reshape(-1, 3).astype(np.int64)
+
+
+ORDERED_DITHERING = "ordered"
+""" dithering adding a 3D Bayer matrix threshold to the colors """
+FLOYD_STEINBERG_DITHERING = "floyd-steinberg"
+""" dithering diffusing the error of each color to the next voxels """
+
+FLOYD_STEINBERG_WEIGHTS = [((1, 0, 0), 7 / 32), ((-1, 0, 1), 3 / 32), ((0, 0, 1), 5 / 32), ((1, 0, 1), 1 / 32),
+                           ((0, 1, 0), 16 / 32)]
+""" Floyd-Steinberg in 3D: half of the error goes to the next voxels in the layer and the other half to the upper one """
+
+BAYER_BASE = np.array([[[0, 6], [4, 2]], [[5, 3], [1, 7]]])
+""" order of the thresholds in a 2x2x2 cube """
+
+
+def srgb_to_lab(rgb):
+    """
+    Convert sRGB colors to CIELAB (D65 white)
+
+    :param rgb: array with the RGB colors [0-255] (one row per color)
+    :return: float array with the L, a, b of each color
+    """
+
+    linear = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(linear > 0.04045, ((linear + 0.055) / 1.055) ** 2.4, linear / 12.92)
+    xyz = linear @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                             [0.3575761, 0.7151522, 0.1191920],
+                             [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    xyz = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+
+    return np.stack((116 * xyz[:, 1] - 16, 500 * (xyz[:, 0] - xyz[:, 1]), 200 * (xyz[:, 1] - xyz[:, 2])), axis=1)
+
+
+def bayer_thresholds(positions, levels=2):
+    """
+    Thresholds of a 3D Bayer matrix for the positions
+
+    :param positions: int array with the x, y, z positions (one row per position)
+    :param levels: the matrix has 2^levels positions in each axis
+    :return: float array with a threshold in [-0.5, 0.5) for each position
+    """
+
+    thresholds = np.zeros(len(positions), dtype=np.int64)
+    for level in range(0, levels):
+        bits = (positions >> (levels - 1 - level)) & 1
+        thresholds = thresholds * 8 + BAYER_BASE[bits[:, 0], bits[:, 1], bits[:, 2]]
+
+    return thresholds / 8 ** levels - 0.5
+
+
+class ColorQuantizer:
+    """
+    Find the block with the nearest color (CIELAB distance) to RGB colors.
+
+    The nearest block is precomputed in a lookup table for all the colors
+    with the lut_bits higher bits of each RGB component, so finding it for
+    a color is just indexing the table.
+    """
+
+    def __init__(self, blocks=(mcpi.block.WOOL, CONCRETE, TERRACOTTA, mcpi.block.STAINED_GLASS), lut_bits=5):
+        """
+        Build the lookup table
+
+        :param blocks: blocks with the colors to use (BLOCK_COLORS ones)
+        :param lut_bits: bits of each RGB component used in the lookup table
+        """
+
+        self.block_ids = np.repeat(np.array([block.id for block in blocks], dtype=np.uint16), 16)
+        """ id of the candidate blocks """
+        self.block_data = np.tile(np.arange(0, 16, dtype=np.uint8), len(blocks))
+        """ data of the candidate blocks """
+        self.colors = hex_to_rgb([color for block in blocks for color in BLOCK_COLORS[block.id]])
+        """ RGB colors of the candidate blocks """
+        self.lut_bits = lut_bits
+
+        # The color used for each table entry is the center of the colors it covers
+        shift = 8 - lut_bits
+        levels = (np.arange(0, 1 << lut_bits) << shift) + (1 << shift) // 2
+        grid = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3)
+
+        self._lut = self._nearest(srgb_to_lab(grid))
+
+    def _nearest(self, lab_colors):
+        lab_candidates = srgb_to_lab(self.colors)
+        nearest = np.empty(len(lab_colors), dtype=np.uint16)
+        # Limit the memory used for the distances
+        for start in range(0, len(lab_colors), 4096):
+            lab_chunk = lab_colors[start:start + 4096]
+            distances = ((lab_chunk[:, None, :] - lab_candidates[None, :, :]) ** 2).sum(axis=2)
+            nearest[start:start + 4096] = np.argmin(distances, axis=1)
+
+        return nearest
+
+    def candidates(self, rgb):
+        """
+        Find the nearest candidate for the colors
+
+        :param rgb: int array with the RGB colors [0-255] (one row per color)
+        :return: array with the index of the candidate for each color
+        """
+
+        shift = 8 - self.lut_bits
+        rgb = np.asarray(rgb, dtype=np.int64) >> shift
+
+        return self._lut[(rgb[:, 0] << (2 * self.lut_bits)) | (rgb[:, 1] << self.lut_bits) | rgb[:, 2]]
+
+    def quantize(self, rgb):
+        """
+        Find the block with the nearest color for the colors
+
+        :param rgb: int array with the RGB colors [0-255] (one row per color)
+        :return: arrays with the block id and the block data for each color
+        """
+
+        candidates = self.candidates(rgb)
+
+        return self.block_ids[candidates], self.block_data[candidates]
+
+    def dither(self, positions, rgb, method=FLOYD_STEINBERG_DITHERING, spread=32):
+        """
+        Find the blocks for the colors of the voxels dithering them in 3D
+
+        :param positions: int array with the x, y, z positions of the voxels (one row per voxel, y up)
+        :param rgb: int array with the RGB colors [0-255] of the voxels
+        :param method: ORDERED_DITHERING or FLOYD_STEINBERG_DITHERING (slower)
+        :param spread: range of the colors changes in ordered dithering
+        :return: arrays with the block id and the block data for each voxel
+        """
+
+        positions = np.asarray(positions, dtype=np.int64)
+        rgb = np.asarray(rgb, dtype=np.float64)
+
+        if method == ORDERED_DITHERING:
+            thresholds = bayer_thresholds(positions - positions.min(axis=0))
+            return self.quantize(np.clip(np.rint(rgb + spread * thresholds[:, None]), 0, 255))
+        elif method != FLOYD_STEINBERG_DITHERING:
+            raise RuntimeError("Unknown dithering method %s" % method)
+
+        # Grid with the index of the voxel in each position to find the neighbours
+        grid_positions = positions - positions.min(axis=0)
+        shape = grid_positions.max(axis=0) + 1
+        grid = np.full(tuple(shape.tolist()), -1, dtype=np.int64)
+        grid[tuple(grid_positions.T)] = np.arange(0, len(positions))
+
+        neighbours = []
+        for offset, weight in FLOYD_STEINBERG_WEIGHTS:
+            neighbour_positions = grid_positions + np.array(offset)
+            inside = ((neighbour_positions >= 0) & (neighbour_positions < shape)).all(axis=1)
+            neighbour = np.full(len(positions), -1, dtype=np.int64)
+            neighbour[inside] = grid[tuple(neighbour_positions[inside].T)]
+            neighbours.append((neighbour, weight))
+
+        # The voxels are processed from the bottom layer, row by row. A voxel only receives error
+        # from voxels with a lower x + 2z + y, so all the voxels in each of these wavefronts are
+        # processed at once, with the same result than processing them one by one.
+        wavefronts = grid_positions[:, 0] + 2 * grid_positions[:, 2] + grid_positions[:, 1]
+        order = np.argsort(wavefronts, kind='stable')
+        bounds = np.flatnonzero(np.diff(wavefronts[order])) + 1
+
+        candidates = np.empty(len(positions), dtype=np.uint16)
+        colors = rgb.copy()
+        for voxels in np.split(order, bounds):
+            color = np.clip(colors[voxels], 0, 255)
+            candidates[voxels] = self.candidates(np.rint(color))
+            error = color - self.colors[candidates[voxels]]
+            # A voxel is the neighbour of only one voxel in the wavefront for each offset
+            for neighbour, weight in neighbours:
+                voxel_neighbours = neighbour[voxels]
+                diffused = voxel_neighbours >= 0
+                colors[voxel_neighbours[diffused]] += weight * error[diffused]
+
+        return self.block_ids[candidates], self.block_data[candidates]
@@ -42,19 +42,19 @@ class BorderDecorator(Decorator):
         init = init_pos
         end = Vec3(init_pos.x + border_width - 1, init_pos.y, init_pos.z)
         for x in range(0, border_width - 1):
-            self.set_block(Vec3(init.x + x, init.y, init.z), self.block)
+            self.set_block(Vec3(init.x + x, init.y, init.z), self.block.id, self.block.data)
 
         init = end
         end = Vec3(init.x, init.y, init.z + border_large - 1)
         for z in range(0, border_large - 1):
-            self.set_block(Vec3(init.x, init.y, init.z + z), self.block)
+            self.set_block(Vec3(init.x, init.y, init.z + z), self.block.id, self.block.data)
 
         init = end
         end = Vec3(init.x - (border_width - 1), init.y, init.z)
         for x in range(0, border_width - 1):
-            self.set_block(Vec3(init.x - x, init.y, init.z), self.block)
+            self.set_block(Vec3(init.x - x, init.y, init.z), self.block.id, self.block.data)
 
         init = end
         end = Vec3(init.x, init.y, init.z - (border_large - 1))
         for z in range(0, border_large - 1):
-            self.set_block(Vec3(init.x, init.y, init.z - z), self.block)
+            self.set_block(Vec3(init.x, init.y, init.z - z), self.block.id, self.block.data)
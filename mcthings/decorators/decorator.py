@@ -6,7 +6,7 @@ from mcpi.minecraft import Minecraft
 
 import mcpi.block
 
-from mcthings.blocks_memory import BlocksMemory
+from mcthings.sparse_blocks_memory import SparseBlocksMemory
 from mcthings.world import World
 
 
@@ -19,9 +19,11 @@ class Decorator:
 
     block = mcpi.block.AIR
     """ Base block for the decorator """
+    blocks_memory_class = SparseBlocksMemory
+    """ class used to store the blocks of this Decorator in memory """
 
     def __init__(self, thing):
-        self._blocks_memory = BlocksMemory()
+        self._blocks_memory = self.blocks_memory_class(final_state=True)
         self._thing = thing
 
     def create(self):
@@ -31,4 +31,4 @@ class LightDecorator(Decorator):
         center_pos_y = thing_start.y + math.floor((thing_end.y - thing_start.y) / 2)
         center_pos_z = thing_start.z + math.floor((thing_end.z - thing_start.z) / 2)
 
-        self.set_block(Vec3(center_pos_x, center_pos_y, center_pos_z), mcpi.block.TORCH)
+        self.set_block(Vec3(center_pos_x, center_pos_y, center_pos_z), mcpi.block.TORCH.id)
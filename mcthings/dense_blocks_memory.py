@@ -0,0 +1,346 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory, BlockMemory, EMPTY_BLOCK_ID, arrays_to_blocks, check_degrees, \
+    read_memory_file, rotate_xz
+from mcthings.utils import size_region, find_min_max_cuboid_vertex
+
+
+class DenseBlocksMemory(BlocksMemory):
+    """
+    Blocks memory stored in dense numpy arrays: one uint16 array for the
+    block ids and one uint8 array for the block data, indexed [x, y, z] from
+    the origin of the arrays. The arrays grow when blocks are added outside them.
+
+    A position only stores the last block written on it.
+    """
+
+    def __init__(self, final_state=True):
+        """
+        Create a blocks memory
+
+        :param final_state: always True, only the last block added in a position is stored
+        """
+
+        self.final_state = True
+        self._reset()
+
+    @property
+    def blocks(self):
+        """ The blocks in memory in Schematic order: x -> z -> y """
+        if self._min is None:
+            return []
+
+        ids, data = self._bounding_arrays()
+
+        return arrays_to_blocks(ids, data, self._min)
+
+    @blocks.setter
+    def blocks(self, blocks):
+        self._reset()
+        for block in blocks:
+            self.add(block)
+
+    def _reset(self):
+        """ Remove all the blocks from memory """
+        self._origin = (0, 0, 0)
+        self._ids = np.full((0, 0, 0), EMPTY_BLOCK_ID, dtype=np.uint16)
+        self._data = np.zeros((0, 0, 0), dtype=np.uint8)
+        # Bounding box of the blocks stored
+        self._min = None
+        self._max = None
+
+    def _reserve(self, vertex_min, vertex_max):
+        """
+        Grow the arrays so the cuboid from vertex_min to vertex_max fits in them.
+        The arrays are doubled in the growing axes to amortize the copies.
+
+        :param vertex_min: (x, y, z) min vertex of the cuboid
+        :param vertex_max: (x, y, z) max vertex of the cuboid
+        :return:
+        """
+
+        if self._ids.size == 0:
+            new_min = vertex_min
+            new_max = vertex_max
+        else:
+            new_min = []
+            new_max = []
+            for axis in range(0, 3):
+                array_min = self._origin[axis]
+                array_max = self._origin[axis] + self._ids.shape[axis] - 1
+                axis_min = array_min
+                axis_max = array_max
+                if vertex_min[axis] < array_min:
+                    axis_min = min(vertex_min[axis], array_min - self._ids.shape[axis])
+                if vertex_max[axis] > array_max:
+                    axis_max = max(vertex_max[axis], array_max + self._ids.shape[axis])
+                new_min.append(axis_min)
+                new_max.append(axis_max)
+
+            if tuple(new_min) == self._origin and \
+                    all(new_max[axis] - new_min[axis] + 1 == self._ids.shape[axis] for axis in range(0, 3)):
+                return
+
+        shape = tuple(new_max[axis] - new_min[axis] + 1 for axis in range(0, 3))
+        ids = np.full(shape, EMPTY_BLOCK_ID, dtype=np.uint16)
+        data = np.zeros(shape, dtype=np.uint8)
+
+        if self._ids.size != 0:
+            offset = tuple(self._origin[axis] - new_min[axis] for axis in range(0, 3))
+            region = tuple(slice(offset[axis], offset[axis] + self._ids.shape[axis]) for axis in range(0, 3))
+            ids[region] = self._ids
+            data[region] = self._data
+
+        self._origin = tuple(new_min)
+        self._ids = ids
+        self._data = data
+
+    def _update_bounding_box(self, vertex_min, vertex_max):
+        if self._min is None:
+            self._min = vertex_min
+            self._max = vertex_max
+        else:
+            self._min = tuple(min(self._min[axis], vertex_min[axis]) for axis in range(0, 3))
+            self._max = tuple(max(self._max[axis], vertex_max[axis]) for axis in range(0, 3))
+
+    def _slices(self, vertex_min, vertex_max):
+        """ Slices in the arrays for the cuboid from vertex_min to vertex_max """
+        return tuple(slice(vertex_min[axis] - self._origin[axis], vertex_max[axis] - self._origin[axis] + 1)
+                     for axis in range(0, 3))
+
+    def _bounding_arrays(self):
+        """ Views of the arrays cropped to the bounding box of the blocks """
+        region = self._slices(self._min, self._max)
+        return self._ids[region], self._data[region]
+
+    def _load_arrays(self, origin, ids, data):
+        """ Replace the memory with the arrays ids and data placed at origin """
+        self._origin = tuple(int(coord) for coord in origin)
+        self._ids = np.ascontiguousarray(ids)
+        self._data = np.ascontiguousarray(data)
+        self._min = self._max = None
+
+        occupied = np.nonzero(self._ids != EMPTY_BLOCK_ID)
+        if occupied[0].size:
+            self._min = tuple(self._origin[axis] + int(occupied[axis].min()) for axis in range(0, 3))
+            self._max = tuple(self._origin[axis] + int(occupied[axis].max()) for axis in range(0, 3))
+
+    def add(self, block_memory):
+        return self.set_block(block_memory.pos, block_memory.id, block_memory.data)
+
+    def find_init_end_pos(self):
+        if self._min is None:
+            return None, None
+
+        return Vec3(*self._min), Vec3(*self._max)
+
+    def is_cuboid(self):
+        ids, data = self._bounding_arrays()
+        return bool(np.all(ids != EMPTY_BLOCK_ID))
+
+    def memory_equal(self):
+        if self._min is None:
+            return False
+
+        ids, data = self._bounding_arrays()
+        occupied = ids != EMPTY_BLOCK_ID
+        block_ids = ids[occupied]
+        block_data = data[occupied]
+
+        return bool(np.all(block_ids == block_ids[0]) and np.all(block_data == block_data[0]))
+
+    def _flip(self, axis, position):
+        if self._min is None:
+            return
+
+        # Work with the flip axis as the first one
+        ids, data = self._bounding_arrays()
+        ids = np.moveaxis(ids, axis, 0)
+        data = np.moveaxis(data, axis, 0)
+        coord = tuple(position)[axis]
+        axis_min = self._min[axis]
+
+        # Blocks before position are not moved, the rest ones are flipped over them
+        left = min(max(coord - axis_min, 0), ids.shape[0])
+        right_ids = ids[left:][::-1]
+        right_data = data[left:][::-1]
+        flipped_min = 2 * coord - self._max[axis]
+
+        ranges = []
+        if left:
+            ranges.append((axis_min, axis_min + left - 1))
+        if right_ids.shape[0]:
+            ranges.append((flipped_min, flipped_min + right_ids.shape[0] - 1))
+        new_min = min(axis_range[0] for axis_range in ranges)
+        new_max = max(axis_range[1] for axis_range in ranges)
+
+        shape = (new_max - new_min + 1, ids.shape[1], ids.shape[2])
+        new_ids = np.full(shape, EMPTY_BLOCK_ID, dtype=np.uint16)
+        new_data = np.zeros(shape, dtype=np.uint8)
+
+        left_start = axis_min - new_min
+        new_ids[left_start:left_start + left] = ids[:left]
+        new_data[left_start:left_start + left] = data[:left]
+
+        flipped_start = flipped_min - new_min
+        flipped_region = slice(flipped_start, flipped_start + right_ids.shape[0])
+        occupied = right_ids != EMPTY_BLOCK_ID
+        new_ids[flipped_region][occupied] = right_ids[occupied]
+        new_data[flipped_region][occupied] = right_data[occupied]
+
+        origin = list(self._min)
+        origin[axis] = new_min
+        self._load_arrays(origin, np.moveaxis(new_ids, 0, axis), np.moveaxis(new_data, 0, axis))
+
+    def fill(self, fill_block):
+        occupied = self._ids != EMPTY_BLOCK_ID
+        self._ids[occupied] = fill_block.id
+        self._data[occupied] = fill_block.data
+
+    def rotate(self, degrees, position):
+        check_degrees(degrees)
+
+        if self._min is None:
+            return
+
+        ids, data = self._bounding_arrays()
+
+        # Rotating 90 degrees the x, z plane is a transpose and a flip of the arrays
+        if degrees == 90:
+            ids = np.flip(ids, 2).transpose(2, 1, 0)
+            data = np.flip(data, 2).transpose(2, 1, 0)
+        elif degrees == 180:
+            ids = np.flip(ids, (0, 2))
+            data = np.flip(data, (0, 2))
+        else:
+            ids = np.flip(ids.transpose(2, 1, 0), 2)
+            data = np.flip(data.transpose(2, 1, 0), 2)
+
+        # The new origin is the min of the rotated bounding box vertexes
+        x1, z1 = rotate_xz(self._min[0], self._min[2], degrees, position)
+        x2, z2 = rotate_xz(self._max[0], self._max[2], degrees, position)
+
+        self._load_arrays((min(x1, x2), self._min[1], min(z1, z2)), ids, data)
+
+    def translate(self, offset):
+        offset = tuple(offset)
+        self._origin = tuple(self._origin[axis] + offset[axis] for axis in range(0, 3))
+        if self._min is not None:
+            self._min = tuple(self._min[axis] + offset[axis] for axis in range(0, 3))
+            self._max = tuple(self._max[axis] + offset[axis] for axis in range(0, 3))
+
+    def set_block(self, pos, block_id, block_data=None):
+        x = pos.x - self._origin[0]
+        y = pos.y - self._origin[1]
+        z = pos.z - self._origin[2]
+        shape = self._ids.shape
+
+        if not (0 <= x < shape[0] and 0 <= y < shape[1] and 0 <= z < shape[2]):
+            vertex = (pos.x, pos.y, pos.z)
+            self._reserve(vertex, vertex)
+            x = pos.x - self._origin[0]
+            y = pos.y - self._origin[1]
+            z = pos.z - self._origin[2]
+
+        overwritten_block = None
+        if self._ids[x, y, z] != EMPTY_BLOCK_ID:
+            overwritten_block = BlockMemory(int(self._ids[x, y, z]), int(self._data[x, y, z]), Vec3(pos.x, pos.y, pos.z))
+
+        self._ids[x, y, z] = block_id
+        self._data[x, y, z] = block_data if block_data else 0
+
+        if self._min is None or not (self._min[0] <= pos.x <= self._max[0] and
+                                     self._min[1] <= pos.y <= self._max[1] and
+                                     self._min[2] <= pos.z <= self._max[2]):
+            vertex = (pos.x, pos.y, pos.z)
+            self._update_bounding_box(vertex, vertex)
+
+        return overwritten_block
+
+    def set_blocks(self, vertex, vertex_opposite, block_id):
+        vertex_min, vertex_max = find_min_max_cuboid_vertex(vertex, vertex_opposite)
+        vertex_min = (vertex_min.x, vertex_min.y, vertex_min.z)
+        vertex_max = (vertex_max.x, vertex_max.y, vertex_max.z)
+        self._reserve(vertex_min, vertex_max)
+
+        region = self._slices(vertex_min, vertex_max)
+        self._ids[region] = block_id
+        self._data[region] = 0
+        self._update_bounding_box(vertex_min, vertex_max)
+
+    def set_arrays(self, init_pos, ids, data):
+        init_pos = tuple(init_pos)
+
+        if self._min is None:
+            # Use the arrays as the memory
+            self._load_arrays(init_pos, ids, data)
+            return
+
+        vertex_max = tuple(init_pos[axis] + ids.shape[axis] - 1 for axis in range(0, 3))
+        self._reserve(init_pos, vertex_max)
+
+        region = self._slices(init_pos, vertex_max)
+        occupied = ids != EMPTY_BLOCK_ID
+        self._ids[region][occupied] = ids[occupied]
+        self._data[region][occupied] = data[occupied]
+
+        occupied = np.nonzero(occupied)
+        if occupied[0].size:
+            self._update_bounding_box(tuple(init_pos[axis] + int(occupied[axis].min()) for axis in range(0, 3)),
+                                      tuple(init_pos[axis] + int(occupied[axis].max()) for axis in range(0, 3)))
+
+    @classmethod
+    def load(cls, file_path, position=None):
+        memory = cls()
+        origin, ids, data = read_memory_file(file_path)
+
+        if ids is not None:
+            if position:
+                origin = tuple(Vec3(*origin) + position)
+            # Use the mapped arrays without reading them: the saved arrays are the bounding box
+            memory._origin = origin
+            memory._ids = ids
+            memory._data = data
+            memory._min = origin
+            memory._max = tuple(origin[axis] + ids.shape[axis] - 1 for axis in range(0, 3))
+
+        return memory
+
+    def find_block_at_pos(self, pos):
+        block_found = None
+
+        index = (pos.x - self._origin[0], pos.y - self._origin[1], pos.z - self._origin[2])
+        if all(0 <= index[axis] < self._ids.shape[axis] for axis in range(0, 3)):
+            block_id = self._ids[index]
+            if block_id != EMPTY_BLOCK_ID:
+                block_found = BlockMemory(int(block_id), int(self._data[index]), Vec3(pos.x, pos.y, pos.z))
+
+        return block_found
+
+    def is_empty(self):
+        return self._min is None
+
+    def to_arrays(self, init_pos, end_pos):
+        size = size_region(init_pos, end_pos)
+        init_pos = tuple(init_pos)
+        end_pos = tuple(end_pos)
+
+        ids = np.full((size.x, size.y, size.z), EMPTY_BLOCK_ID, dtype=np.uint16)
+        data = np.zeros((size.x, size.y, size.z), dtype=np.uint8)
+
+        # Copy the part of the arrays inside the cuboid
+        if self._min is not None:
+            vertex_min = tuple(max(init_pos[axis], self._min[axis]) for axis in range(0, 3))
+            vertex_max = tuple(min(end_pos[axis], self._max[axis]) for axis in range(0, 3))
+            if all(vertex_min[axis] <= vertex_max[axis] for axis in range(0, 3)):
+                region = self._slices(vertex_min, vertex_max)
+                out_region = tuple(slice(vertex_min[axis] - init_pos[axis], vertex_max[axis] - init_pos[axis] + 1)
+                                   for axis in range(0, 3))
+                ids[out_region] = self._ids[region]
+                data[out_region] = self._data[region]
+
+        return ids, data
@@ -12,6 +12,7 @@ class Line(Thing):
 
     width = 3
     length = 10
+    reads_world = True
 
     def create(self):
         end_x = self.position.x + self.width - 1
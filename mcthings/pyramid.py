@@ -35,10 +35,12 @@ class PyramidHollow(Thing):
     thick = 2
 
     def create(self):
+        # Both pyramids are created in the memory of the hollow pyramid, so the
+        # blocks emptied by the inner pyramid are rendered only once
         outer = Pyramid(self.position, self)
         outer.height = self.height
         outer.block = self.block
-        self.add_child(outer)
+        outer._blocks_memory = self._blocks_memory
         outer.create()
         self._end_position = outer.end_position
         inner_x = self.position.x + self.thick
@@ -47,5 +49,5 @@ class PyramidHollow(Thing):
         inner = Pyramid(Vec3(inner_x, inner_y, inner_z), self)
         inner.block = mcpi.block.AIR
         inner.height = self.height - self.thick
-        self.add_child(inner)
+        inner._blocks_memory = self._blocks_memory
         inner.create()
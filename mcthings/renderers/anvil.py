@@ -0,0 +1,303 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import mcpi.block
+import numpy as np
+from mcpi.vec3 import Vec3
+from nbt.nbt import NBTFile, TAG_Compound, TAG_List, TAG_Byte, TAG_Int, TAG_Long, TAG_Byte_Array, TAG_Int_Array
+from nbt.region import RegionFile, InconceivedChunk
+
+from mcthings.blocks_memory import EMPTY_BLOCK_ID
+from mcthings.sparse_blocks_memory import SparseBlocksMemory, SECTION_SIZE
+from mcthings.utils import find_min_max_cuboid_vertex, size_region
+
+from .renderer import Renderer
+
+ANVIL_DATA_VERSION = 1343
+""" Minecraft data version of the chunks written (1.12.2, the last one with blocks ids and data) """
+REGION_CHUNKS = 32
+""" chunks in each axis of a region """
+SECTIONS = 16
+""" sections in each chunk: the world height is 256 """
+PLAINS_BIOME = 1
+
+
+def _decode_nibbles(nibbles):
+    """ Decode an array of 4 bits values (the lower bits first) to one byte per value """
+    nibbles = np.frombuffer(bytes(nibbles), dtype=np.uint8)
+    return np.stack((nibbles & 0x0F, nibbles >> 4), axis=1).reshape(-1)
+
+
+def _encode_nibbles(values):
+    """ Encode an array of values of 4 bits in half the bytes (the lower bits first) """
+    values = values.reshape(-1).astype(np.uint8) & 0x0F
+    return bytearray((values[0::2] | (values[1::2] << 4)).tobytes())
+
+
+class _Chunk:
+    """ A chunk with its sections decoded in arrays indexed [x, y, z] """
+
+    def __init__(self, chunk_x, chunk_z, nbt_file=None):
+        self.sections = {}
+        """ ids and data arrays for each section y """
+        self.dirty = False
+        """ the chunk has changes not written to the region file yet """
+
+        if nbt_file is None:
+            nbt_file = self._create_nbt(chunk_x, chunk_z)
+        self.nbt = nbt_file
+
+        for section in self.nbt["Level"]["Sections"].tags:
+            # Sections store the blocks in y -> z -> x order
+            ids = np.frombuffer(bytes(section["Blocks"].value), dtype=np.uint8).astype(np.uint16)
+            if "Add" in section:
+                ids |= _decode_nibbles(section["Add"].value).astype(np.uint16) << 8
+            data = _decode_nibbles(section["Data"].value)
+            shape = (SECTION_SIZE, SECTION_SIZE, SECTION_SIZE)
+            self.sections[section["Y"].value] = [ids.reshape(shape).transpose(2, 0, 1).copy(),
+                                                 data.reshape(shape).transpose(2, 0, 1).copy()]
+
+    @staticmethod
+    def _create_nbt(chunk_x, chunk_z):
+        nbt_file = NBTFile()
+        nbt_file.tags.append(TAG_Int(name="DataVersion", value=ANVIL_DATA_VERSION))
+        level = TAG_Compound(name="Level")
+        level.tags.append(TAG_Int(name="xPos", value=chunk_x))
+        level.tags.append(TAG_Int(name="zPos", value=chunk_z))
+        level.tags.append(TAG_Long(name="LastUpdate", value=0))
+        level.tags.append(TAG_Long(name="InhabitedTime", value=0))
+        level.tags.append(TAG_Byte(name="V", value=1))
+        # The server must not generate or decorate the chunk
+        level.tags.append(TAG_Byte(name="TerrainPopulated", value=1))
+        level.tags.append(TAG_Byte(name="LightPopulated", value=0))
+        biomes = TAG_Byte_Array(name="Biomes")
+        biomes.value = bytearray([PLAINS_BIOME] * SECTION_SIZE * SECTION_SIZE)
+        level.tags.append(biomes)
+        height_map = TAG_Int_Array(name="HeightMap")
+        height_map.value = [0] * SECTION_SIZE * SECTION_SIZE
+        level.tags.append(height_map)
+        level.tags.append(TAG_List(name="Sections", type=TAG_Compound))
+        for list_name in ["Entities", "TileEntities"]:
+            level.tags.append(TAG_List(name=list_name, type=TAG_Compound))
+        nbt_file.tags.append(level)
+
+        return nbt_file
+
+    def section(self, section_y):
+        """ Get the arrays of a section allocating them if it does not exist yet """
+        if section_y not in self.sections:
+            shape = (SECTION_SIZE, SECTION_SIZE, SECTION_SIZE)
+            self.sections[section_y] = [np.zeros(shape, dtype=np.uint16), np.zeros(shape, dtype=np.uint8)]
+
+        return self.sections[section_y]
+
+    def to_nbt(self):
+        """ Update the chunk NBT with the sections arrays """
+
+        level = self.nbt["Level"]
+        sections = TAG_List(name="Sections", type=TAG_Compound)
+        height_map = np.zeros((SECTION_SIZE, SECTION_SIZE), dtype=np.int64)  # [x, z]
+
+        for section_y, (ids, data) in sorted(self.sections.items()):
+            section = TAG_Compound()
+            section.tags.append(TAG_Byte(name="Y", value=section_y))
+            blocks = TAG_Byte_Array(name="Blocks")
+            blocks.value = bytearray((ids.transpose(1, 2, 0) & 0xFF).astype(np.uint8).tobytes())
+            section.tags.append(blocks)
+            if (ids > 0xFF).any():
+                add = TAG_Byte_Array(name="Add")
+                add.value = _encode_nibbles(ids.transpose(1, 2, 0) >> 8)
+                section.tags.append(add)
+            block_data = TAG_Byte_Array(name="Data")
+            block_data.value = _encode_nibbles(data.transpose(1, 2, 0))
+            section.tags.append(block_data)
+            # The server computes the light again because LightPopulated is 0
+            block_light = TAG_Byte_Array(name="BlockLight")
+            block_light.value = bytearray(SECTION_SIZE ** 3 // 2)
+            section.tags.append(block_light)
+            sky_light = TAG_Byte_Array(name="SkyLight")
+            sky_light.value = bytearray([0xFF] * (SECTION_SIZE ** 3 // 2))
+            section.tags.append(sky_light)
+            sections.tags.append(section)
+
+            # Height of the highest block in each column
+            occupied = ids != mcpi.block.AIR.id
+            top = SECTION_SIZE - np.argmax(occupied[:, ::-1, :], axis=1)
+            height_map = np.where(occupied.any(axis=1), section_y * SECTION_SIZE + top, height_map)
+
+        level["Sections"] = sections
+        level["HeightMap"].value = height_map.T.reshape(-1).tolist()
+        level["LightPopulated"].value = 0
+        level["LastUpdate"].value = int(time.time())
+
+        return self.nbt
+
+
+class _Region:
+    """ A region file with the chunks loaded from it """
+
+    def __init__(self, file_path):
+        if not os.path.exists(file_path):
+            open(file_path, "wb").close()
+        self.file = RegionFile(file_path)
+        self.chunks = {}
+        """ chunks loaded with its region chunk coordinates as key """
+
+    def chunk(self, chunk_x, chunk_z):
+        """ Get a chunk loading it or creating it if it is not in the region file """
+        key = (chunk_x % REGION_CHUNKS, chunk_z % REGION_CHUNKS)
+        if key not in self.chunks:
+            try:
+                nbt_file = self.file.get_nbt(*key)
+            except InconceivedChunk:
+                nbt_file = None
+            self.chunks[key] = _Chunk(chunk_x, chunk_z, nbt_file)
+
+        return self.chunks[key]
+
+    def flush(self):
+        """ Write the changed chunks to the region file """
+        for key, chunk in self.chunks.items():
+            if chunk.dirty:
+                self.file.write_chunk(key[0], key[1], chunk.to_nbt())
+                chunk.dirty = False
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class AnvilRenderer(Renderer):
+    """
+    Renderer which writes the blocks directly in the Anvil region files of a world,
+    so big worlds can be built without a Minecraft server and loaded later by it.
+
+    The existing chunks are updated and the new ones are created. The regions used
+    are kept in memory until more than max_regions are used: then the least recently
+    used one is written to disk. Call close() to write all the changes.
+    """
+
+    def __init__(self, world_path, max_regions=4):
+        """
+        Open the world
+
+        :param world_path: directory of the world (the region files are in its region directory)
+        :param max_regions: max number of regions kept in memory
+        """
+
+        self.region_path = os.path.join(world_path, "region")
+        os.makedirs(self.region_path, exist_ok=True)
+        self.max_regions = max_regions
+        self.player_pos = Vec3(0, 0, 0)
+        """ position returned for all the entities """
+        self._regions = OrderedDict()
+
+    def _region(self, region_x, region_z):
+        """ Get a region from the cache writing the least recently used one if the cache is full """
+
+        key = (region_x, region_z)
+        if key in self._regions:
+            self._regions.move_to_end(key)
+        else:
+            if len(self._regions) >= self.max_regions:
+                evicted_key, evicted = self._regions.popitem(last=False)
+                evicted.close()
+            self._regions[key] = _Region(os.path.join(self.region_path, "r.%i.%i.mca" % key))
+
+        return self._regions[key]
+
+    def _chunk(self, chunk_x, chunk_z):
+        return self._region(chunk_x // REGION_CHUNKS, chunk_z // REGION_CHUNKS).chunk(chunk_x, chunk_z)
+
+    def render(self, blocks_memory):
+        if blocks_memory.is_empty():
+            return
+
+        if not isinstance(blocks_memory, SparseBlocksMemory):
+            # Split the blocks in sections of the same size than the chunk ones
+            init_pos, end_pos = blocks_memory.find_init_end_pos()
+            sections_memory = SparseBlocksMemory()
+            sections_memory.set_arrays(init_pos, *blocks_memory.to_arrays(init_pos, end_pos))
+            blocks_memory = sections_memory
+
+        # Walk the sections by chunk so each chunk is found once
+        for section in sorted(blocks_memory.iter_sections(), key=lambda section: (section.key[0], section.key[2])):
+            section_x, section_y, section_z = section.key
+            if not 0 <= section_y < SECTIONS:
+                logging.warning("Blocks out of the world height in section %s not rendered", section.key)
+                continue
+
+            chunk = self._chunk(section_x, section_z)
+            ids, data = chunk.section(section_y)
+            occupied = section.ids != EMPTY_BLOCK_ID
+            ids[occupied] = section.ids[occupied]
+            data[occupied] = section.data[occupied]
+            chunk.dirty = True
+
+    def flush(self):
+        """ Write all the changes to the region files """
+        for region in self._regions.values():
+            region.flush()
+
+    def close(self):
+        """ Write all the changes and close the region files """
+        for region in self._regions.values():
+            region.close()
+        self._regions.clear()
+
+    def get_block(self, pos):
+        return self.get_block_with_data(pos).id
+
+    def get_block_with_data(self, pos):
+        ids, data = self.get_region(pos, pos)
+
+        return mcpi.block.Block(int(ids[0, 0, 0]), int(data[0, 0, 0]))
+
+    def get_region(self, init_pos, end_pos):
+        """
+        Get the blocks in a cuboid
+
+        :param init_pos: a vertex of the cuboid
+        :param end_pos: the opposite vertex of the cuboid
+        :return: uint16 array with blocks ids and uint8 array with blocks data indexed [x, y, z] from the min vertex
+        """
+
+        vertex_min, vertex_max = find_min_max_cuboid_vertex(init_pos, end_pos)
+        size = size_region(vertex_min, vertex_max)
+        ids = np.zeros((size.x, size.y, size.z), dtype=np.uint16)
+        data = np.zeros((size.x, size.y, size.z), dtype=np.uint8)
+        vertex_min = tuple(vertex_min)
+        vertex_max = tuple(vertex_max)
+
+        for chunk_x in range(vertex_min[0] // SECTION_SIZE, vertex_max[0] // SECTION_SIZE + 1):
+            for chunk_z in range(vertex_min[2] // SECTION_SIZE, vertex_max[2] // SECTION_SIZE + 1):
+                chunk = self._chunk(chunk_x, chunk_z)
+                for section_y, (section_ids, section_data) in chunk.sections.items():
+                    section_init = (chunk_x * SECTION_SIZE, section_y * SECTION_SIZE, chunk_z * SECTION_SIZE)
+                    region_min = tuple(max(vertex_min[axis], section_init[axis]) for axis in range(0, 3))
+                    region_max = tuple(min(vertex_max[axis], section_init[axis] + SECTION_SIZE - 1)
+                                       for axis in range(0, 3))
+                    if any(region_min[axis] > region_max[axis] for axis in range(0, 3)):
+                        continue
+                    region = tuple(slice(region_min[axis] - section_init[axis],
+                                         region_max[axis] - section_init[axis] + 1) for axis in range(0, 3))
+                    out_region = tuple(slice(region_min[axis] - vertex_min[axis],
+                                             region_max[axis] - vertex_min[axis] + 1) for axis in range(0, 3))
+                    ids[out_region] = section_ids[region]
+                    data[out_region] = section_data[region]
+
+        return ids, data
+
+    def get_blocks(self, init_pos, end_pos):
+        ids, data = self.get_region(init_pos, end_pos)
+
+        # Same order than the Minecraft server: y -> x -> z
+        return ids.transpose(1, 0, 2).reshape(-1).tolist()
+
+    def get_pos(self, entity):
+        return self.player_pos
@@ -0,0 +1,124 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import asyncio
+import logging
+
+import mcpi.block
+from mcpi.connection import RequestError
+from mcpi.util import flatten_parameters_to_bytestring
+from mcpi.vec3 import Vec3
+
+from .async_renderer import AsyncRenderer
+from .cuboids_planner import plan_cuboids, RenderStats
+
+
+class AsyncRaspberryPi(AsyncRenderer):
+    """
+    Renderer implemented with an asyncio client of the Raspberry Pi Python API
+    https://www.stuffaboutcode.com/p/minecraft-api-reference.html
+
+    The commands of a render are written without waiting for the server, and
+    the connection is drained every drain_size commands.
+    """
+
+    def __init__(self, host="localhost", port=4711, stats_hook=None, drain_size=1000):
+        """
+        Create the renderer. It must be connected with connect() before using it.
+
+        :param host: Minecraft server host
+        :param port: Minecraft server port
+        :param stats_hook: function called with the RenderStats of each render
+        :param drain_size: commands written before waiting for the connection to send them
+        """
+
+        self.host = host
+        self.port = port
+        self.drain_size = drain_size
+
+        self.stats = RenderStats()
+        """ stats for all the renders done """
+        self.stats_hook = stats_hook
+        """ function called with the RenderStats of each render """
+
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    async def connect(self):
+        """ Open the connection with the server """
+
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        # Only one request at a time, so each answer is read by its request
+        self._lock = asyncio.Lock()
+
+        return self
+
+    async def close(self):
+        """ Close the connection with the server """
+
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    def _send(self, command, *args):
+        self._writer.write(b"".join([command, b"(", flatten_parameters_to_bytestring(args), b")\n"]))
+
+    async def _request(self, command, *args):
+        """ Send a command and return its answer """
+
+        async with self._lock:
+            self._send(command, *args)
+            await self._writer.drain()
+            answer = (await self._reader.readline()).decode("cp437").rstrip("\n")
+
+        if answer == "Fail":
+            raise RequestError("%s failed" % command.decode("cp437"))
+
+        return answer
+
+    async def render(self, blocks_memory):
+        """ Render the memory with one command for each cuboid of the same block found in it """
+
+        # Planning is CPU work: do it out of the event loop
+        cuboids = await asyncio.get_running_loop().run_in_executor(None, plan_cuboids, blocks_memory)
+
+        async with self._lock:
+            for i, cuboid in enumerate(cuboids, 1):
+                init_pos = cuboid.init_pos
+                end_pos = cuboid.end_pos
+                if cuboid.size() == 1:
+                    self._send(b"world.setBlock", init_pos.x, init_pos.y, init_pos.z, cuboid.id, cuboid.data)
+                else:
+                    self._send(b"world.setBlocks", init_pos.x, init_pos.y, init_pos.z,
+                               end_pos.x, end_pos.y, end_pos.z, cuboid.id, cuboid.data)
+                if i % self.drain_size == 0:
+                    await self._writer.drain()
+            await self._writer.drain()
+
+        stats = RenderStats(sum(cuboid.size() for cuboid in cuboids), len(cuboids))
+        self.stats.add(stats)
+        logging.debug("Rendered %i blocks with %i commands (%i saved)", stats.blocks, stats.commands, stats.saved)
+        if self.stats_hook:
+            self.stats_hook(stats)
+
+    async def post_to_chat(self, message):
+        async with self._lock:
+            self._send(b"chat.post", message)
+            await self._writer.drain()
+
+    async def get_block(self, pos):
+        return int(await self._request(b"world.getBlock", pos.x, pos.y, pos.z))
+
+    async def get_block_with_data(self, pos):
+        answer = await self._request(b"world.getBlockWithData", pos.x, pos.y, pos.z)
+        return mcpi.block.Block(*[int(value) for value in answer.split(",")])
+
+    async def get_blocks(self, init_pos, end_pos):
+        answer = await self._request(b"world.getBlocks", init_pos.x, init_pos.y, init_pos.z,
+                                     end_pos.x, end_pos.y, end_pos.z)
+        return [int(block_id) for block_id in answer.split(",")]
+
+    async def get_pos(self, entity):
+        entity_id = int(await self._request(b"world.getPlayerId", entity))
+        answer = await self._request(b"entity.getTile", entity_id)
+        return Vec3(*[int(float(coord)) for coord in answer.split(",")])
@@ -0,0 +1,97 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import asyncio
+
+from .renderer import Renderer
+
+
+class AsyncRenderer:
+    """
+    Base class for the McThings Renderers with an asyncio API
+
+    The methods are the same than the Renderer ones but they are coroutines,
+    so the program can do other work while the renderer waits for the engine.
+    """
+
+    async def render(self, blocks_memory):
+        """
+        Render the blocks included in the memory
+
+        :param blocks_memory: memory with the blocks to be rendered
+        :return:
+        """
+
+    async def post_to_chat(self, message):
+        """
+        Send a message to the chat in the renderer it it exists
+        :param message:
+        :return:
+        """
+
+    async def get_block(self, position):
+        """
+        Get the rendered block at the given position
+        :param position:
+        :return: int with the block id
+        """
+
+    async def get_block_with_data(self, position):
+        """
+        Get the rendered block at the given position
+        :param position:
+        :return: mcpi.block.Block with the id and data
+        """
+
+    async def get_blocks(self, init_pos, end_pos):
+        """
+        Get the rendered cuboid at init_pos and end_pos
+        :param init_pos:
+        :param end_pos:
+        :return:
+        """
+
+    async def get_pos(self, entity):
+        """
+        Get the position of the entity in the World
+        :param entity:
+        :return: the position in Vec3 format
+        """
+
+
+class SyncRenderer(Renderer):
+    """
+    Renderer which runs the methods of an AsyncRenderer in its event loop and waits for
+    them, so the code using the Renderer API can use an AsyncRenderer. It must be used
+    from other threads than the event loop one.
+    """
+
+    def __init__(self, async_renderer, loop):
+        """
+        :param async_renderer: the AsyncRenderer
+        :param loop: the event loop in which the AsyncRenderer is used
+        """
+
+        self.async_renderer = async_renderer
+        self.loop = loop
+
+    def _wait(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def render(self, blocks_memory):
+        return self._wait(self.async_renderer.render(blocks_memory))
+
+    def post_to_chat(self, message):
+        return self._wait(self.async_renderer.post_to_chat(message))
+
+    def get_block(self, position):
+        return self._wait(self.async_renderer.get_block(position))
+
+    def get_block_with_data(self, position):
+        return self._wait(self.async_renderer.get_block_with_data(position))
+
+    def get_blocks(self, init_pos, end_pos):
+        return self._wait(self.async_renderer.get_blocks(init_pos, end_pos))
+
+    def get_pos(self, entity):
+        return self._wait(self.async_renderer.get_pos(entity))
@@ -0,0 +1,171 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import EMPTY_BLOCK_ID
+from mcthings.sparse_blocks_memory import SparseBlocksMemory, SECTION_SIZE
+from mcthings.utils import size_region
+
+
+class Cuboid:
+    """ A filled cuboid with the same block in all its positions """
+
+    def __init__(self, init_pos, end_pos, block_id, block_data):
+        self.init_pos = init_pos
+        """ min vertex of the cuboid """
+        self.end_pos = end_pos
+        """ max vertex of the cuboid """
+        self.id = block_id
+        self.data = block_data
+
+    def size(self):
+        """ Number of blocks in the cuboid """
+        return (self.end_pos.x - self.init_pos.x + 1) * \
+               (self.end_pos.y - self.init_pos.y + 1) * \
+               (self.end_pos.z - self.init_pos.z + 1)
+
+
+class RenderStats:
+    """ Statistics about the commands used to render a memory """
+
+    def __init__(self, blocks=0, commands=0):
+        self.blocks = blocks
+        """ blocks rendered """
+        self.commands = commands
+        """ commands sent to render the blocks """
+
+    @property
+    def saved(self):
+        """ commands saved compared to rendering block by block """
+        return self.blocks - self.commands
+
+    def add(self, stats):
+        """ Accumulate the stats from other render """
+        self.blocks += stats.blocks
+        self.commands += stats.commands
+
+
+EMPTY_KEY = 1 << 24
+""" key of the positions without block: bigger than all the id and data keys """
+
+
+def _merge_boxes(same, pos):
+    """
+    Merge the boxes with the same values which are consecutive along an axis
+
+    :param same: int array with the values which must be equal in the merged boxes (one row per box)
+    :param pos: int array with the position of each box in the axis (boxes with one block in the axis)
+    :return: index of the first box of each merged box and the end position of the merged box in the axis
+    """
+
+    order = np.lexsort((pos,) + tuple(same.T[::-1]))
+    same = same[order]
+    pos = pos[order]
+
+    new_box = np.ones(len(pos), dtype=bool)
+    new_box[1:] = (same[1:] != same[:-1]).any(axis=1) | (pos[1:] != pos[:-1] + 1)
+    starts = np.flatnonzero(new_box)
+    ends = np.append(starts[1:] - 1, len(pos) - 1)
+
+    return order[starts], pos[ends]
+
+
+def find_cuboids(ids, data, origin):
+    """
+    Split the blocks in the arrays in filled cuboids of the same block. The runs of
+    the same block in the x axis are found first, then the equal runs consecutive in
+    the z axis are merged in rectangles, and then the equal rectangles consecutive in
+    the y axis are merged in cuboids. All the steps work on whole arrays, so noisy
+    memories with almost one cuboid per block are split fast too.
+
+    :param ids: uint16 array indexed [x, y, z] with the blocks ids (EMPTY_BLOCK_ID for no block)
+    :param data: uint8 array indexed [x, y, z] with the blocks data
+    :param origin: position of the block [0, 0, 0] in the arrays
+    :return: list of Cuboid
+    """
+
+    keys = (ids.astype(np.uint32) << 8) | data
+    keys[ids == EMPTY_BLOCK_ID] = EMPTY_KEY
+    size_x, size_y, size_z = ids.shape
+
+    # Runs in the x axis: the rows are the [y, z] positions
+    rows = np.ascontiguousarray(keys.transpose(1, 2, 0)).reshape(-1, size_x)
+    starts = np.ones(rows.shape, dtype=bool)
+    starts[:, 1:] = rows[:, 1:] != rows[:, :-1]
+    ends = np.ones(rows.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    run_rows, x0 = np.nonzero(starts)
+    x1 = np.nonzero(ends)[1]
+    run_keys = rows[run_rows, x0].astype(np.int64)
+
+    blocks = run_keys != EMPTY_KEY
+    run_rows, x0, x1, run_keys = run_rows[blocks], x0[blocks], x1[blocks], run_keys[blocks]
+    if not run_keys.size:
+        return []
+    y, z = np.divmod(run_rows, size_z)
+
+    # Rectangles with the runs consecutive in the z axis
+    first, z1 = _merge_boxes(np.stack((y, x0, x1, run_keys), axis=1), z)
+    y, x0, x1, z0, run_keys = y[first], x0[first], x1[first], z[first], run_keys[first]
+
+    # Cuboids with the rectangles consecutive in the y axis
+    first, y1 = _merge_boxes(np.stack((x0, x1, z0, z1, run_keys), axis=1), y)
+    x0, x1, z0, z1, y0, run_keys = x0[first], x1[first], z0[first], z1[first], y[first], run_keys[first]
+
+    # Cuboids in x -> z -> y order
+    order = np.lexsort((x0, z0, y0))
+    cuboids_values = zip((x0[order] + origin.x).tolist(), (y0[order] + origin.y).tolist(),
+                       (z0[order] + origin.z).tolist(), (x1[order] + origin.x).tolist(),
+                       (y1[order] + origin.y).tolist(), (z1[order] + origin.z).tolist(),
+                       (run_keys[order] >> 8).tolist(), (run_keys[order] & 0xFF).tolist())
+
+    return [Cuboid(Vec3(init_x, init_y, init_z), Vec3(end_x, end_y, end_z), block_id, block_data)
+            for init_x, init_y, init_z, end_x, end_y, end_z, block_id, block_data in cuboids_values]
+
+
+def split_cuboids(cuboids, parts):
+    """
+    Split the cuboids in groups of consecutive cuboids along the x axis with a
+    similar number of cuboids in each group, so each group covers its own region.
+
+    :param cuboids: list of Cuboid
+    :param parts: number of groups
+    :return: list with the lists of Cuboid for each group
+    """
+
+    cuboids = sorted(cuboids, key=lambda cuboid: (cuboid.init_pos.x, cuboid.init_pos.z, cuboid.init_pos.y))
+    group_size = -(-len(cuboids) // parts)  # ceil
+
+    return [cuboids[i:i + group_size] for i in range(0, len(cuboids), group_size)] if cuboids else []
+
+
+def plan_cuboids(blocks_memory):
+    """
+    Split the blocks in memory in filled cuboids of the same block, so they can be
+    rendered with one command per cuboid. Sparse memories with a bounding box much
+    bigger than their sections are split section by section.
+
+    :param blocks_memory: memory with the blocks to be rendered
+    :return: list of Cuboid
+    """
+
+    cuboids = []
+
+    if blocks_memory.is_empty():
+        return cuboids
+
+    init_pos, end_pos = blocks_memory.find_init_end_pos()
+
+    if isinstance(blocks_memory, SparseBlocksMemory):
+        size = size_region(init_pos, end_pos)
+        sections = list(blocks_memory.iter_sections())
+        if size.x * size.y * size.z > 2 * len(sections) * SECTION_SIZE ** 3:
+            for section in sections:
+                cuboids += find_cuboids(section.ids, section.data, section.position)
+            return cuboids
+
+    ids, data = blocks_memory.to_arrays(init_pos, end_pos)
+
+    return find_cuboids(ids, data, init_pos)
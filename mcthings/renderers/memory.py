@@ -0,0 +1,108 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+
+import mcpi.block
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import EMPTY_BLOCK_ID
+from mcthings.sparse_blocks_memory import SparseBlocksMemory
+from mcthings.utils import find_min_max_cuboid_vertex
+
+from .cuboids_planner import plan_cuboids, RenderStats
+from .renderer import Renderer
+
+
+class MemoryRenderer(Renderer):
+    """
+    Renderer which keeps the world in memory, split in sections of blocks.
+
+    It works like a Minecraft server without the network: the positions never
+    rendered are air, and reading blocks returns the same values and order than
+    the Raspberry Pi API. It is useful for testing and for measuring renders.
+    """
+
+    def __init__(self, stats_hook=None, plan=False):
+        """
+        Create an empty world
+
+        :param stats_hook: function called with the RenderStats of each render
+        :param plan: find the commands needed to render each memory with the cuboids planner
+        """
+
+        self.world = SparseBlocksMemory()
+        """ the blocks rendered """
+        self.player_pos = Vec3(0, 0, 0)
+        """ position returned for all the entities """
+        self.chat = []
+        """ messages posted to the chat """
+        self.plan = plan
+
+        self.stats = RenderStats()
+        """ stats for all the renders done (one command per block if the planner is not used) """
+        self.stats_hook = stats_hook
+        """ function called with the RenderStats of each render """
+
+    def render(self, blocks_memory):
+        if blocks_memory.is_empty():
+            return
+
+        if isinstance(blocks_memory, SparseBlocksMemory):
+            blocks = 0
+            for section in blocks_memory.iter_sections():
+                self.world.set_arrays(section.position, section.ids, section.data)
+                blocks += section.count()
+        else:
+            init_pos, end_pos = blocks_memory.find_init_end_pos()
+            ids, data = blocks_memory.to_arrays(init_pos, end_pos)
+            self.world.set_arrays(init_pos, ids, data)
+            blocks = int(np.count_nonzero(ids != EMPTY_BLOCK_ID))
+
+        commands = len(plan_cuboids(blocks_memory)) if self.plan else blocks
+        stats = RenderStats(blocks, commands)
+        self.stats.add(stats)
+        logging.debug("Rendered %i blocks with %i commands (%i saved)", stats.blocks, stats.commands, stats.saved)
+        if self.stats_hook:
+            self.stats_hook(stats)
+
+    def post_to_chat(self, message):
+        self.chat.append(message)
+
+    def get_block(self, pos):
+        return self.get_block_with_data(pos).id
+
+    def get_block_with_data(self, pos):
+        block = self.world.find_block_at_pos(Vec3(int(pos.x), int(pos.y), int(pos.z)))
+        if block is None:
+            return mcpi.block.Block(mcpi.block.AIR.id, 0)
+
+        return mcpi.block.Block(block.id, block.data)
+
+    def get_region(self, init_pos, end_pos):
+        """
+        Get the rendered blocks in a cuboid
+
+        :param init_pos: a vertex of the cuboid
+        :param end_pos: the opposite vertex of the cuboid
+        :return: uint16 array with blocks ids and uint8 array with blocks data indexed [x, y, z] from the min vertex
+        """
+
+        vertex_min, vertex_max = find_min_max_cuboid_vertex(init_pos, end_pos)
+        ids, data = self.world.to_arrays(vertex_min, vertex_max)
+
+        empty = ids == EMPTY_BLOCK_ID
+        ids[empty] = mcpi.block.AIR.id
+        data[empty] = 0
+
+        return ids, data
+
+    def get_blocks(self, init_pos, end_pos):
+        ids, data = self.get_region(init_pos, end_pos)
+
+        # The server returns the blocks in y -> x -> z order
+        return ids.transpose(1, 0, 2).reshape(-1).tolist()
+
+    def get_pos(self, entity):
+        return self.player_pos
@@ -2,13 +2,15 @@
 # Author (©): Alvaro del Castillo
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import mcpi
 from mcpi.minecraft import Minecraft
+from mcpi.util import flatten_parameters_to_bytestring
 from minecraftstuff import MinecraftDrawing
 
+from .cuboids_planner import plan_cuboids, split_cuboids, RenderStats
 from .renderer import Renderer
-from mcthings.blocks_memory import BlocksMemory
 
 
 class _Server:
@@ -18,13 +20,17 @@ class _Server:
     Every World must have a Server in which built the World.
     """
 
-    def __init__(self, host="localhost", port="4711"):
+    def __init__(self, host="localhost", port="4711", batch_size=0):
         self._host = host
         self._port = port
 
         self._mc = Minecraft.create(address=host, port=port)
         self._drawing = MinecraftDrawing(self._mc)
 
+        self.batch_size = batch_size
+        """ commands buffered before sending them together (0 to send them one by one) """
+        self._buffer = []
+
     @property
     def drawing(self):
         """ Connection to MinecraftDrawing (only used in Things built with MinecraftDrawing)"""
@@ -35,58 +41,138 @@ class _Server:
         """ Connection to Minecraft """
         return self._mc
 
+    def send(self, command, *args):
+        """
+        Send a command without answer to the server. If batch_size is set, the commands
+        are buffered and sent together with flush().
+
+        :param command: bytes with the command name (i.e. b"world.setBlock")
+        :param args: arguments for the command
+        :return:
+        """
+
+        line = b"".join([command, b"(", flatten_parameters_to_bytestring(args), b")\n"])
+
+        if not self.batch_size:
+            self._mc.conn._send(line)
+        else:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Send all the buffered commands to the server with a single write.
+        It must be called before reading from the server so the reads see the writes.
+
+        :return:
+        """
+
+        if self._buffer:
+            self._mc.conn._send(b"".join(self._buffer))
+            self._buffer = []
+
+    def sync(self):
+        """
+        Wait until the server has executed all the commands sent in this connection
+
+        :return:
+        """
+
+        self.flush()
+        # The answer to a query arrives after the previous commands are executed
+        self._mc.getBlock(0, 0, 0)
+
 
 class RaspberryPi(Renderer):
     """
     Renderer implemented using the Raspberry Pi Python API
     https://www.stuffaboutcode.com/p/minecraft-api-reference.html
 
+    With several connections, each memory is split in regions rendered
+    in parallel, one for each connection.
     """
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, stats_hook=None, batch_size=1000, connections=1):
         try:
-            self.server = _Server(host, port)
+            self.servers = [_Server(host, port, batch_size) for i in range(0, connections)]
+            """ pool of connections to the server """
         except mcpi.connection.RequestError:
             logging.error("Can't connect to Minecraft/Minetest server %s:%s" % (host, port))
             sys.exit(1)
 
-    def render_cuboid_memory(self, memory):
-        """ Render a memory with all blocks equal in a filled cuboid """
-        block = memory.blocks[0]
-
-        init_pos, end_pos = memory.find_init_end_pos()
-
-        self.server.mc.setBlocks(init_pos.x, init_pos.y, init_pos.z,
-                                 end_pos.x, end_pos.y, end_pos.z,
-                                 block.id)
-
-    def render_memory(self, memory):
-        """ Render memory """
+        self.server = self.servers[0]
+        """ connection used for reading from the server and for MinecraftDrawing """
+        self._workers = None
+        if connections > 1:
+            self._workers = ThreadPoolExecutor(max_workers=connections)
+
+        self.stats = RenderStats()
+        """ stats for all the renders done """
+        self.stats_hook = stats_hook
+        """ function called with the RenderStats of each render """
+
+    def render_cuboid(self, cuboid, server=None):
+        """ Render a filled cuboid of the same block using server (default to the main connection) """
+        init_pos = cuboid.init_pos
+        end_pos = cuboid.end_pos
+        server = server if server else self.server
+
+        if cuboid.size() == 1:
+            server.send(b"world.setBlock", init_pos.x, init_pos.y, init_pos.z, cuboid.id, cuboid.data)
+        else:
+            server.send(b"world.setBlocks",
+                        init_pos.x, init_pos.y, init_pos.z,
+                        end_pos.x, end_pos.y, end_pos.z,
+                        cuboid.id, cuboid.data)
 
-        for block in memory.blocks:
-            if block.data is not None:
-                self.server.mc.setBlock(block.pos.x, block.pos.y, block.pos.z, block.id, block.data)
-            else:
-                self.server.mc.setBlock(block.pos.x, block.pos.y, block.pos.z, block.id)
+    def _render_cuboids(self, cuboids, server):
+        """ Render cuboids using server and wait until the server executes them """
+        for cuboid in cuboids:
+            self.render_cuboid(cuboid, server)
+        server.sync()
 
     def render(self, blocks_memory):
-        if blocks_memory.memory_equal() and blocks_memory.is_cuboid():
-            self.render_cuboid_memory(blocks_memory)
+        """ Render the memory with one command for each cuboid of the same block found in it """
+
+        cuboids = plan_cuboids(blocks_memory)
+
+        if self._workers and cuboids:
+            # Each connection renders its own region. All must finish before
+            # rendering the next memory so the render order is kept.
+            groups = split_cuboids(cuboids, len(self.servers))
+            renders = [self._workers.submit(self._render_cuboids, groups[i], self.servers[i])
+                       for i in range(0, len(groups))]
+            for render in renders:
+                render.result()
         else:
-            self.render_memory(blocks_memory)
+            for cuboid in cuboids:
+                self.render_cuboid(cuboid)
+            self.server.flush()
+
+        stats = RenderStats(sum(cuboid.size() for cuboid in cuboids), len(cuboids))
+        self.stats.add(stats)
+        logging.debug("Rendered %i blocks with %i commands (%i saved)", stats.blocks, stats.commands, stats.saved)
+        if self.stats_hook:
+            self.stats_hook(stats)
 
     def post_to_chat(self, message):
+        self.server.flush()
         self.server.mc.postToChat(message)
 
     def get_block(self, pos):
+        self.server.flush()
         return self.server.mc.getBlock(pos.x, pos.y, pos.z)
 
     def get_block_with_data(self, pos):
+        self.server.flush()
         return self.server.mc.getBlockWithData(pos.x, pos.y, pos.z)
 
     def get_blocks(self, init_pos, end_pos):
+        self.server.flush()
         return self.server.mc.getBlocks(init_pos.x, init_pos.y, init_pos.z, end_pos.x, end_pos.y, end_pos.z)
 
     def get_pos(self, entity):
+        self.server.flush()
         return self.server.mc.entity.getTilePos(
             self.server.mc.getPlayerEntityId(entity))
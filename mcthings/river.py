@@ -13,6 +13,7 @@ class River(Thing):
     width = 2
     depth = 1
     block = mcpi.block.WATER_FLOWING
+    reads_world = True
 
     def create(self):
         init_x = self.position.x
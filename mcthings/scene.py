@@ -2,15 +2,68 @@
 # Author (©): Alvaro del Castillo
 
 # TODO: at some point this must be a real Singleton
+import asyncio
 import pickle
 
 from mcpi.vec3 import Vec3
 
-from mcthings.blocks_memory import BlocksMemory
-from mcthings.utils import build_schematic_nbt
+from mcthings.renderers.async_renderer import SyncRenderer
+from mcthings.schematic_formats import schematic_format
+from mcthings.sparse_blocks_memory import SparseBlocksMemory
+from mcthings.utils import build_schematic_nbt, merge_boxes
 from mcthings.world import World
 
 
+async def build_things_async(things, renderer, executor=None):
+    """
+    Build things concurrently with an AsyncRenderer. The things are created in the
+    executor threads while the things already created are rendered. The things are
+    rendered in order, and the things which read the world (reads_world) or not built
+    in memory (builds_in_memory) wait for the things before them to be rendered.
+
+    While building, World.renderer runs the renderer methods so the things can use it.
+    The things drawing with MinecraftDrawing (uses_drawing) can't be built.
+
+    :param things: the things to build in order
+    :param renderer: the AsyncRenderer
+    :param executor: concurrent.futures.Executor for creating the things (the default one if None)
+    :return:
+    """
+
+    # Check it before building any thing
+    for thing in things:
+        if thing.uses_drawing:
+            raise RuntimeError("%s uses MinecraftDrawing and it can't be built with an AsyncRenderer"
+                               % type(thing).__name__)
+
+    loop = asyncio.get_running_loop()
+
+    async def build_thing(thing, previous_render):
+        if not thing.builds_in_memory:
+            if previous_render:
+                await previous_render
+            await loop.run_in_executor(executor, thing.build)
+            return
+
+        if thing.reads_world and previous_render:
+            await previous_render
+        await loop.run_in_executor(executor, thing.create)
+
+        if previous_render:
+            await previous_render
+        await thing.render_async(renderer)
+
+    world_renderer = World.renderer
+    World.renderer = SyncRenderer(renderer, loop)
+    try:
+        builds = []
+        for thing in things:
+            builds.append(loop.create_task(build_thing(thing, builds[-1] if builds else None)))
+        await asyncio.gather(*builds)
+    finally:
+        World.renderer = world_renderer
+
+
 class Scene:
     """
     A scene is a container for all the things built using McThings.
@@ -28,6 +81,8 @@ class Scene:
         """ map with the things in the scene """
         self._decorators = []
         """ decorators for the scene """
+        self._decorations = []
+        """ decorators applied with decorate(), with the blocks they rendered """
         self._position = None
         """ position in the world of the scene """
         self._end_position = None
@@ -65,7 +120,9 @@ class Scene:
         """
 
         for decorator in self._decorators:
-            decorator(self).decorate()
+            decoration = decorator(self)
+            decoration.decorate()
+            self._decorations.append(decoration)
 
     def build(self):
         """ Build all the things inside the Scene """
@@ -75,6 +132,20 @@ class Scene:
         (min_pos, max_pos) = self.find_bounding_box()
         self._end_position = max_pos
 
+    async def build_async(self, renderer, executor=None):
+        """
+        Build all the things inside the Scene concurrently with an AsyncRenderer
+
+        :param renderer: the AsyncRenderer
+        :param executor: concurrent.futures.Executor for creating the things (the default one if None)
+        :return:
+        """
+
+        await build_things_async(self.things, renderer, executor)
+
+        (min_pos, max_pos) = self.find_bounding_box()
+        self._end_position = max_pos
+
     def unbuild(self):
         """ Unbuild all the things inside the Scene """
         for thing in self.things:
@@ -105,17 +176,65 @@ class Scene:
 
             thing._position = (Vec3(repos_x, repos_y, repos_z))
 
+        self._position = Vec3(position.x, position.y, position.z)
+
     def move(self, position):
         """
-        Move the scene to a new position
+        Move the scene to a new position. Only the blocks that change
+        are rendered again.
 
         :param position: new position
         :return:
         """
 
-        self.unbuild()
+        old_positions = []
+        old_snapshots = []
+        old_empty_snapshots = []
+        rendered_memory = SparseBlocksMemory()
+        empty_memory = SparseBlocksMemory()
+        for thing in self.things:
+            old_positions.append(thing.position)
+            old_snapshots.append(thing.memory_snapshot())
+            old_empty_snapshots.append(thing.memory_snapshot(empty=True))
+            rendered_memory.add_memory(old_snapshots[-1])
+            empty_memory.add_memory(old_empty_snapshots[-1])
+
         self.reposition(position)
-        self.build()
+
+        def render_moved(moved, remove_next=False):
+            # Render the first moved things over the blocks of the things not moved yet,
+            # removing the blocks of the next thing to move with remove_next
+            nonlocal rendered_memory
+            memory = SparseBlocksMemory()
+            for index, thing in enumerate(self.things):
+                if index < moved:
+                    thing.memory_snapshot(memory)
+                elif index == moved and remove_next:
+                    memory.add_memory(old_empty_snapshots[index])
+                else:
+                    memory.add_memory(old_snapshots[index])
+            World.renderer.render(memory.diff(rendered_memory, empty_memory))
+            rendered_memory = memory
+
+        for index, thing in enumerate(self.things):
+            if not thing.builds_in_memory:
+                render_moved(index)
+                # It is unbuilt in the old position and built in the new one
+                new_position = thing.position
+                thing._position = old_positions[index]
+                thing.move(new_position)
+                continue
+            if thing.reads_world:
+                # The world read must include the things before it already moved, and
+                # not the blocks of the thing in the old position
+                render_moved(index, remove_next=True)
+            thing.reset()
+            thing.create()
+
+        render_moved(len(self.things))
+
+        (min_pos, max_pos) = self.find_bounding_box()
+        self._end_position = max_pos
 
     def load(self, file_path):
         """ Load a scene from a file (but no build it yet) """
@@ -129,7 +248,7 @@ class Scene:
         def clean_memory(thing):
             for child in thing._children:
                 clean_memory(child)
-            thing._blocks_memory = BlocksMemory()
+            thing._blocks_memory = thing.blocks_memory_class(final_state=True)
 
         # Clean the blocks_memory: it is not needed to recreate the scene
         for thing in self.things:
@@ -165,15 +284,34 @@ class Scene:
 
         return min_pos, max_pos
 
-    def to_schematic(self, file_path, block_data=False):
+    def to_schematic(self, file_path, block_data=False, from_memory=False):
         """
-        Save the Scene into a Schematic file
+        Save the Scene into a Schematic file. The blocks in the bounding box of the Scene
+        are extracted from the renderer, or from memory with from_memory (the things must
+        be created, and the blocks of the decorators applied are included).
+        The format is selected from the extension: .schem, .litematic or .schematic
 
         :param file_path: file in which to export the Scene in Schematic format
-        :param block_data: extract blocks ids and data (much slower)
+        :param block_data: extract blocks ids and data when extracting from the renderer (much slower)
+        :param from_memory: export the blocks from memory instead of extracting them from the renderer
         :return: the Schematic object
         """
 
         (min_pos, max_pos) = self.find_bounding_box()
-
-        build_schematic_nbt(min_pos, max_pos, block_data).write_file(file_path)
+        file_format = schematic_format(file_path)
+
+        if not from_memory:
+            schematic = build_schematic_nbt(min_pos, max_pos, block_data, file_format=file_format)
+        else:
+            memory = SparseBlocksMemory()
+            for thing in self.things:
+                thing.memory_snapshot(memory, decorations=True)
+            for decoration in self._decorations:
+                memory.add_memory(decoration._blocks_memory)
+            if memory.is_empty():
+                raise RuntimeError("The things must be created to export the Scene from memory")
+            schematic = memory.build_schematic(file_format, *merge_boxes(min_pos, max_pos, *memory.find_init_end_pos()))
+
+        schematic.write_file(file_path)
+
+        return schematic
@@ -1,17 +1,72 @@
 # Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
 # Author/s (©): Alvaro del Castillo
 
+import os
+from functools import lru_cache
+
 import mcpi.block
+import numpy as np
 from nbt import nbt
 
 from mcpi.vec3 import Vec3
 
+from mcthings.dense_blocks_memory import DenseBlocksMemory
+from mcthings.schematic_reader import SchematicReader
 from mcthings.thing import Thing
+from mcthings.world import World
+
+SCHEMATIC_CACHE_SIZE = 16
+""" Number of parsed schematic files kept in memory """
+
+
+class SchematicData:
+    """ The size and the blocks arrays of a parsed schematic file """
+
+    def __init__(self, size, block_ids, block_data):
+        self.size = size
+        """ Vec3 with the Width, Height and Length of the schematic """
+        self.block_ids = block_ids
+        """ read only uint8 array indexed [y, z, x] with the blocks ids """
+        self.block_data = block_data
+        """ read only uint8 array indexed [y, z, x] with the blocks data (lower 4 bits) """
+
+
+@lru_cache(maxsize=SCHEMATIC_CACHE_SIZE)
+def _parse_schematic(file_path, mtime, file_size, blocks_field, data_field):
+    schematic = nbt.NBTFile(file_path, 'rb')
+    size = Vec3(schematic["Width"].value, schematic["Height"].value, schematic["Length"].value)
+
+    # Blocks are stored in x -> z -> y order
+    shape = (size.y, size.z, size.x)
+    block_ids = np.frombuffer(bytes(schematic[blocks_field].value), dtype=np.uint8).reshape(shape)
+    block_data = np.frombuffer(bytes(schematic[data_field].value), dtype=np.uint8).reshape(shape)
+    block_data = block_data & 0b00001111  # lower 4 bits
+    block_data.flags.writeable = False
+
+    return SchematicData(size, block_ids, block_data)
+
+
+def load_schematic(file_path, blocks_field='Blocks', data_field='Data'):
+    """
+    Parse a schematic file. The parsed files are cached until the file changes (mtime or size)
+    and the least recently used ones are evicted.
+
+    :param file_path: path to the schematic file
+    :param blocks_field: NBT field with the blocks ids
+    :param data_field: NBT field with the blocks data
+    :return: the shared SchematicData for the file (it must not be modified)
+    """
+
+    stat = os.stat(file_path)
+
+    return _parse_schematic(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, blocks_field, data_field)
 
 
 class Schematic(Thing):
     _blocks_field = 'Blocks'
     _data_field = 'Data'
+    blocks_memory_class = DenseBlocksMemory
+    """ schematics are filled cuboids, so store them in arrays """
     file_path = None
     """ file path for the schematic file """
     rotate_degrees = 0
@@ -19,45 +74,84 @@ class Schematic(Thing):
     change_blocks = {mcpi.block.AIR.id: mcpi.block.AIR.id}
     """ Change a block with other """
 
-    def find_bounding_box(self):
-        """ In a Schematic the bounding box is inside the file data """
+    stream_layers = 0
+    """ build reading and rendering this number of y layers each time without keeping
+    the blocks in memory, so huge schematics can be built with bounded memory (0 to disable) """
+
+    @property
+    def builds_in_memory(self):
+        """ the streamed schematics are rendered without keeping the blocks in memory """
+        return not self.stream_layers
+
+    def _load(self):
+        return load_schematic(self.file_path, self._blocks_field, self._data_field)
 
-        schematic = nbt.NBTFile(self.file_path, 'rb')
+    def _change_blocks_table(self):
+        """ Lookup table with the block id to use for each schematic block id """
+        change_blocks = np.arange(0, 256, dtype=np.uint16)
+        for block_id, new_block_id in self.change_blocks.items():
+            change_blocks[block_id] = new_block_id
 
-        size_x = schematic["Width"].value
-        size_y = schematic["Height"].value
-        size_z = schematic["Length"].value
+        return change_blocks
 
-        init_x = self.position.x
-        init_y = self.position.y
-        init_z = self.position.z
+    def _update_end_position(self, size):
+        self._end_position = Vec3(self.position.x + size.x - 1,
+                                  self.position.y + size.y - 1,
+                                  self.position.z + size.z - 1)
+
+    def find_bounding_box(self):
+        """ In a Schematic the bounding box is inside the file data """
 
-        self._end_position = Vec3(init_x + size_x - 1,
-                                  init_y + size_y - 1,
-                                  init_z + size_z - 1)
+        if self.stream_layers:
+            self._update_end_position(SchematicReader(self.file_path, self._blocks_field, self._data_field).size)
+        else:
+            self._update_end_position(self._load().size)
 
         return self.position, self.end_position
 
     def create(self):
         if not self.file_path:
-            RuntimeError("Missing file_path param")
-
-        schematic = nbt.NBTFile(self.file_path, 'rb')
-        size_x = schematic["Width"].value
-        size_y = schematic["Height"].value
-        size_z = schematic["Length"].value
-
-        init_pos = self.position
-
-        for y in range(0, size_y):
-            for z in range(0, size_z):
-                for x in range(0, size_x):
-                    i = x + size_x * z + (size_x * size_z) * y
-                    block_id = schematic[self._blocks_field][i]
-                    block_data = schematic[self._data_field][i] & 0b00001111  # lower 4 bits
-                    block_pos = Vec3(init_pos.x + x, init_pos.y + y, init_pos.z + z)
-                    if block_id in self.change_blocks:
-                        block_id = self.change_blocks[block_id]
-                    self.set_block(block_pos, block_id, block_data)
-
-        init_pos, self._end_position = self.find_bounding_box()
+            raise RuntimeError("Missing file_path param")
+
+        schematic = self._load()
+        block_ids = self._change_blocks_table()[schematic.block_ids]
+
+        # The arrays are indexed [y, z, x] and the cached ones are shared, so copy them
+        self._blocks_memory.set_arrays(self.position, block_ids.transpose(2, 0, 1),
+                                       schematic.block_data.transpose(2, 0, 1).copy())
+
+        self._update_end_position(schematic.size)
+
+    def build(self):
+        if not self.stream_layers:
+            super().build()
+            return
+
+        if not self.file_path:
+            raise RuntimeError("Missing file_path param")
+
+        reader = SchematicReader(self.file_path, self._blocks_field, self._data_field)
+        change_blocks = self._change_blocks_table()
+
+        for y, block_ids, block_data in reader.layers(self.stream_layers):
+            layers_memory = self.blocks_memory_class(final_state=True)
+            layers_memory.set_arrays(Vec3(self.position.x, self.position.y + y, self.position.z),
+                                     change_blocks[block_ids].transpose(2, 0, 1), block_data.transpose(2, 0, 1))
+            World.renderer.render(layers_memory)
+
+        self._update_end_position(reader.size)
+
+    def unbuild(self):
+        if not self.stream_layers:
+            super().unbuild()
+            return
+
+        # The blocks are not in memory: remove the cuboid of the schematic layer by layer
+        self.find_bounding_box()
+        for y in range(self.position.y, self.end_position.y + 1, self.stream_layers):
+            layers_memory = self.blocks_memory_class(final_state=True)
+            layers_memory.set_blocks(Vec3(self.position.x, y, self.position.z),
+                                     Vec3(self.end_position.x, min(y + self.stream_layers - 1, self.end_position.y),
+                                          self.end_position.z),
+                                     self._block_empty.id)
+            World.renderer.render(layers_memory)
@@ -0,0 +1,224 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import os
+import time
+
+import numpy as np
+from nbt.nbt import NBTFile, TAG_Compound, TAG_List, TAG_Int, TAG_Long, TAG_Short, TAG_String, \
+    TAG_Byte_Array, TAG_Int_Array, TAG_Long_Array
+
+from mcthings.block_names import block_name
+
+SCHEMATIC_FORMAT = "schematic"
+""" MCEdit schematic with one byte per block id and data """
+SPONGE_FORMAT = "schem"
+""" Sponge schematic with a palette of block names """
+LITEMATIC_FORMAT = "litematic"
+""" Litematica schematic with one region """
+
+SPONGE_VERSION = 2
+""" Sponge schematic version written: 2, or 3 for WorldEdit 7.3 and newer """
+DATA_VERSION = 1631
+""" Minecraft data version for the block names used (1.13.2) """
+LITEMATIC_VERSION = 4
+
+
+def schematic_format(file_path):
+    """ Find the schematic format from the extension of file_path (MCEdit schematic by default) """
+    extension = os.path.splitext(file_path)[1][1:].lower()
+
+    return extension if extension in [SPONGE_FORMAT, LITEMATIC_FORMAT] else SCHEMATIC_FORMAT
+
+
+def legacy_block_ids(block_ids):
+    """
+    Convert the blocks ids to the one byte ids of the MCEdit schematic
+
+    :param block_ids: array with the blocks ids
+    :return: uint8 array with the blocks ids
+    """
+
+    if block_ids.size and block_ids.max() > 0xFF:
+        raise RuntimeError("Block id %i does not fit in a MCEdit schematic: export it as .schem or .litematic"
+                           % block_ids.max())
+
+    return block_ids.astype(np.uint8)
+
+
+def build_palette(block_ids, block_data):
+    """
+    Build the palette with the names of the blocks
+
+    :param block_ids: array with the blocks ids
+    :param block_data: array with the blocks data
+    :return: list with the names in the palette (air the first one) and array with
+             the palette index for each block
+    """
+
+    keys = (block_ids.astype(np.uint32) << 4) | (block_data & 0x0F)
+    keys, inverse = np.unique(keys.reshape(-1), return_inverse=True)
+
+    # Different blocks can have the same name (the orientation is not in the names)
+    names = ["minecraft:air"]
+    key_indexes = np.zeros(len(keys), dtype=np.uint32)
+    for i, key in enumerate(keys.tolist()):
+        name = block_name(key >> 4, key & 0x0F)
+        if name not in names:
+            names.append(name)
+        key_indexes[i] = names.index(name)
+
+    return names, key_indexes[inverse.reshape(-1)]
+
+
+def encode_varints(values):
+    """
+    Encode integers as varints: 7 bits per byte with the highest bit set if more bytes follow
+
+    :param values: array with the integers (< 2^28)
+    :return: bytearray with the varints
+    """
+
+    values = values.astype(np.uint32)
+    if not values.size or values.max() < 0x80:
+        return bytearray(values.astype(np.uint8).tobytes())
+
+    sizes = 1 + (values >= 1 << 7).astype(np.uint8) + (values >= 1 << 14) + (values >= 1 << 21)
+    varints = np.zeros((len(values), 4), dtype=np.uint8)
+    for i in range(0, 4):
+        varints[:, i] = ((values >> (7 * i)) & 0x7F) | ((sizes > i + 1) << 7)
+
+    return bytearray(varints[np.arange(0, 4) < sizes[:, None]].tobytes())
+
+
+def pack_bits(values, bits):
+    """
+    Pack integers with bits each in a long array: the values are stored one after
+    the other from the lowest bits and they can span two longs
+
+    :param values: array with the integers
+    :param bits: bits used for each value
+    :return: int64 array with the packed values
+    """
+
+    value_bits = ((values.astype(np.uint64)[:, None] >> np.arange(0, bits, dtype=np.uint64)) & 1).astype(np.uint8)
+    packed = np.packbits(value_bits.reshape(-1), bitorder='little')
+    packed = np.concatenate((packed, np.zeros(-len(packed) % 8, dtype=np.uint8)))
+
+    return packed.view('<i8')
+
+
+def build_sponge_nbt(block_ids, block_data, version=None):
+    """
+    Creates a NBT Object with a Sponge schematic (version 2 or 3)
+
+    :param block_ids: array indexed [x, y, z] with the blocks ids (air for no block)
+    :param block_data: array indexed [x, y, z] with the blocks data
+    :param version: Sponge schematic version (SPONGE_VERSION if None)
+    :return: The NBT object with the Schematic
+    """
+
+    version = version if version else SPONGE_VERSION
+    if version not in [2, 3]:
+        raise RuntimeError("Not supported Sponge schematic version %s" % version)
+
+    size_x, size_y, size_z = block_ids.shape
+
+    # Blocks are stored in x -> z -> y order
+    names, indexes = build_palette(block_ids.transpose(1, 2, 0), block_data.transpose(1, 2, 0))
+
+    nbtfile = NBTFile()
+    # Version 3 has the schematic inside a compound in the root one
+    schematic = nbtfile if version == 2 else TAG_Compound(name="Schematic")
+    nbtfile.name = "Schematic" if version == 2 else ""
+    schematic.tags.append(TAG_Int(name="Version", value=version))
+    schematic.tags.append(TAG_Int(name="DataVersion", value=DATA_VERSION))
+    schematic.tags.append(TAG_Short(name="Width", value=size_x))
+    schematic.tags.append(TAG_Short(name="Height", value=size_y))
+    schematic.tags.append(TAG_Short(name="Length", value=size_z))
+    offset = TAG_Int_Array(name="Offset")
+    offset.value = [0, 0, 0]
+    schematic.tags.append(offset)
+
+    palette = TAG_Compound(name="Palette")
+    for index, name in enumerate(names):
+        palette.tags.append(TAG_Int(name=name, value=index))
+    nbt_blocks = TAG_Byte_Array(name="BlockData" if version == 2 else "Data")
+    nbt_blocks.value = encode_varints(indexes)
+    block_entities = TAG_List(name="BlockEntities", type=TAG_Compound)
+
+    if version == 2:
+        schematic.tags.append(TAG_Int(name="PaletteMax", value=len(names)))
+        schematic.tags += [palette, nbt_blocks, block_entities]
+    else:
+        # Version 3 groups the palette, the blocks and the block entities
+        blocks = TAG_Compound(name="Blocks")
+        blocks.tags += [palette, nbt_blocks, block_entities]
+        schematic.tags.append(blocks)
+        nbtfile.tags.append(schematic)
+
+    return nbtfile
+
+
+def _vec3_compound(name, x, y, z):
+    compound = TAG_Compound(name=name)
+    compound.tags.append(TAG_Int(name="x", value=x))
+    compound.tags.append(TAG_Int(name="y", value=y))
+    compound.tags.append(TAG_Int(name="z", value=z))
+
+    return compound
+
+
+def build_litematic_nbt(block_ids, block_data, name="mcthings"):
+    """
+    Creates a NBT Object with a Litematica schematic with one region
+
+    :param block_ids: array indexed [x, y, z] with the blocks ids (air for no block)
+    :param block_data: array indexed [x, y, z] with the blocks data
+    :param name: name of the schematic and its region
+    :return: The NBT object with the Schematic
+    """
+
+    size_x, size_y, size_z = block_ids.shape
+
+    # Blocks are stored in x -> z -> y order
+    names, indexes = build_palette(block_ids.transpose(1, 2, 0), block_data.transpose(1, 2, 0))
+    bits = max(2, int(len(names) - 1).bit_length())
+    now = int(time.time() * 1000)
+
+    nbtfile = NBTFile()
+    nbtfile.name = ""
+    nbtfile.tags.append(TAG_Int(name="MinecraftDataVersion", value=DATA_VERSION))
+    nbtfile.tags.append(TAG_Int(name="Version", value=LITEMATIC_VERSION))
+
+    metadata = TAG_Compound(name="Metadata")
+    metadata.tags.append(TAG_String(name="Name", value=name))
+    metadata.tags.append(TAG_String(name="Author", value="mcthings"))
+    metadata.tags.append(TAG_String(name="Description", value=""))
+    metadata.tags.append(TAG_Int(name="RegionCount", value=1))
+    metadata.tags.append(TAG_Int(name="TotalBlocks", value=int(np.count_nonzero(indexes))))
+    metadata.tags.append(TAG_Int(name="TotalVolume", value=size_x * size_y * size_z))
+    metadata.tags.append(_vec3_compound("EnclosingSize", size_x, size_y, size_z))
+    metadata.tags.append(TAG_Long(name="TimeCreated", value=now))
+    metadata.tags.append(TAG_Long(name="TimeModified", value=now))
+    nbtfile.tags.append(metadata)
+
+    region = TAG_Compound(name=name)
+    region.tags.append(_vec3_compound("Position", 0, 0, 0))
+    region.tags.append(_vec3_compound("Size", size_x, size_y, size_z))
+    palette = TAG_List(name="BlockStatePalette", type=TAG_Compound)
+    for block_name_value in names:
+        block_state = TAG_Compound()
+        block_state.tags.append(TAG_String(name="Name", value=block_name_value))
+        palette.tags.append(block_state)
+    region.tags.append(palette)
+    block_states = TAG_Long_Array(name="BlockStates")
+    block_states.value = pack_bits(indexes, bits).tolist()
+    region.tags.append(block_states)
+    for list_name in ["Entities", "TileEntities", "PendingBlockTicks", "PendingFluidTicks"]:
+        region.tags.append(TAG_List(name=list_name, type=TAG_Compound))
+    regions = TAG_Compound(name="Regions")
+    regions.tags.append(region)
+    nbtfile.tags.append(regions)
+
+    return nbtfile
@@ -0,0 +1,170 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import gzip
+import struct
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+TAG_END = 0
+TAG_SHORT = 2
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+TAG_SIZES = {1: 1, 2: 2, 3: 4, 4: 8, 5: 4, 6: 8}
+""" size of the payload of the fixed size NBT tags """
+
+SKIP_BUFFER_SIZE = 1024 * 1024
+""" max bytes decompressed at once when skipping data in the stream """
+
+
+class _NBTStream:
+    """ Decompressed NBT stream of a gzip file read forward only """
+
+    def __init__(self, file_path):
+        self.file = gzip.open(file_path, 'rb')
+        self.offset = 0
+        """ position in the decompressed stream """
+
+    def close(self):
+        self.file.close()
+
+    def read(self, size):
+        data = self.file.read(size)
+        if len(data) < size:
+            raise RuntimeError("Unexpected end of NBT stream in %s" % self.file.name)
+        self.offset += size
+
+        return data
+
+    def skip(self, size):
+        while size > 0:
+            skipped = len(self.read(min(size, SKIP_BUFFER_SIZE)))
+            size -= skipped
+
+    def skip_to(self, offset):
+        self.skip(offset - self.offset)
+
+    def read_value(self, value_format):
+        return struct.unpack(value_format, self.read(struct.calcsize(value_format)))[0]
+
+    def read_string(self):
+        return self.read(self.read_value(">H")).decode("utf-8")
+
+    def skip_payload(self, tag_type):
+        """ Skip the payload of a tag without loading it """
+
+        if tag_type in TAG_SIZES:
+            self.skip(TAG_SIZES[tag_type])
+        elif tag_type == TAG_BYTE_ARRAY:
+            self.skip(self.read_value(">i"))
+        elif tag_type == TAG_STRING:
+            self.skip(self.read_value(">H"))
+        elif tag_type == TAG_LIST:
+            item_type = self.read_value(">b")
+            items = self.read_value(">i")
+            if item_type in TAG_SIZES:
+                self.skip(items * TAG_SIZES[item_type])
+            else:
+                for i in range(0, items):
+                    self.skip_payload(item_type)
+        elif tag_type == TAG_COMPOUND:
+            tag_type = self.read_value(">b")
+            while tag_type != TAG_END:
+                self.read_string()
+                self.skip_payload(tag_type)
+                tag_type = self.read_value(">b")
+        elif tag_type == TAG_INT_ARRAY:
+            self.skip(self.read_value(">i") * 4)
+        elif tag_type == TAG_LONG_ARRAY:
+            self.skip(self.read_value(">i") * 8)
+        else:
+            raise RuntimeError("Unknown NBT tag type %i" % tag_type)
+
+
+class SchematicReader:
+    """
+    Read the blocks of a schematic file in layers without loading the whole file in memory.
+
+    The decompressed stream is scanned once to find the size of the schematic and
+    where the blocks arrays are. Then the blocks ids and data are read in parallel
+    from two streams, so only the layers being read are in memory.
+    """
+
+    def __init__(self, file_path, blocks_field='Blocks', data_field='Data'):
+        """
+        Scan a schematic file
+
+        :param file_path: path to the schematic file
+        :param blocks_field: NBT field with the blocks ids
+        :param data_field: NBT field with the blocks data
+        """
+
+        self.file_path = file_path
+        self.size = None
+        """ Vec3 with the Width, Height and Length of the schematic """
+        self._offsets = {}
+
+        shorts = {}
+        stream = _NBTStream(file_path)
+        try:
+            if stream.read_value(">b") != TAG_COMPOUND:
+                raise RuntimeError("Bad schematic file %s: the root tag is not a compound" % file_path)
+            stream.read_string()
+
+            # Only the tags in the root compound are needed
+            tag_type = stream.read_value(">b")
+            while tag_type != TAG_END:
+                name = stream.read_string()
+                if tag_type == TAG_SHORT:
+                    shorts[name] = stream.read_value(">h")
+                elif tag_type == TAG_BYTE_ARRAY and name in (blocks_field, data_field):
+                    length = stream.read_value(">i")
+                    self._offsets[name] = stream.offset
+                    stream.skip(length)
+                else:
+                    stream.skip_payload(tag_type)
+                tag_type = stream.read_value(">b")
+        finally:
+            stream.close()
+
+        for field in ["Width", "Height", "Length", blocks_field, data_field]:
+            if field not in shorts and field not in self._offsets:
+                raise RuntimeError("Bad schematic file %s: %s not found" % (file_path, field))
+
+        self.size = Vec3(shorts["Width"], shorts["Height"], shorts["Length"])
+        self._blocks_field = blocks_field
+        self._data_field = data_field
+
+    def layers(self, count=1):
+        """
+        Read the blocks in groups of layers from the bottom to the top of the schematic
+
+        :param count: number of y layers to read each time
+        :return: generator of (y, block_ids, block_data) with y the first layer read and the
+                 uint8 arrays of the blocks indexed [y, z, x] (block_data with the lower 4 bits)
+        """
+
+        layer_size = self.size.x * self.size.z
+        blocks_stream = _NBTStream(self.file_path)
+        data_stream = _NBTStream(self.file_path)
+
+        try:
+            blocks_stream.skip_to(self._offsets[self._blocks_field])
+            data_stream.skip_to(self._offsets[self._data_field])
+
+            for y in range(0, self.size.y, count):
+                layers = min(count, self.size.y - y)
+                shape = (layers, self.size.z, self.size.x)
+                block_ids = np.frombuffer(blocks_stream.read(layer_size * layers), dtype=np.uint8).reshape(shape)
+                block_data = np.frombuffer(data_stream.read(layer_size * layers), dtype=np.uint8).reshape(shape)
+
+                yield y, block_ids, block_data & 0b00001111
+        finally:
+            blocks_stream.close()
+            data_stream.close()
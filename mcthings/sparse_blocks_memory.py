@@ -0,0 +1,403 @@
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory, BlockMemory, EMPTY_BLOCK_ID, arrays_to_blocks, check_degrees, rotate_xz
+from mcthings.utils import size_region, find_min_max_cuboid_vertex
+
+SECTION_SIZE = 16
+""" Size of the sections in the three axes (the same than Minecraft chunk sections) """
+
+
+class Section:
+    """
+    A cube of SECTION_SIZE blocks per axis stored in packed arrays indexed [x, y, z]
+    """
+
+    def __init__(self, key):
+        self.key = key
+        """ section coordinates: the position of the section divided by SECTION_SIZE """
+        self.position = Vec3(key[0] * SECTION_SIZE, key[1] * SECTION_SIZE, key[2] * SECTION_SIZE)
+        """ position of the first block of the section """
+        self.ids = np.full((SECTION_SIZE, SECTION_SIZE, SECTION_SIZE), EMPTY_BLOCK_ID, dtype=np.uint16)
+        self.data = np.zeros((SECTION_SIZE, SECTION_SIZE, SECTION_SIZE), dtype=np.uint8)
+
+    @property
+    def blocks(self):
+        """ The blocks in the section in Schematic order: x -> z -> y """
+        return arrays_to_blocks(self.ids, self.data, tuple(self.position))
+
+    def count(self):
+        """ Number of blocks in the section """
+        return int(np.count_nonzero(self.ids != EMPTY_BLOCK_ID))
+
+    def find_init_end_pos(self):
+        """ Find the init and end cuboid positions from all the blocks in the section """
+
+        occupied = np.nonzero(self.ids != EMPTY_BLOCK_ID)
+        if not occupied[0].size:
+            return None, None
+
+        init_pos = Vec3(*[int(coords.min()) for coords in occupied]) + self.position
+        end_pos = Vec3(*[int(coords.max()) for coords in occupied]) + self.position
+
+        return init_pos, end_pos
+
+
+class SparseBlocksMemory(BlocksMemory):
+    """
+    Blocks memory split in sections of SECTION_SIZE^3 blocks. Only the sections
+    with blocks are allocated, so Things with a big bounding box but few blocks
+    use few memory.
+
+    A position only stores the last block written on it.
+    """
+
+    def __init__(self, final_state=True):
+        """
+        Create a blocks memory
+
+        :param final_state: always True, only the last block added in a position is stored
+        """
+
+        self.final_state = True
+        self._reset()
+
+    @property
+    def blocks(self):
+        """ The blocks in memory walking the sections in order """
+        blocks = []
+        for section in self.iter_sections():
+            blocks += section.blocks
+
+        return blocks
+
+    @blocks.setter
+    def blocks(self, blocks):
+        self._reset()
+        for block in blocks:
+            self.add(block)
+
+    def _reset(self):
+        """ Remove all the blocks from memory """
+        self._sections = {}
+        # Bounding box of the blocks stored
+        self._min = None
+        self._max = None
+
+    def _section(self, key):
+        """ Get the section with key allocating it if it does not exist yet """
+        section = self._sections.get(key)
+        if section is None:
+            section = Section(key)
+            self._sections[key] = section
+
+        return section
+
+    def _update_bounding_box(self, vertex_min, vertex_max):
+        if self._min is None:
+            self._min = vertex_min
+            self._max = vertex_max
+        else:
+            self._min = tuple(min(self._min[axis], vertex_min[axis]) for axis in range(0, 3))
+            self._max = tuple(max(self._max[axis], vertex_max[axis]) for axis in range(0, 3))
+
+    def _to_columns(self):
+        """ Positions, ids and data of all the blocks in memory as numpy arrays """
+        xs, ys, zs, ids, data = [], [], [], [], []
+
+        for section in self._sections.values():
+            occupied = np.nonzero(section.ids != EMPTY_BLOCK_ID)
+            xs.append(occupied[0] + section.position.x)
+            ys.append(occupied[1] + section.position.y)
+            zs.append(occupied[2] + section.position.z)
+            ids.append(section.ids[occupied])
+            data.append(section.data[occupied])
+
+        if not ids:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty.astype(np.uint16), empty.astype(np.uint8)
+
+        return np.concatenate(xs), np.concatenate(ys), np.concatenate(zs), np.concatenate(ids), np.concatenate(data)
+
+    def _load_columns(self, xs, ys, zs, ids, data):
+        """ Replace the memory with the blocks in the numpy arrays (the last block in a position wins) """
+        self._reset()
+
+        if not ids.size:
+            return
+
+        # Group the blocks by section using one integer per section key
+        keys = [coords // SECTION_SIZE for coords in (xs, ys, zs)]
+        keys_min = [int(axis_keys.min()) for axis_keys in keys]
+        keys_size = [int(keys[axis].max()) - keys_min[axis] + 1 for axis in range(0, 3)]
+        flat_keys = ((keys[0] - keys_min[0]) * keys_size[1] + keys[1] - keys_min[1]) * keys_size[2] + \
+            keys[2] - keys_min[2]
+        # Stable so the last block in a position is written the last one
+        order = np.argsort(flat_keys, kind='stable')
+        sorted_keys = flat_keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        bounds = [0] + bounds.tolist() + [len(order)]
+
+        for i in range(0, len(bounds) - 1):
+            first = order[bounds[i]]
+            key = tuple(int(keys[axis][first]) for axis in range(0, 3))
+            section = self._section(key)
+            in_section = order[bounds[i]:bounds[i + 1]]
+            index = (xs[in_section] % SECTION_SIZE, ys[in_section] % SECTION_SIZE, zs[in_section] % SECTION_SIZE)
+            section.ids[index] = ids[in_section]
+            section.data[index] = data[in_section]
+
+        self._min = (int(xs.min()), int(ys.min()), int(zs.min()))
+        self._max = (int(xs.max()), int(ys.max()), int(zs.max()))
+
+    def _compute_bounding_box(self):
+        """ Compute the bounding box of the blocks from the sections """
+        self._min = self._max = None
+        for section in self._sections.values():
+            init_pos, end_pos = section.find_init_end_pos()
+            if init_pos is not None:
+                self._update_bounding_box(tuple(init_pos), tuple(end_pos))
+
+    def iter_sections(self):
+        """
+        Iterate over the allocated sections in Schematic order: x -> z -> y
+
+        :return: generator of Section
+        """
+
+        for key in sorted(self._sections, key=lambda section_key: (section_key[1], section_key[2], section_key[0])):
+            yield self._sections[key]
+
+    def add(self, block_memory):
+        return self.set_block(block_memory.pos, block_memory.id, block_memory.data)
+
+    def find_init_end_pos(self):
+        if self._min is None:
+            return None, None
+
+        return Vec3(*self._min), Vec3(*self._max)
+
+    def is_cuboid(self):
+        size = size_region(*self.find_init_end_pos())
+
+        return size.x * size.y * size.z == sum(section.count() for section in self._sections.values())
+
+    def memory_equal(self):
+        block = None
+
+        for section in self._sections.values():
+            occupied = section.ids != EMPTY_BLOCK_ID
+            block_ids = section.ids[occupied]
+            block_data = section.data[occupied]
+            if not block_ids.size:
+                continue
+            if block is None:
+                block = (block_ids[0], block_data[0])
+            if not (np.all(block_ids == block[0]) and np.all(block_data == block[1])):
+                return False
+
+        return block is not None
+
+    def _flip(self, axis, position):
+        columns = list(self._to_columns())
+        coords = columns[axis]
+        coord = tuple(position)[axis]
+
+        # Blocks before position are not moved, the rest ones are flipped over them
+        flipped = coords >= coord
+        order = np.argsort(flipped, kind='stable')
+        columns[axis] = np.where(flipped, 2 * coord - coords, coords)
+
+        self._load_columns(*[column[order] for column in columns])
+
+    def fill(self, fill_block):
+        for section in self._sections.values():
+            occupied = section.ids != EMPTY_BLOCK_ID
+            section.ids[occupied] = fill_block.id
+            section.data[occupied] = fill_block.data
+
+    def rotate(self, degrees, position):
+        check_degrees(degrees)
+
+        xs, ys, zs, ids, data = self._to_columns()
+        xs, zs = rotate_xz(xs, zs, degrees, position)
+
+        self._load_columns(xs, ys, zs, ids, data)
+
+    def translate(self, offset):
+        xs, ys, zs, ids, data = self._to_columns()
+
+        self._load_columns(xs + offset.x, ys + offset.y, zs + offset.z, ids, data)
+
+    def set_block(self, pos, block_id, block_data=None):
+        section = self._section((pos.x // SECTION_SIZE, pos.y // SECTION_SIZE, pos.z // SECTION_SIZE))
+        index = (pos.x % SECTION_SIZE, pos.y % SECTION_SIZE, pos.z % SECTION_SIZE)
+
+        overwritten_block = None
+        if section.ids[index] != EMPTY_BLOCK_ID:
+            overwritten_block = BlockMemory(int(section.ids[index]), int(section.data[index]), Vec3(pos.x, pos.y, pos.z))
+
+        section.ids[index] = block_id
+        section.data[index] = block_data if block_data else 0
+
+        if self._min is None or not (self._min[0] <= pos.x <= self._max[0] and
+                                     self._min[1] <= pos.y <= self._max[1] and
+                                     self._min[2] <= pos.z <= self._max[2]):
+            vertex = (pos.x, pos.y, pos.z)
+            self._update_bounding_box(vertex, vertex)
+
+        return overwritten_block
+
+    def set_blocks(self, vertex, vertex_opposite, block_id):
+        vertex_min, vertex_max = find_min_max_cuboid_vertex(vertex, vertex_opposite)
+        vertex_min = (vertex_min.x, vertex_min.y, vertex_min.z)
+        vertex_max = (vertex_max.x, vertex_max.y, vertex_max.z)
+
+        # Fill the part of the cuboid inside each section
+        key_min = tuple(vertex_min[axis] // SECTION_SIZE for axis in range(0, 3))
+        key_max = tuple(vertex_max[axis] // SECTION_SIZE for axis in range(0, 3))
+        for key_y in range(key_min[1], key_max[1] + 1):
+            for key_z in range(key_min[2], key_max[2] + 1):
+                for key_x in range(key_min[0], key_max[0] + 1):
+                    section = self._section((key_x, key_y, key_z))
+                    region = []
+                    for axis in range(0, 3):
+                        section_init = section.key[axis] * SECTION_SIZE
+                        region.append(slice(max(vertex_min[axis] - section_init, 0),
+                                            min(vertex_max[axis] - section_init, SECTION_SIZE - 1) + 1))
+                    section.ids[tuple(region)] = block_id
+                    section.data[tuple(region)] = 0
+
+        self._update_bounding_box(vertex_min, vertex_max)
+
+    def find_block_at_pos(self, pos):
+        block_found = None
+
+        section = self._sections.get((pos.x // SECTION_SIZE, pos.y // SECTION_SIZE, pos.z // SECTION_SIZE))
+        if section is not None:
+            index = (pos.x % SECTION_SIZE, pos.y % SECTION_SIZE, pos.z % SECTION_SIZE)
+            block_id = section.ids[index]
+            if block_id != EMPTY_BLOCK_ID:
+                block_found = BlockMemory(int(block_id), int(section.data[index]), Vec3(pos.x, pos.y, pos.z))
+
+        return block_found
+
+    def is_empty(self):
+        return not self._sections
+
+    def set_arrays(self, init_pos, ids, data):
+        """
+        Add the blocks in numpy arrays indexed [x, y, z] from init_pos. The positions
+        with EMPTY_BLOCK_ID as id are not added.
+
+        :param init_pos: position of the block [0, 0, 0] in the arrays
+        :param ids: uint16 array with the blocks ids
+        :param data: uint8 array with the blocks data
+        :return:
+        """
+
+        init_pos = tuple(init_pos)
+        end_pos = tuple(init_pos[axis] + ids.shape[axis] - 1 for axis in range(0, 3))
+        occupied = ids != EMPTY_BLOCK_ID
+
+        key_min = tuple(init_pos[axis] // SECTION_SIZE for axis in range(0, 3))
+        key_max = tuple(end_pos[axis] // SECTION_SIZE for axis in range(0, 3))
+        for key_y in range(key_min[1], key_max[1] + 1):
+            for key_z in range(key_min[2], key_max[2] + 1):
+                for key_x in range(key_min[0], key_max[0] + 1):
+                    key = (key_x, key_y, key_z)
+                    region = []
+                    arrays_region = []
+                    for axis in range(0, 3):
+                        section_init = key[axis] * SECTION_SIZE
+                        region_min = max(init_pos[axis], section_init)
+                        region_max = min(end_pos[axis], section_init + SECTION_SIZE - 1)
+                        region.append(slice(region_min - section_init, region_max - section_init + 1))
+                        arrays_region.append(slice(region_min - init_pos[axis], region_max - init_pos[axis] + 1))
+                    region = tuple(region)
+                    arrays_region = tuple(arrays_region)
+
+                    region_occupied = occupied[arrays_region]
+                    if not region_occupied.any():
+                        continue
+                    section = self._section(key)
+                    section.ids[region][region_occupied] = ids[arrays_region][region_occupied]
+                    section.data[region][region_occupied] = data[arrays_region][region_occupied]
+
+        occupied = np.nonzero(occupied)
+        if occupied[0].size:
+            self._update_bounding_box(tuple(init_pos[axis] + int(occupied[axis].min()) for axis in range(0, 3)),
+                                      tuple(init_pos[axis] + int(occupied[axis].max()) for axis in range(0, 3)))
+
+    def add_memory(self, blocks_memory):
+        """
+        Add the blocks of other memory over the blocks in this one
+
+        :param blocks_memory: memory with the blocks to add
+        :return:
+        """
+
+        if not blocks_memory.is_empty():
+            init_pos, end_pos = blocks_memory.find_init_end_pos()
+            self.set_arrays(init_pos, *blocks_memory.to_arrays(init_pos, end_pos))
+
+    def diff(self, old_memory, empty_memory):
+        """
+        Find the blocks to render to change the blocks rendered from old_memory to this memory
+
+        :param old_memory: SparseBlocksMemory with the blocks already rendered
+        :param empty_memory: SparseBlocksMemory with the blocks used to remove each block of old_memory
+        :return: SparseBlocksMemory with the new blocks and the empty blocks for the removed ones
+        """
+
+        diff_memory = SparseBlocksMemory()
+        empty_section = Section((0, 0, 0))
+
+        for key in set(self._sections) | set(old_memory._sections):
+            new_section = self._sections.get(key, empty_section)
+            old_section = old_memory._sections.get(key, empty_section)
+            remove_section = empty_memory._sections.get(key, empty_section)
+
+            new_blocks = new_section.ids != EMPTY_BLOCK_ID
+            changed = new_blocks & ((new_section.ids != old_section.ids) | (new_section.data != old_section.data))
+            removed = ~new_blocks & (old_section.ids != EMPTY_BLOCK_ID)
+            if not changed.any() and not removed.any():
+                continue
+
+            section = diff_memory._section(key)
+            section.ids[changed] = new_section.ids[changed]
+            section.data[changed] = new_section.data[changed]
+            section.ids[removed] = remove_section.ids[removed]
+            section.data[removed] = remove_section.data[removed]
+
+        diff_memory._compute_bounding_box()
+
+        return diff_memory
+
+    def to_arrays(self, init_pos, end_pos):
+        size = size_region(init_pos, end_pos)
+        init_pos = tuple(init_pos)
+        end_pos = tuple(end_pos)
+
+        ids = np.full((size.x, size.y, size.z), EMPTY_BLOCK_ID, dtype=np.uint16)
+        data = np.zeros((size.x, size.y, size.z), dtype=np.uint8)
+
+        # Copy the part of each section inside the cuboid
+        for section in self.iter_sections():
+            section_init = tuple(section.position)
+            vertex_min = tuple(max(init_pos[axis], section_init[axis]) for axis in range(0, 3))
+            vertex_max = tuple(min(end_pos[axis], section_init[axis] + SECTION_SIZE - 1) for axis in range(0, 3))
+            if any(vertex_min[axis] > vertex_max[axis] for axis in range(0, 3)):
+                continue
+
+            region = tuple(slice(vertex_min[axis] - section_init[axis], vertex_max[axis] - section_init[axis] + 1)
+                           for axis in range(0, 3))
+            out_region = tuple(slice(vertex_min[axis] - init_pos[axis], vertex_max[axis] - init_pos[axis] + 1)
+                               for axis in range(0, 3))
+            ids[out_region] = section.ids[region]
+            data[out_region] = section.data[region]
+
+        return ids, data
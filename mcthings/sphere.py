@@ -10,6 +10,8 @@ class Sphere(Thing):
 
     radius = 5
     """ radius of the Sphere """
+    uses_drawing = True
+    builds_in_memory = False
 
     def build(self):
         World.renderer.server.drawing.drawSphere(
@@ -31,6 +33,8 @@ class SphereHollow(Thing):
     radius = None
     """ radius of the Hollow Sphere """
     height = 0
+    uses_drawing = True
+    builds_in_memory = False
 
     def build(self):
         World.renderer.server.drawing.drawHollowSphere(
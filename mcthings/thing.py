@@ -6,9 +6,12 @@ from mcpi.vec3 import Vec3
 
 from ._version import __version__
 
-from .blocks_memory import BlocksMemory
+from .blocks_memory import EMPTY_BLOCK_ID
+from .dense_blocks_memory import DenseBlocksMemory
 from .scene import Scene
-from .utils import build_schematic_nbt
+from .schematic_formats import schematic_format
+from .sparse_blocks_memory import SparseBlocksMemory
+from .utils import build_schematic_nbt, merge_boxes
 from .world import World
 
 
@@ -19,6 +22,17 @@ class Thing:
     """ block type used by the thing. Default to BRICK_BLOCK """
     _block_empty = mcpi.block.AIR
     """ block type used to remove blocks in this Thing """
+    blocks_memory_class = SparseBlocksMemory
+    """ class used to store the blocks of this Thing in memory """
+    reads_world = False
+    """ create() reads blocks from the renderer, so in concurrent builds it waits for the
+    Things before it to be rendered """
+    uses_drawing = False
+    """ build() draws with the MinecraftDrawing of the renderer server, so it can't be built
+    with an AsyncRenderer """
+    builds_in_memory = True
+    """ build() creates all the blocks in memory before rendering them, so the moves render
+    only the blocks that change. Otherwise the Thing is unbuilt and built again """
 
     def __init__(self, position, parent=None, scene=None):
         """
@@ -28,9 +42,11 @@ class Thing:
         :param scene: scene in which this Thing is included
         """
 
-        self._blocks_memory = BlocksMemory()
+        self._blocks_memory = self.blocks_memory_class(final_state=True)
         self._children = []
         self._decorators = []
+        self._decorations = []
+        """ decorators applied with decorate(), with the blocks they rendered """
         self._end_position = None
         self._parent = parent
         self._position = None
@@ -108,6 +124,92 @@ class Thing:
         for child in self._children:
             child.render()
 
+    async def render_async(self, renderer):
+        """
+        Render the Thing from memory (BlocksMemory) with an AsyncRenderer
+
+        :param renderer: the AsyncRenderer
+        :return:
+        """
+
+        await renderer.render(self._blocks_memory)
+        for child in self._children:
+            await child.render_async(renderer)
+
+    def _snapshot_memory(self, snapshot, blocks_memory, empty):
+        """ Add the blocks of a memory to the snapshot, or the empty block for each one """
+
+        if empty:
+            if not blocks_memory.is_empty():
+                init_pos, end_pos = blocks_memory.find_init_end_pos()
+                ids, data = blocks_memory.to_arrays(init_pos, end_pos)
+                ids[ids != EMPTY_BLOCK_ID] = self._block_empty.id
+                data[:] = self._block_empty.data
+                snapshot.set_arrays(init_pos, ids, data)
+        else:
+            snapshot.add_memory(blocks_memory)
+
+    def memory_snapshot(self, snapshot=None, empty=False, decorations=False):
+        """
+        Collect the final state of the blocks rendered by the Thing and its children
+
+        :param snapshot: SparseBlocksMemory in which to add the blocks (a new one if None)
+        :param empty: collect the blocks used to remove the Thing instead of its blocks
+        :param decorations: include the blocks of the decorators applied with decorate()
+        :return: SparseBlocksMemory with the blocks
+        """
+
+        if snapshot is None:
+            snapshot = SparseBlocksMemory()
+
+        # Same order than render: the blocks of the children are rendered after the Thing ones
+        self._snapshot_memory(snapshot, self._blocks_memory, empty)
+
+        for child in self._children:
+            child.memory_snapshot(snapshot, empty, decorations)
+
+        if decorations:
+            for decoration in self._decorations:
+                self._snapshot_memory(snapshot, decoration._blocks_memory, empty)
+
+        return snapshot
+
+    def reset(self):
+        """
+        Remove the blocks and children of the Thing from memory so it can be created again
+
+        :return:
+        """
+
+        self._blocks_memory = self.blocks_memory_class(final_state=True)
+        self._children = []
+        self._decorations = []
+
+    def save_memory(self, file_path):
+        """
+        Save the blocks of the Thing and its children to a memory file, so it can be
+        loaded later instead of creating it again
+
+        :param file_path: path to the memory file
+        :return:
+        """
+
+        self.memory_snapshot().save(file_path, self.position)
+
+    def load_memory(self, file_path):
+        """
+        Load the blocks of the Thing from a memory file saved with save_memory. The file
+        is memory mapped, so only the blocks rendered or exported are read from disk.
+
+        :param file_path: path to the memory file
+        :return:
+        """
+
+        self.reset()
+        self._blocks_memory = DenseBlocksMemory.load(file_path, self.position)
+        if not self._blocks_memory.is_empty():
+            init_pos, self._end_position = self._blocks_memory.find_init_end_pos()
+
     def build(self):
         """
         Build the thing and show it using the renderer at position coordinates
@@ -131,26 +233,51 @@ class Thing:
 
     def move(self, position):
         """
-        Move the thing to a new position
+        Move the thing to a new position. Only the blocks that change
+        are rendered again.
 
         :param position: new position
         :return:
         """
 
-        self.unbuild()
+        if not self.builds_in_memory:
+            self.unbuild()
+            self._position = position
+            self.build()
+            return
+
+        old_memory = self.memory_snapshot()
+        empty_memory = self.memory_snapshot(empty=True)
+
+        if self.reads_world:
+            # create() must not read the blocks of the Thing in the old position
+            World.renderer.render(empty_memory)
+            old_memory = empty_memory
+
+        self.reset()
         self._position = position
-        self.build()
+        self.create()
 
-    def rotate(self, degrees):
+        World.renderer.render(self.memory_snapshot().diff(old_memory, empty_memory))
+
+    def rotate(self, degrees, render=False):
         """
         Rotate the thing in the x,z space using the blocks memory.
 
         :param degrees: degrees to rotate (90, 180, 270)
+        :param render: render the blocks that change with the rotation
         :return:
         """
 
+        if render:
+            old_memory = self.memory_snapshot()
+            empty_memory = self.memory_snapshot(empty=True)
+
         self._blocks_memory.rotate(degrees, self.position)
 
+        if render:
+            World.renderer.render(self.memory_snapshot().diff(old_memory, empty_memory))
+
         # Update the position and end_position after the rotation
         init_pos, end_pos = self._blocks_memory.find_init_end_pos()
         self._position = init_pos
@@ -170,16 +297,62 @@ class Thing:
         self._position = init_pos
         self._end_position = end_pos
 
-    def to_schematic(self, file_path, blocks_data=False):
+    def flip_y(self):
+        """
+        Flip y-axis the things using the blocks memory.
+
+        :return:
+        """
+
+        self._blocks_memory.flip_y(self.position)
+
+        init_pos, end_pos = self._blocks_memory.find_init_end_pos()
+        self._position = init_pos
+        self._end_position = end_pos
+
+    def flip_z(self):
+        """
+        Flip z-axis the things using the blocks memory.
+
+        :return:
+        """
+
+        self._blocks_memory.flip_z(self.position)
+
+        init_pos, end_pos = self._blocks_memory.find_init_end_pos()
+        self._position = init_pos
+        self._end_position = end_pos
+
+    def to_schematic(self, file_path, blocks_data=False, from_memory=False):
         """
-        Convert the Thing to a Schematic Object
+        Convert the Thing to a Schematic Object. The blocks are extracted from the renderer,
+        or from memory with from_memory (the Thing must be created, and the blocks of its
+        decorators are included if it is decorated). From memory no renderer is needed and
+        it is much faster. The format is selected from the extension: .schem, .litematic or .schematic
 
         :file_path: file in which to export the Thing in Schematic format
-        :blocks_data: include blocks data (much slower)
+        :blocks_data: include blocks data when extracting from the renderer (much slower)
+        :from_memory: export the blocks from memory instead of extracting them from the renderer
         :return: the Schematic object
         """
 
-        build_schematic_nbt(self.position, self.end_position, blocks_data).write_file(file_path)
+        file_format = schematic_format(file_path)
+
+        if not from_memory:
+            init_pos, end_pos = self.find_bounding_box()
+            schematic = build_schematic_nbt(init_pos, end_pos, blocks_data, file_format=file_format)
+        else:
+            memory = self.memory_snapshot(decorations=True)
+            if memory.is_empty():
+                raise RuntimeError("The Thing must be created to export it from memory")
+            init_pos, end_pos = memory.find_init_end_pos()
+            if self.end_position:
+                init_pos, end_pos = merge_boxes(init_pos, end_pos, self.position, self.end_position)
+            schematic = memory.build_schematic(file_format, init_pos, end_pos)
+
+        schematic.write_file(file_path)
+
+        return schematic
 
     def add_decorator(self, decorator):
         """
@@ -197,9 +370,10 @@ class Thing:
         :return:
         """
         for decorator in self._decorators:
-            decorator(self).decorate()
-            for child in self._children:
-                decorator(child).decorate()
+            for thing in [self] + self._children:
+                decoration = decorator(thing)
+                decoration.decorate()
+                self._decorations.append(decoration)
 
     def find_bounding_box(self):
         """ Compute the bounding box of the Thing """
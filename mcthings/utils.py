@@ -5,9 +5,12 @@ import logging
 from datetime import datetime
 
 import mcpi
+import numpy as np
 from mcpi.vec3 import Vec3
 from nbt.nbt import NBTFile, TAG_List, TAG_Int, TAG_Short, TAG_Byte_Array, TAG_String
 
+from mcthings.schematic_formats import SCHEMATIC_FORMAT, SPONGE_FORMAT, build_litematic_nbt, build_sponge_nbt, \
+    legacy_block_ids
 from mcthings.world import World
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(message)s')
@@ -39,30 +42,11 @@ def extract_region(init_pos, end_pos):
 
     blocks = World.renderer.get_blocks(Vec3(init_pos.x, init_pos.y, init_pos.z),
                                        Vec3(end_pos.x, end_pos.y, end_pos.z))
-    blocks_list = list(blocks)
+    blocks = np.fromiter(blocks, dtype=np.int64, count=size.x * size.y * size.z)
 
     # The order in getBlocks is z, x, y and for a Schematic it must be x, z, y
-    block_list_ordered = []
-
-    for y in range(0, size.y):
-        x_by_z = []  # x, z plane for y
-
-        for x in range(0, size.x):
-            z_row = []
-            for z in range(0, size.z):
-                z_row.append(blocks_list[(x * size.z + z) + (size.x * size.z) * y])
-            x_by_z.append(z_row)
-
-        for z in range(0, size.z):
-            for x in range(0, size.x):
-                block_list_ordered.append(x_by_z[x][z])
-
-    # Create the data_bytes
-    data_bytes = bytearray()
-    blocks_bytes = bytearray()
-    for i in range(0, len(block_list_ordered)):
-        blocks_bytes.append(block_list_ordered[i])
-        data_bytes.append(0)
+    blocks_bytes = bytearray(legacy_block_ids(blocks).reshape(size.y, size.x, size.z).transpose(0, 2, 1).tobytes())
+    data_bytes = bytearray(len(blocks_bytes))
 
     return blocks_bytes, data_bytes
 
@@ -91,7 +75,7 @@ def extract_region_with_data(init_pos, end_pos):
     return blocks_bytes, data_bytes
 
 
-def build_schematic_nbt(init_pos, end_pos, block_data=False, memory_data=None):
+def build_schematic_nbt(init_pos, end_pos, block_data=False, memory_data=None, file_format=SCHEMATIC_FORMAT):
     """
     Creates a NBT Object with the schematic data
 
@@ -99,12 +83,28 @@ def build_schematic_nbt(init_pos, end_pos, block_data=False, memory_data=None):
     :param end_pos: end position for extracting the Schematic
     :param block_data: extract blocks ids and data (much slower)
     :param memory_data: get blocks from memory
+    :param file_format: SCHEMATIC_FORMAT, SPONGE_FORMAT or LITEMATIC_FORMAT
 
 
     :return: The NBT object with the Schematic
     """
     size = size_region(init_pos, end_pos)
 
+    if file_format != SCHEMATIC_FORMAT:
+        if memory_data:
+            ids, data = memory_data.to_block_arrays(init_pos, end_pos)
+        else:
+            # Convert the extracted blocks in x -> z -> y order to arrays indexed [x, y, z]
+            nbtfile = build_schematic_nbt(init_pos, end_pos, block_data)
+            shape = (size.y, size.z, size.x)
+            ids = np.frombuffer(bytes(nbtfile["Blocks"].value), dtype=np.uint8).reshape(shape).transpose(2, 0, 1)
+            data = np.frombuffer(bytes(nbtfile["Data"].value), dtype=np.uint8).reshape(shape).transpose(2, 0, 1)
+
+        if file_format == SPONGE_FORMAT:
+            return build_sponge_nbt(ids, data)
+
+        return build_litematic_nbt(ids, data)
+
     # Profiling of Schematics export
     app_init = datetime.now()
     logging.info("Schematic: Exporting blocks: %i" % (size.x * size.y * size.z))
@@ -151,6 +151,21 @@ def build_schematic_nbt(init_pos, end_pos, block_data=False, memory_data=None):
     return nbtfile
 
 
+def merge_boxes(init_pos, end_pos, other_init_pos, other_end_pos):
+    """
+    Find the box including two boxes
+
+    :param init_pos: min vertex of the first box
+    :param end_pos: max vertex of the first box
+    :param other_init_pos: min vertex of the other box
+    :param other_end_pos: max vertex of the other box
+    :return: min vertex, max vertex
+    """
+
+    return Vec3(min(init_pos.x, other_init_pos.x), min(init_pos.y, other_init_pos.y), min(init_pos.z, other_init_pos.z)), \
+        Vec3(max(end_pos.x, other_end_pos.x), max(end_pos.y, other_end_pos.y), max(end_pos.z, other_end_pos.z))
+
+
 def find_min_max_cuboid_vertex(vertex, vertex_opposite):
     """
     Find the min vertex and the max vertex for a given cuboid
@@ -1,28 +1,180 @@
 # Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
 # Author/s (©): Alvaro del Castillo
 
-from math import sqrt
-
-import chunk
 import logging
+import struct
 
 import mcpi.block
+import numpy as np
 from mcpi.vec3 import Vec3
 
+from mcthings.blocks_memory import EMPTY_BLOCK_ID
+from mcthings.color_quantizer import BLOCK_COLORS, hex_to_rgb
 from mcthings.thing import Thing
+from mcthings.utils import merge_boxes
+
+VOX_VERSIONS = [150, 200]
+""" VOX file versions supported """
+
+VOXEL_DTYPE = np.dtype([('x', np.uint8), ('y', np.uint8), ('z', np.uint8), ('color_index', np.int16)])
+""" x, y, z position and palette index of a voxel """
+
+
+def iter_vox_chunks(vox_data, offset=0):
+    """
+    Iterate over the chunks in the VOX data without entering the children chunks
+
+    -------------------------------------------------------------------------------
+    # Bytes  | Type       | Value
+    -------------------------------------------------------------------------------
+    1x4      | char       | chunk id
+    4        | int        | num bytes of chunk content (N)
+    4        | int        | num bytes of children chunks (M)
+    N        |            | chunk content
+    M        |            | children chunks
+    -------------------------------------------------------------------------------
+
+    :param vox_data: memoryview with the VOX data
+    :param offset: position of the first chunk
+    :return: generator of (chunk id, memoryview with the chunk content, memoryview with the children chunks)
+    """
+
+    while offset + 12 <= len(vox_data):
+        chunk_id = bytes(vox_data[offset:offset + 4]).decode("utf-8")
+        content_size, children_size = struct.unpack_from("<ii", vox_data, offset + 4)
+        content_start = offset + 12
+        children_start = content_start + content_size
+        offset = children_start + children_size
+        if offset > len(vox_data):
+            raise RuntimeError("Truncated VOX chunk %s" % chunk_id)
+
+        yield chunk_id, vox_data[content_start:children_start], vox_data[children_start:offset]
+
+
+def vox_rotation(rotation):
+    """
+    Decode a VOX rotation byte into a rotation matrix. The matrix has one 1 or -1 in each row:
+    bits 0-1 are its column in the first row, bits 2-3 in the second one and bits 4-6 its signs.
+
+    :param rotation: the rotation byte
+    :return: 3x3 int numpy array with the rotation matrix
+    """
+
+    column_first = rotation & 0x03
+    column_second = (rotation >> 2) & 0x03
+    columns = [column_first, column_second, 3 - column_first - column_second]
+
+    matrix = np.zeros((3, 3), dtype=np.int64)
+    for row in range(0, 3):
+        matrix[row, columns[row]] = -1 if rotation & (1 << (4 + row)) else 1
+
+    return matrix
+
+
+class VoxModel:
+    """ A model in a VOX file. The voxels are decoded the first time they are used """
+
+    def __init__(self, size, xyzi_content):
+        self.size = size
+        """ size x, y, z of the model """
+        self._xyzi_content = xyzi_content
+        self._voxels = None
+
+    @property
+    def voxels(self):
+        """ numpy record array with the x, y, z and color_index of the voxels """
+        if self._voxels is None:
+            """
+            -------------------------------------------------------------------------------
+            # Bytes  | Type       | Value
+            -------------------------------------------------------------------------------
+            4        | int        | numVoxels (N)
+            4 x N    | int        | (x, y, z, colorIndex) : 1 byte for each component
+            -------------------------------------------------------------------------------
+            """
+            n_voxels = struct.unpack_from("<i", self._xyzi_content)[0]
+            voxels_bytes = np.frombuffer(self._xyzi_content, dtype=np.uint8, count=4 * n_voxels,
+                                         offset=4).reshape(-1, 4)
+            self._voxels = np.recarray(n_voxels, dtype=VOXEL_DTYPE)
+            self._voxels.x = voxels_bytes[:, 0]
+            self._voxels.y = voxels_bytes[:, 1]
+            self._voxels.z = voxels_bytes[:, 2]
+            # color [0-254] are mapped to palette index [1-255]
+            self._voxels.color_index = voxels_bytes[:, 3].astype(np.int16) - 1
+            self._xyzi_content = None
+
+        return self._voxels
 
 
-class Voxel:
-    def __init__(self, bytes):
-        self.x = bytes[0]
-        self.y = bytes[1]
-        self.z = bytes[2]
-        self.color_index = bytes[3] - 1
+class VoxInstance:
+    """ A model placed in the VOX scene """
+
+    def __init__(self, model_index, rotation, translation):
+        self.model_index = model_index
+        """ index of the model in the VOX file """
+        self.rotation = rotation
+        """ 3x3 rotation matrix """
+        self.translation = translation
+        """ translation of the center of the model """
+
+
+def read_vox_dict(content, offset=0):
+    """
+    Read a DICT from VOX chunk content: the number of entries and the key and value STRINGs
+
+    :param content: memoryview with the chunk content
+    :param offset: position of the DICT
+    :return: dict with the entries and the position after the DICT
+    """
+
+    vox_dict = {}
+    entries = struct.unpack_from("<i", content, offset)[0]
+    offset += 4
+
+    for i in range(0, entries):
+        strings = []
+        for j in range(0, 2):
+            size = struct.unpack_from("<i", content, offset)[0]
+            strings.append(bytes(content[offset + 4:offset + 4 + size]).decode("utf-8"))
+            offset += 4 + size
+        vox_dict[strings[0]] = strings[1]
+
+    return vox_dict, offset
+
+
+def redmean_distances(colors, target_colors):
+    """
+    Distances between colors using the "redmean" metric: https://www.compuphase.com/cmetric.htm
+
+    :param colors: int array with the RGB colors (one row per color)
+    :param target_colors: int array with the RGB colors to compare with
+    :return: float array with the distance from each color (rows) to each target color (columns)
+    """
+
+    red_mean = (colors[:, None, 0] + target_colors[None, :, 0]) / 2
+    diff = colors[:, None, :] - target_colors[None, :, :]
+    red = np.round((512 + red_mean) * diff[:, :, 0] ** 2).astype(np.int64) >> 8
+    blue = np.round((767 - red_mean) * diff[:, :, 2] ** 2).astype(np.int64) >> 8
+
+    return np.sqrt(red + 4.0 * diff[:, :, 1] ** 2 + blue)
+
+
+def nearest_colors(colors, color_block=mcpi.block.WOOL):
+    """
+    Find the nearest color of a block for each color
+
+    :param colors: int array with the RGB colors (one row per color)
+    :param color_block: block with the colors to use (a BLOCK_COLORS one)
+    :return: array with the block data of the nearest block color for each color
+    """
+
+    distances = redmean_distances(colors, hex_to_rgb(BLOCK_COLORS[color_block.id]))
+
+    return np.argmin(distances, axis=1).astype(np.uint8)
 
 
 class Color:
     """ RGBA format palette """
-    _color2minecraft = {}  # Cache to convert a color to minecraft color
 
     def __init__(self, hex_str):
         self.hex_str = hex_str
@@ -35,61 +187,11 @@ class Color:
         return red, green, blue
 
     def compare(self, color):
-        # https://www.compuphase.com/cmetric.htm
-        r1, g1, b1 = self.rgb()
-        r2, g2, b2 = color.rgb()
-
-        read_mean = (r1 + r2) / 2
-        r = r1 - r2
-        g = g1 - g2
-        b = b1 - b2
-        return sqrt((round((512 + read_mean) * r * r) >> 8) + 4.0 * g * g + (round((767 - read_mean) * b * b) >> 8))
-
-    def minecraft(self):
-        # https://gaming.stackexchange.com/questions/47212/what-are-the-color-values-for-dyed-wool
-        mc_colors = [
-            ("White", "e4e4e4"),
-            ("Orange", "ea7e35"),
-            ("Magenta", "be49c9"),
-            ("Light Blue", "6387d2"),
-            ("Yellow", "c2b51c"),
-            ("Lime", "39ba2e"),
-            ("Pink", "d98199"),
-            ("Grey", "414141"),
-            ("Light grey", "a0a7a7"),
-            ("Cyan", "267191"),
-            ("Purple", "7e34bf"),
-            ("Blue", "253193"),
-            ("Brown", "56331c"),
-            ("Green", "364b18"),
-            ("Red", "9e2b27"),
-            ("Black", "181414")
-        ]
-
-        mc_color_number = {}
-        mc_colors_hex = {}
-        for i in range(0, len(mc_colors)):
-            mc_color_number[mc_colors[i][1]] = i
-            mc_colors_hex[mc_colors[i][1]] = mc_colors[i][0]
-
-        # Find the closest Minecraft color
-        rgb = self.hex_str[0:6]
-        dist = float('inf')
-        if rgb in mc_colors_hex:
-            # Direct mapping
-            color = rgb
-        elif rgb in Color._color2minecraft:
-            # Color already mapped
-            color = Color._color2minecraft[rgb]
-        else:
-            for mc_color in mc_colors_hex:
-                cdist = self.compare(Color(mc_color))
-                if cdist < dist:
-                    dist = cdist
-                    color = mc_color
-            self._color2minecraft[rgb] = color
+        return float(redmean_distances(np.array([self.rgb()]), np.array([color.rgb()]))[0, 0])
 
-        return mc_color_number[color]
+    def minecraft(self, color_block=mcpi.block.WOOL):
+        """ Find the closest color of color_block (wool by default) """
+        return int(nearest_colors(np.array([self.rgb()]), color_block)[0])
 
 
 class VoxDefaultPalette:
@@ -150,175 +252,152 @@ class VoxDefaultPalette:
 class Vox(Thing):
     file_path = None
     """ file path for the MagicaVoxel vox file """
+    model_indexes = None
+    """ indexes of the models to create (all if None) """
+    color_block = mcpi.block.WOOL
+    """ block used for the voxels colors: WOOL, STAINED_GLASS, TERRACOTTA or CONCRETE """
+    quantizer = None
+    """ ColorQuantizer used to find the blocks for the voxels colors (color_block ones if None) """
+    dithering = None
+    """ dither the voxels colors with the quantizer: ORDERED_DITHERING or FLOYD_STEINBERG_DITHERING """
+
+    @property
+    def voxels(self):
+        """ voxels of the first model in the VOX file """
+        if not self.models:
+            return np.recarray(0, dtype=VOXEL_DTYPE)
+
+        return self.models[0].voxels
 
     def parse_vox_file(self):
         if not self.file_path:
-            RuntimeError("Missing file_path param")
+            raise RuntimeError("Missing file_path param")
 
-        self.voxels = []
+        self.models = []
+        self.instances = []
         self.palette = []
         self.materials = []
+        self._model_memories = {}
+        self._palette_blocks = None
 
         # Read the vox data in RIFF format
-        # https://github.com/python/cpython/blob/3.8/Lib/chunk.py
-        vox_file = open(self.file_path, "rb")
-        vox_chunk = chunk.Chunk(vox_file, bigendian=False)
-        chunk_name = vox_chunk.getname().decode("utf-8")
-        if chunk_name != 'VOX ':
+        with open(self.file_path, "rb") as vox_file:
+            vox_data = memoryview(vox_file.read())
+
+        if bytes(vox_data[0:4]) != b'VOX ':
             raise RuntimeError('File %s is not a VOX file' % self.file_path)
-        version = vox_chunk.chunksize
-        if version != 150:
+        version = struct.unpack_from("<i", vox_data, 4)[0]
+        if version not in VOX_VERSIONS:
             raise RuntimeError('File %s has a not supported VOX version %i' % (self.file_path, version))
-        # Let's read chunks
-        """
-        2. Chunk Structure
-        -------------------------------------------------------------------------------
-        # Bytes  | Type       | Value
-        -------------------------------------------------------------------------------
-        1x4      | char       | chunk id
-        4        | int        | num bytes of chunk content (N)
-        4        | int        | num bytes of children chunks (M)      
-        N        |            | chunk content
-        M        |            | children chunks
-        -------------------------------------------------------------------------------
-        """
-        # MAIN Chunk
-        main_chunk = chunk.Chunk(vox_file, bigendian=False)
-        # Pass last 4 bytes for MAIN Chunk with children chunks
-        vox_file.seek(vox_file.tell() + 4)
-
-        # SIZE CHUNK
-        """
-        -------------------------------------------------------------------------------
-        # Bytes  | Type       | Value
-        -------------------------------------------------------------------------------
-        4        | int        | size x
-        4        | int        | size y
-        4        | int        | size z : gravity direction
-        -------------------------------------------------------------------------------
-        """
-        size_chunk = chunk.Chunk(vox_file, bigendian=False)
-        vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-        x = size_chunk.read(4)
-        y = size_chunk.read(4)
-        z = size_chunk.read(4)
 
-        # XYZI voxels
-        """
-        -------------------------------------------------------------------------------
-        # Bytes  | Type       | Value
-        -------------------------------------------------------------------------------
-        4        | int        | numVoxels (N)
-        4 x N    | int        | (x, y, z, colorIndex) : 1 byte for each component
-        -------------------------------------------------------------------------------
-        """
-        xyzi_chunk = chunk.Chunk(vox_file, bigendian=False)
-        vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-        n_voxels_bytes = xyzi_chunk.read(4)
-        n_voxels = int.from_bytes(n_voxels_bytes, "little")
-        for i in range(0, n_voxels):
-            self.voxels.append(Voxel(xyzi_chunk.read(4)))
-        # Transform or palette chunk or no more chunk if default palette
-        try:
-            transform_chunk = chunk.Chunk(vox_file, bigendian=False)
-        except EOFError:
-            transform_chunk = None
-            logging.info("Legacy vox file with default palette")
-        if transform_chunk and transform_chunk.chunkname.decode("utf-8") == "nTRN":
-            vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-            transform_chunk.skip()
-
-            group_chunk = chunk.Chunk(vox_file, bigendian=False)
-            vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-            group_chunk.skip()
-
-            transform_chunk = chunk.Chunk(vox_file, bigendian=False)
-            vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-            # transform_chunk.skip()  # it is skipping 1 byte in the next chunk
-            vox_file.read(transform_chunk.getsize())
-
-            shape_chunk = chunk.Chunk(vox_file, bigendian=False)
-            vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-            vox_file.read(shape_chunk.getsize())
-
-            # Layers chunk
-            NUM_LAYERS = 8  # By default
-            for i in range(0, NUM_LAYERS):
-                layer_chunk = chunk.Chunk(vox_file, bigendian=False)
-                vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-                vox_file.read(layer_chunk.getsize())
-            """
-            7. Chunk id 'RGBA' : palette
-            -------------------------------------------------------------------------------
-            # Bytes  | Type       | Value
-            -------------------------------------------------------------------------------
-            4 x 256  | int        | (R, G, B, A) : 1 byte for each component
-                                  | * <NOTICE>
-                                  | * color [0-254] are mapped to palette index [1-255], e.g : 
-                                  | 
-                                  | for ( int i = 0; i <= 254; i++ ) {
-                                  |     palette[i + 1] = ReadRGBA(); 
-                                  | }
-            -------------------------------------------------------------------------------
-            """
-            rgba_chunk = chunk.Chunk(vox_file, bigendian=False)
-            vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-        else:
-            rgba_chunk = transform_chunk
-            vox_file.seek(vox_file.tell() + 4)  # notice
-        if rgba_chunk:
-            if rgba_chunk.getname().decode("utf-8") != 'RGBA':
-                raise RuntimeError('VOX format not supported (multimodel?)')
-            for i in range(0, round(rgba_chunk.getsize() / 4)):
-                # RGBA
-                color_bytes = rgba_chunk.read(1) + rgba_chunk.read(1) + rgba_chunk.read(1) + rgba_chunk.read(1)
-                self.palette.append(Color(color_bytes.hex()))
+        main_chunks = list(iter_vox_chunks(vox_data, 8))
+        if not main_chunks or main_chunks[0][0] != 'MAIN':
+            raise RuntimeError('File %s has no MAIN chunk' % self.file_path)
+
+        size = None
+        nodes = {}
+        hidden_layers = set()
+
+        for chunk_id, content, children in iter_vox_chunks(main_chunks[0][2]):
+            if chunk_id == 'SIZE':
+                size = struct.unpack_from("<3i", content)
+            elif chunk_id == 'XYZI':
+                # The voxels are decoded only for the models used
+                self.models.append(VoxModel(size, content))
+            elif chunk_id == 'nTRN':
+                # node id, attributes, child node id, reserved id, layer id, frames and frames attributes
+                node_id = struct.unpack_from("<i", content)[0]
+                attributes, offset = read_vox_dict(content, 4)
+                child_id, reserved_id, layer_id, n_frames = struct.unpack_from("<4i", content, offset)
+                frame = {}
+                if n_frames:
+                    frame, offset = read_vox_dict(content, offset + 16)
+                nodes[node_id] = (chunk_id, attributes, [child_id], layer_id, frame)
+            elif chunk_id == 'nGRP':
+                # node id, attributes, children nodes ids
+                node_id = struct.unpack_from("<i", content)[0]
+                attributes, offset = read_vox_dict(content, 4)
+                n_children = struct.unpack_from("<i", content, offset)[0]
+                children_ids = list(struct.unpack_from("<%ii" % n_children, content, offset + 4))
+                nodes[node_id] = (chunk_id, attributes, children_ids, None, None)
+            elif chunk_id == 'nSHP':
+                # node id, attributes, models ids with its attributes
+                node_id = struct.unpack_from("<i", content)[0]
+                attributes, offset = read_vox_dict(content, 4)
+                n_models = struct.unpack_from("<i", content, offset)[0]
+                offset += 4
+                model_ids = []
+                for i in range(0, n_models):
+                    model_ids.append(struct.unpack_from("<i", content, offset)[0])
+                    model_attributes, offset = read_vox_dict(content, offset + 4)
+                nodes[node_id] = (chunk_id, attributes, model_ids, None, None)
+            elif chunk_id == 'LAYR':
+                layer_id = struct.unpack_from("<i", content)[0]
+                attributes, offset = read_vox_dict(content, 4)
+                if attributes.get('_hidden') == '1':
+                    hidden_layers.add(layer_id)
+            elif chunk_id == 'RGBA':
+                # (R, G, B, A) : 1 byte for each component
+                colors = np.frombuffer(content, dtype=np.uint8).reshape(-1, 4)
+                self.palette = [Color(colors[i].tobytes().hex()) for i in range(0, len(colors))]
+            elif chunk_id == 'MATL':
+                # Material id and DICT with the properties: _type (_diffuse, _metal, _glass, _emit) ...
+                material_properties, offset = read_vox_dict(content, 4)
+                self.materials.append(material_properties.get('_type', '_diffuse'))
+
+        if 0 in nodes:
+            self._add_instances(nodes, hidden_layers, 0, np.identity(3, dtype=np.int64), np.zeros(3, dtype=np.int64))
         else:
-            # Default palette
+            # Files without scene graph: all the models at the origin
+            for model_index in range(0, len(self.models)):
+                self.instances.append(VoxInstance(model_index, np.identity(3, dtype=np.int64),
+                                                  np.array(self.models[model_index].size) // 2))
+
+        if self.instances:
+            # The first model keeps the voxels positions of its file, as in the files without
+            # scene graph: the inverse of its transform is applied to all the instances
+            first = self.instances[0]
+            inverse = first.rotation.T
+            first_translation = first.translation
+            center = np.array(self.models[first.model_index].size) // 2
+            for instance in self.instances:
+                instance.rotation = inverse @ instance.rotation
+                instance.translation = inverse @ (instance.translation - first_translation) + center
+
+        if not self.palette:
+            logging.info("Legacy vox file with default palette")
             for i in range(0, len(VoxDefaultPalette.palette)):
                 color = VoxDefaultPalette.palette[i].replace('0x', '')
                 # Convert ABGR to RGBA
                 color = color[::-1]
                 self.palette.append(Color(color))
 
-        # Read the materials palette
-        """
-        (4) Material Chunk : "MATL"
-
-        int32	: material id
-        DICT	: material properties
-                    (_type : str) _diffuse, _metal, _glass, _emit
-                    (_weight : float) range 0 ~ 1
-                    (_rough : float)
-                    (_spec : float)
-                    (_ior : float)
-                    (_att : float)
-                    (_flux : float)
-                    (_plastic)
-        """
-        # One material per each color
-        for i in range(0, len(self.palette)):
-            try:
-                materials_chunk = chunk.Chunk(vox_file, bigendian=False)
-                if materials_chunk.getname().decode("utf-8") != 'MATL':
-                    logging.info("Material data not found")
-                    break
-                else:
-                    vox_file.seek(vox_file.tell() + 4)  # number of children chunks
-                    material_id = int.from_bytes(materials_chunk.read(4), "little")
-                    dict_entries_len = int.from_bytes(materials_chunk.read(4), "little")
-                    # Read the _type key from dict
-                    key_str_len = int.from_bytes(materials_chunk.read(4), "little")
-                    key_str = materials_chunk.read(key_str_len).decode('utf-8')
-                    value_str_len = int.from_bytes(materials_chunk.read(4), "little")
-                    value_str = materials_chunk.read(value_str_len).decode('utf-8')
-                    self.materials.append(value_str)
-                    materials_chunk.skip()
-                    if materials_chunk.tell() > materials_chunk.getsize():
-                        vox_file.seek(vox_file.tell() - 1)  # Hack: not sure why skip goes 1 byte more
-            except EOFError:
-                logging.info("Material data not found")
-                break
+        if not self.materials:
+            logging.info("Material data not found")
+
+    def _add_instances(self, nodes, hidden_layers, node_id, rotation, translation):
+        """ Walk the scene graph from node_id adding the instances of the models found """
+
+        node_type, attributes, children_ids, layer_id, frame = nodes[node_id]
+
+        if attributes.get('_hidden') == '1':
+            return
+
+        if node_type == 'nTRN':
+            if layer_id in hidden_layers:
+                return
+            # The transforms of the parents are applied after the node one
+            if '_t' in frame:
+                translation = translation + rotation @ np.array(frame['_t'].split(), dtype=np.int64)
+            if '_r' in frame:
+                rotation = rotation @ vox_rotation(int(frame['_r']))
+        elif node_type == 'nSHP':
+            for model_index in children_ids:
+                self.instances.append(VoxInstance(model_index, rotation, translation))
+            return
+
+        for child_id in children_ids:
+            self._add_instances(nodes, hidden_layers, child_id, rotation, translation)
 
     @classmethod
     def find_minecraft_material(cls, material):
@@ -329,29 +408,122 @@ class Vox(Thing):
             mc_material = mcpi.block.IRON_BLOCK
         return mc_material
 
-    def create(self):
-
-        self.parse_vox_file()
-
-        for voxel in self.voxels:
-            voxel_color = self.palette[voxel.color_index]
-            minecraft_material = None
-            if self.materials:
-                minecraft_material = self.find_minecraft_material(self.materials[voxel.color_index])
-            minecraft_color = voxel_color.minecraft()
+    def palette_blocks(self):
+        """
+        Find the block for each color in the palette. It is computed once per palette,
+        so the block of a voxel is found indexing the arrays with its color index.
 
-            # y, z are the reverse in vox format
-            pos = Vec3(self.position.x + voxel.x,
-                       self.position.y + voxel.z,
-                       self.position.z + voxel.y
-                      )
+        :return: arrays with the block id and the block data for each palette color
+        """
 
+        if self._palette_blocks is None:
+            n_colors = len(self.palette)
             if self.block == self._block_empty:
-                self.set_block(pos, self._block_empty)
-            elif minecraft_material:
-                self.set_block(pos, minecraft_material.id)
+                block_ids = np.full(n_colors, self._block_empty.id, dtype=np.uint16)
+                block_data = np.zeros(n_colors, dtype=np.uint8)
+            elif self.quantizer:
+                block_ids, block_data = self.quantizer.quantize(hex_to_rgb([color.hex_str for color in self.palette]))
             else:
-                self.set_block(pos, mcpi.block.WOOL.id, minecraft_color)
+                block_ids = np.full(n_colors, self.color_block.id, dtype=np.uint16)
+                block_data = nearest_colors(hex_to_rgb([color.hex_str for color in self.palette]), self.color_block)
+
+            if self.block != self._block_empty:
+                for color_index in range(0, min(n_colors, len(self.materials))):
+                    minecraft_material = self.find_minecraft_material(self.materials[color_index])
+                    if minecraft_material:
+                        block_ids[color_index] = minecraft_material.id
+                        block_data[color_index] = 0
+
+            self._palette_blocks = (block_ids, block_data)
+
+        return self._palette_blocks
+
+    def _voxels_to_memory(self, blocks_memory, positions, color_indexes):
+        """
+        Add the voxels to a blocks memory
+
+        :param blocks_memory: memory in which to add the blocks
+        :param positions: int array with the x, y, z vox positions of the voxels (one row per voxel)
+        :param color_indexes: array with the palette index of the voxels
+        :return:
+        """
+
+        block_ids, block_data = self.palette_blocks()
+
+        # y, z are the reverse in vox format
+        positions = positions[:, [0, 2, 1]]
+        init = positions.min(axis=0)
+        shape = tuple((positions.max(axis=0) - init + 1).tolist())
+
+        ids = np.full(shape, EMPTY_BLOCK_ID, dtype=np.uint16)
+        data = np.zeros(shape, dtype=np.uint8)
+        index = tuple((positions - init).T)
+        ids[index] = block_ids[color_indexes]
+        data[index] = block_data[color_indexes]
+
+        if self.quantizer and self.dithering and self.block != self._block_empty:
+            # The voxels with a material block are not dithered
+            colored = np.isin(block_ids[color_indexes], self.quantizer.block_ids)
+            palette_rgb = hex_to_rgb([color.hex_str for color in self.palette])
+            colored_index = tuple((positions[colored] - init).T)
+            ids[colored_index], data[colored_index] = self.quantizer.dither(
+                positions[colored], palette_rgb[color_indexes[colored]], self.dithering)
+
+        blocks_memory.set_arrays(self.position + Vec3(*init.tolist()), ids, data)
+
+    def model_memory(self, model_index):
+        """
+        Get the blocks of a model in the VOX file, without the scene transforms, at the
+        position of the Thing. The model voxels are decoded the first time it is used.
+
+        :param model_index: index of the model in the VOX file
+        :return: the BlocksMemory with the model blocks
+        """
+
+        if not hasattr(self, 'models'):
+            self.parse_vox_file()
+
+        if model_index not in self._model_memories:
+            voxels = self.models[model_index].voxels
+            blocks_memory = self.blocks_memory_class(final_state=True)
+            if len(voxels):
+                positions = np.stack((voxels.x, voxels.y, voxels.z), axis=1).astype(np.int64)
+                self._voxels_to_memory(blocks_memory, positions, voxels.color_index)
+            self._model_memories[model_index] = blocks_memory
+
+        return self._model_memories[model_index]
+
+    def find_bounding_box(self):
+        """ The scene transforms can place blocks before the position of the Vox """
+
+        if self._blocks_memory.is_empty():
+            return self.position, self.end_position
+
+        return merge_boxes(*self._blocks_memory.find_init_end_pos(), self.position, self.end_position)
+
+    def create(self):
+
+        self.parse_vox_file()
+
+        # Only the voxels of the models used are decoded
+        positions = []
+        color_indexes = []
+        for instance in self.instances:
+            if self.model_indexes is not None and instance.model_index not in self.model_indexes:
+                continue
+            model = self.models[instance.model_index]
+            voxels = model.voxels
+            model_positions = np.stack((voxels.x, voxels.y, voxels.z), axis=1).astype(np.int64)
+            model_positions -= np.array(model.size) // 2
+            positions.append(model_positions @ instance.rotation.T + instance.translation)
+            color_indexes.append(voxels.color_index)
+
+        if not positions or not sum(len(model_positions) for model_positions in positions):
+            return
+
+        # The scene transforms can place blocks before the position: it is not changed, and the
+        # memory export includes them
+        self._voxels_to_memory(self._blocks_memory, np.concatenate(positions), np.concatenate(color_indexes))
 
         init_pos, end_pos = self._blocks_memory.find_init_end_pos()
         self._end_position = end_pos
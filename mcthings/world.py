@@ -41,6 +41,24 @@ class World:
         for scene in cls.scenes:
             scene.build()
 
+    @classmethod
+    async def build_async(cls, renderer, executor=None):
+        """
+        Build all the scenes inside the world concurrently with an AsyncRenderer.
+        The things of all the scenes are rendered in the same order than in build().
+
+        :param renderer: the AsyncRenderer
+        :param executor: concurrent.futures.Executor for creating the things (the default one if None)
+        :return:
+        """
+
+        from mcthings.scene import build_things_async
+
+        await build_things_async([thing for scene in cls.scenes for thing in scene.things], renderer, executor)
+        for scene in [scene for scene in cls.scenes if scene.things]:
+            (min_pos, max_pos) = scene.find_bounding_box()
+            scene._end_position = max_pos
+
     @classmethod
     def unbuild(cls):
         """ Unbuild all the scenes inside the world """
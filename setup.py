@@ -48,7 +48,8 @@ setup(
     install_requires=[
         'mcpi',
         'minecraftstuff',
-        'nbt'
+        'nbt',
+        'numpy'
     ],
     scripts=[
           'bin/vox2schematic'
@@ -2,6 +2,7 @@
 # Author (©): Alvaro del Castillo
 
 import logging
+import os
 import sys
 import unittest
 
@@ -11,6 +12,7 @@ from mcthings.renderers.raspberry_pi import _Server
 
 from mcthings.renderers.raspberry_pi import RaspberryPi
 from mcthings.world import World
+from mcpi_server import McpiServer
 
 
 class TestBaseThing(unittest.TestCase):
@@ -21,9 +23,18 @@ class TestBaseThing(unittest.TestCase):
     MC_SEVER_HOST = "localhost"
     MC_SEVER_PORT = 4711
 
+    MC_SERVER_STANDIN = os.environ.get("MCTHINGS_STANDIN_SERVER")
+    """ use the in memory mcpi server instead of a Minecraft server if set """
+    standin_server = None
+
     @classmethod
     def setUpClass(cls):
 
+        if cls.MC_SERVER_STANDIN and not TestBaseThing.standin_server:
+            TestBaseThing.standin_server = McpiServer(cls.MC_SEVER_HOST, 0).start()
+        if TestBaseThing.standin_server:
+            cls.MC_SEVER_PORT = TestBaseThing.standin_server.port
+
         try:
             World.renderer = RaspberryPi(cls.MC_SEVER_HOST, cls.MC_SEVER_PORT)
         except mcpi.connection.RequestError:
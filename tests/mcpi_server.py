@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import argparse
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.renderers.memory import MemoryRenderer
+from mcthings.utils import find_min_max_cuboid_vertex, size_region
+
+PLAYER_ID = 1
+""" entity id of the only player in the server """
+
+
+class McpiServer:
+    """
+    Server speaking the mcpi text protocol with the world kept in memory, so the
+    Raspberry Pi renderer can be tested and measured without a Minecraft server.
+
+    The latency is added to each command and the bandwidth limits the bytes
+    received and sent, so a remote server can be simulated.
+    """
+
+    def __init__(self, host="localhost", port=0, latency=0.0, bandwidth=None):
+        """
+        Create the server. It does not accept connections until it is started.
+
+        :param host: host in which to listen
+        :param port: port in which to listen (0 to use a free one)
+        :param latency: seconds used to execute each command
+        :param bandwidth: bytes per second received and sent (no limit if None)
+        """
+
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+        self.world = MemoryRenderer()
+        """ the world in memory in which the commands are executed """
+        self.commands = Counter()
+        """ number of commands received for each command name """
+        self.received_bytes = 0
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """ Start the server in a new thread. It returns once the server accepts connections. """
+
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def serve():
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+
+        return self
+
+    def stop(self):
+        """ Stop the server and close its connections """
+
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _transfer_delay(self, size):
+        return size / self.bandwidth if self.bandwidth else 0
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                # Complete the lines before executing them
+                while not data.endswith(b"\n"):
+                    more = await reader.read(65536)
+                    if not more:
+                        break
+                    data += more
+                self.received_bytes += len(data)
+
+                answers = []
+                lines = data.decode("cp437").splitlines()
+                for line in lines:
+                    answer = self.execute(line)
+                    if answer is not None:
+                        answers.append(answer + "\n")
+                answer_data = "".join(answers).encode("cp437")
+
+                # One wait for all the commands received together
+                delay = self.latency * len(lines) + self._transfer_delay(len(data) + len(answer_data))
+                if delay:
+                    await asyncio.sleep(delay)
+
+                if answer_data:
+                    writer.write(answer_data)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def execute(self, line):
+        """
+        Execute a command of the mcpi protocol
+
+        :param line: the command with its arguments, i.e. world.setBlock(0,0,0,1)
+        :return: the answer to the command (None if the command has no answer)
+        """
+
+        name, _, args = line.partition("(")
+        args = args[:-1] if args.endswith(")") else args
+        self.commands[name] += 1
+
+        if name == "chat.post":
+            self.world.post_to_chat(args)
+            return None
+
+        args = args.split(",") if args else []
+
+        try:
+            if name == "world.setBlock":
+                x, y, z = [int(float(arg)) for arg in args[0:3]]
+                self.set_blocks(Vec3(x, y, z), Vec3(x, y, z), *[int(arg) for arg in args[3:5]])
+            elif name == "world.setBlocks":
+                coords = [int(float(arg)) for arg in args[0:6]]
+                self.set_blocks(Vec3(*coords[0:3]), Vec3(*coords[3:6]), *[int(arg) for arg in args[6:8]])
+            elif name == "world.getBlock":
+                return str(self.world.get_block(Vec3(*[int(float(arg)) for arg in args[0:3]])))
+            elif name == "world.getBlockWithData":
+                block = self.world.get_block_with_data(Vec3(*[int(float(arg)) for arg in args[0:3]]))
+                return "%i,%i" % (block.id, block.data)
+            elif name == "world.getBlocks":
+                coords = [int(float(arg)) for arg in args[0:6]]
+                return ",".join(str(block_id) for block_id in
+                                self.world.get_blocks(Vec3(*coords[0:3]), Vec3(*coords[3:6])))
+            elif name in ["world.getPlayerId", "world.getPlayerIds"]:
+                return str(PLAYER_ID)
+            elif name in ["player.getTile", "entity.getTile", "player.getPos", "entity.getPos"]:
+                pos = self.world.get_pos(PLAYER_ID)
+                return "%i,%i,%i" % (pos.x, pos.y, pos.z)
+            elif ".get" in name:
+                logging.warning("Unknown command %s", line)
+                return "Fail"
+        except (ValueError, IndexError):
+            logging.warning("Bad command %s", line)
+            return "Fail" if ".get" in name else None
+
+        return None
+
+    def set_blocks(self, vertex, vertex_opposite, block_id, block_data=0):
+        """ Fill the cuboid between the vertexes with a block """
+
+        vertex_min, vertex_max = find_min_max_cuboid_vertex(vertex, vertex_opposite)
+        size = size_region(vertex_min, vertex_max)
+        shape = (size.x, size.y, size.z)
+
+        self.world.world.set_arrays(vertex_min, np.full(shape, block_id, dtype=np.uint16),
+                                    np.full(shape, block_data, dtype=np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mcpi protocol server with the world in memory")
+    parser.add_argument('--host', default="localhost")
+    parser.add_argument('--port', type=int, default=4711)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds used to execute each command')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second received and sent')
+    args = parser.parse_args()
+
+    server = McpiServer(args.host, args.port, args.latency, args.bandwidth).start()
+    logging.info("Listening in %s:%i", args.host, server.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    main()
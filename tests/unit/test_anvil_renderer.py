@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import tempfile
+import unittest
+
+import mcpi.block
+from mcpi.vec3 import Vec3
+from nbt.region import RegionFile
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.house import House
+from mcthings.renderers.anvil import AnvilRenderer
+from mcthings.renderers.memory import MemoryRenderer
+from mcthings.scene import Scene
+from mcthings.world import World
+
+
+class TestAnvilRenderer(unittest.TestCase):
+    """Test the renderer writing Anvil region files"""
+
+    def setUp(self):
+        self.world_dir = tempfile.TemporaryDirectory()
+        self.renderer = World.renderer
+        self.scene = Scene()
+
+    def tearDown(self):
+        World.renderer = self.renderer
+        World.scenes.remove(self.scene)
+        self.world_dir.cleanup()
+
+    def test_render(self):
+        renderer = AnvilRenderer(self.world_dir.name)
+        memory = BlocksMemory()
+        memory.set_block(Vec3(-1, 64, 5), mcpi.block.WOOL.id, 14)
+        memory.set_block(Vec3(600, 0, 0), mcpi.block.STONE.id)
+        renderer.render(memory)
+        renderer.close()
+
+        assert sorted(os.listdir(os.path.join(self.world_dir.name, "region"))) == ["r.-1.0.mca", "r.1.0.mca"]
+        region = RegionFile(os.path.join(self.world_dir.name, "region", "r.-1.0.mca"))
+        chunk = region.get_nbt(31, 0)
+        assert chunk["Level"]["xPos"].value == -1
+        assert [section["Y"].value for section in chunk["Level"]["Sections"].tags] == [4]
+        # Height of the column x=15 (-1 in the world), z=5
+        assert chunk["Level"]["HeightMap"].value[5 * 16 + 15] == 65
+        region.close()
+
+        # The region files are read again when the renderer is opened
+        renderer = AnvilRenderer(self.world_dir.name)
+        assert renderer.get_block_with_data(Vec3(-1, 64, 5)) == mcpi.block.Block(mcpi.block.WOOL.id, 14)
+        assert renderer.get_block(Vec3(600, 0, 0)) == mcpi.block.STONE.id
+        assert renderer.get_block(Vec3(0, 64, 5)) == mcpi.block.AIR.id
+
+        # Existing sections are updated
+        memory = BlocksMemory()
+        memory.set_block(Vec3(-1, 65, 5), mcpi.block.DIRT.id)
+        renderer.render(memory)
+        renderer.close()
+        renderer = AnvilRenderer(self.world_dir.name)
+        assert renderer.get_block(Vec3(-1, 64, 5)) == mcpi.block.WOOL.id
+        assert renderer.get_block(Vec3(-1, 65, 5)) == mcpi.block.DIRT.id
+
+    def test_regions_cache(self):
+        renderer = AnvilRenderer(self.world_dir.name, max_regions=1)
+        for region_x in range(0, 3):
+            memory = BlocksMemory()
+            memory.set_block(Vec3(region_x * 512, 0, 0), mcpi.block.STONE.id)
+            renderer.render(memory)
+            assert len(renderer._regions) == 1
+
+        # The evicted regions are written to disk
+        for region_x in range(0, 3):
+            assert renderer.get_block(Vec3(region_x * 512, 0, 0)) == mcpi.block.STONE.id
+        renderer.close()
+
+    def test_build(self):
+        World.renderer = AnvilRenderer(self.world_dir.name)
+        house = House(Vec3(10, 60, -10), scene=self.scene)
+        house.build()
+        anvil_blocks = World.renderer.get_blocks(house.position, house.end_position)
+        World.renderer.close()
+
+        World.renderer = MemoryRenderer()
+        house.build()
+        assert anvil_blocks == World.renderer.get_blocks(house.position, house.end_position)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import asyncio
+import logging
+import unittest
+
+import mcpi.block
+from mcpi.vec3 import Vec3
+
+from mcthings.house import House
+from mcthings.line import Line
+from mcthings.renderers.async_raspberry_pi import AsyncRaspberryPi
+from mcthings.renderers.memory import MemoryRenderer
+from mcthings.scene import Scene
+from mcthings.sphere import Sphere
+from mcthings.wall import Wall
+from mcthings.world import World
+from mcpi_server import McpiServer
+
+
+class TestAsyncRenderer(unittest.TestCase):
+    """Test the asyncio renderer and the concurrent builds"""
+
+    def setUp(self):
+        self.server = McpiServer().start()
+        self.renderer = World.renderer
+        self.scene = Scene()
+
+    def tearDown(self):
+        World.renderer = self.renderer
+        World.scenes.remove(self.scene)
+        self.server.stop()
+
+    def test_requests(self):
+        async def requests():
+            renderer = await AsyncRaspberryPi("localhost", self.server.port).connect()
+            wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+            wall.create()
+            await wall.render_async(renderer)
+
+            # Several requests at the same time get their own answers
+            answers = await asyncio.gather(renderer.get_block(Vec3(0, 0, 0)),
+                                           renderer.get_block_with_data(Vec3(0, 10, 0)),
+                                           renderer.get_blocks(Vec3(0, 0, 0), Vec3(1, 0, 0)),
+                                           renderer.get_pos("player"))
+            await renderer.post_to_chat("Async wall built")
+            await renderer.close()
+            return answers
+
+        block_id, block, blocks, pos = asyncio.run(requests())
+        assert block_id == Wall.block.id
+        assert block == mcpi.block.Block(mcpi.block.AIR.id, 0)
+        assert blocks == [Wall.block.id] * 2
+        assert pos == Vec3(0, 0, 0)
+
+    def test_build_async_drawing(self):
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        Sphere(Vec3(20, 0, 0), scene=self.scene)
+
+        async def build():
+            renderer = await AsyncRaspberryPi("localhost", self.server.port).connect()
+            try:
+                await self.scene.build_async(renderer)
+            finally:
+                await renderer.close()
+
+        # Nothing is built when a thing can't be built
+        with self.assertRaises(RuntimeError):
+            asyncio.run(build())
+        assert World.renderer is self.renderer
+        assert self.server.world.get_block(wall.position) == mcpi.block.AIR.id
+
+    def test_build_async(self):
+        # The things overlap, so the render order matters. Line reads the world.
+        house = House(Vec3(0, 0, 0), scene=self.scene)
+        wall = Wall(Vec3(2, 0, 2), scene=self.scene)
+        wall.block = mcpi.block.WOOL
+        line = Line(Vec3(3, 1, 3), scene=self.scene)
+
+        async def build():
+            renderer = await AsyncRaspberryPi("localhost", self.server.port).connect()
+            await self.scene.build_async(renderer)
+            await renderer.close()
+
+        asyncio.run(build())
+        assert World.renderer is self.renderer
+        # Line takes the block below as its empty block, so the wall was rendered before creating it
+        assert line._block_empty.id == mcpi.block.WOOL.id
+
+        async_blocks = self.server.world.get_blocks(house.position, Vec3(15, 10, 15))
+
+        World.renderer = MemoryRenderer()
+        for thing in self.scene.things:
+            thing.reset()
+        self.scene.build()
+        assert async_blocks == World.renderer.get_blocks(house.position, Vec3(15, 10, 15))
+        assert self.scene.end_position is not None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
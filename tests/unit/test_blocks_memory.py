@@ -4,6 +4,8 @@
 # Author (©): Alvaro del Castillo
 
 import logging
+import os
+import tempfile
 import unittest
 
 from mcpi.vec3 import Vec3
@@ -12,6 +14,8 @@ from nbt import nbt
 from mcthings.blocks import Blocks
 from mcthings.blocks_memory import BlocksMemory, BlockMemory
 from mcthings.collage import Collage
+from mcthings.house import House
+from mcthings.pyramid import Pyramid, PyramidHollow
 from mcthings.schematic import Schematic
 from mcthings.vox import Vox
 
@@ -26,7 +30,7 @@ class TestBlocksMemory(unittest.TestCase):
 
     def test_add_block(self):
         mem = BlocksMemory()
-        mem.add(BlockMemory(0, 0, 0))
+        mem.add(BlockMemory(0, 0, Vec3(0, 0, 0)))
         assert len(mem.blocks) == 1
 
     def test_find_init_end_pos(self):
@@ -143,6 +147,87 @@ class TestBlocksMemory(unittest.TestCase):
 
         block = mem.find_block_at_pos(pos)
         assert block.id == block_id and block.data == block_data
+        assert mem.has_block_at_pos(pos)
+        assert not mem.has_block_at_pos(Vec3(3, 2, 1))
+
+        # The index is updated with the blocks added after a search
+        mem.set_block(Vec3(3, 2, 1), block_id, block_data)
+        assert mem.has_block_at_pos(Vec3(3, 2, 1))
+
+    def test_find_block_at_pos_overwritten(self):
+        mem = BlocksMemory()
+        pos = Vec3(1, 1, 1)
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(2, 2, 2), 45)
+        # The last block written in a position is the one found
+        overwritten = mem.set_block(pos, 0)
+        assert overwritten.id == 45
+        assert mem.set_block(Vec3(5, 5, 5), 0) is None
+        assert mem.find_block_at_pos(pos).id == 0
+
+    def test_find_block_at_pos_transformed(self):
+        mem = BlocksMemory()
+        mem.set_block(Vec3(1, 0, 0), 1)
+        mem.find_block_at_pos(Vec3(1, 0, 0))
+
+        # The index follows the blocks after rotating and flipping them
+        mem.rotate(90, Vec3(0, 0, 0))
+        assert not mem.has_block_at_pos(Vec3(1, 0, 0))
+        assert mem.find_block_at_pos(Vec3(0, 0, 1)).id == 1
+
+        mem.flip_x(Vec3(-2, 0, 0))
+        assert not mem.has_block_at_pos(Vec3(0, 0, 1))
+        assert mem.find_block_at_pos(Vec3(-4, 0, 1)).id == 1
+
+    def test_transforms_copy_positions(self):
+        mem = BlocksMemory()
+        pos = Vec3(1, 2, 3)
+        mem.set_block(pos, 1)
+        mem.set_block(Vec3(2, 2, 3), 2)
+
+        # The positions of the blocks are not modified in place
+        mem.flip_x(Vec3(0, 0, 0))
+        mem.rotate(180, Vec3(0, 0, 0))
+        mem.translate(Vec3(0, 1, 0))
+        assert pos == Vec3(1, 2, 3)
+        assert mem.find_block_at_pos(Vec3(1, 3, -3)).id == 1
+        assert mem.find_block_at_pos(Vec3(2, 3, -3)).id == 2
+
+        mem.flip_y(Vec3(0, 1, 0))
+        mem.flip_z(Vec3(0, 0, -3))
+        assert mem.find_block_at_pos(Vec3(2, -1, -3)).id == 2
+
+    def test_final_state(self):
+        mem = BlocksMemory(final_state=True)
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(2, 2, 2), 45)
+        mem.set_blocks(Vec3(1, 0, 1), Vec3(1, 1, 1), 0)
+        # Only the last block in each position is kept
+        assert len(mem.blocks) == 27
+        assert mem.find_block_at_pos(Vec3(1, 1, 1)).id == 0
+        assert mem.find_block_at_pos(Vec3(1, 2, 1)).id == 45
+
+        # Things only keep the final state of their blocks
+        house = House(Vec3(0, 0, 0))
+        house.create()
+        assert len(house._blocks_memory.blocks) == house.length * house.height * house.width
+
+        # The inner air pyramid replaces blocks of the outer one
+        pyramid = PyramidHollow(Vec3(0, 0, 0))
+        pyramid.create()
+        outer = Pyramid(Vec3(0, 0, 0))
+        outer.height = pyramid.height
+        outer.create()
+        assert len(pyramid._blocks_memory.blocks) == len(outer._blocks_memory.blocks)
+
+    def test_compact(self):
+        mem = BlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(2, 2, 2), 45)
+        mem.set_blocks(Vec3(1, 0, 1), Vec3(1, 1, 1), 0)
+        assert len(mem.blocks) == 29
+
+        mem.compact()
+        assert len(mem.blocks) == 27
+        assert mem.find_block_at_pos(Vec3(1, 1, 1)).id == 0
+        assert mem.blocks[-1].id == 0
 
     def test_memory_to_nbt(self):
         # Load a schematic and count the number of blocks in the NBT structure
@@ -166,6 +251,36 @@ class TestBlocksMemory(unittest.TestCase):
 
         assert number_wool_colors == alien_colors
 
+    def test_to_schematic(self):
+        vox = Vox(Vec3(-3, 2, 5))
+        vox.file_path = "vox/alien_engi1a.vox"
+        vox.create()
+        mem = vox._blocks_memory
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        init_pos = init_pos - Vec3(1, 1, 1)
+
+        # Compare with exporting the blocks cell by cell in Schematic order: x -> z -> y
+        blocks_bytes = bytearray()
+        data_bytes = bytearray()
+        for y in range(init_pos.y, end_pos.y + 1):
+            for z in range(init_pos.z, end_pos.z + 1):
+                for x in range(init_pos.x, end_pos.x + 1):
+                    block = mem.find_block_at_pos(Vec3(x, y, z))
+                    blocks_bytes.append(block.id if block else 0)
+                    data_bytes.append(block.data if block else 0)
+
+        assert mem.to_nbt(init_pos, end_pos) == (blocks_bytes, data_bytes)
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "alien.schematic")
+            vox.to_schematic(file_path, from_memory=True)
+            data = nbt.NBTFile(file_path, 'rb')
+            init_pos, end_pos = mem.find_init_end_pos()
+            assert (data["Width"].value, data["Height"].value, data["Length"].value) == \
+                   tuple(end_pos - init_pos + Vec3(1, 1, 1))
+            assert bytearray(data["Blocks"].value) == mem.to_nbt(init_pos, end_pos)[0]
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import unittest
+
+import mcpi.block
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.color_quantizer import ColorQuantizer, BLOCK_COLORS, CONCRETE, ORDERED_DITHERING, \
+    FLOYD_STEINBERG_DITHERING, FLOYD_STEINBERG_WEIGHTS, bayer_thresholds, hex_to_rgb, srgb_to_lab
+from mcthings.vox import Vox
+
+
+class TestColorQuantizer(unittest.TestCase):
+    """Test the quantization of colors to blocks"""
+
+    def test_srgb_to_lab(self):
+        lab = srgb_to_lab([[255, 255, 255], [0, 0, 0], [255, 0, 0]])
+        assert np.allclose(lab[0], [100, 0, 0], atol=0.01)
+        assert np.allclose(lab[1], [0, 0, 0], atol=0.01)
+        assert np.allclose(lab[2], [53.24, 80.09, 67.20], atol=0.01)
+
+    def test_quantize(self):
+        quantizer = ColorQuantizer()
+        assert len(quantizer.colors) == 4 * 16
+
+        # The blocks colors are mapped to themselves
+        block_ids, block_data = quantizer.quantize(hex_to_rgb(BLOCK_COLORS[CONCRETE.id]))
+        assert (block_ids == CONCRETE.id).all()
+        assert block_data.tolist() == list(range(0, 16))
+
+        wool_quantizer = ColorQuantizer([mcpi.block.WOOL])
+        block_ids, block_data = wool_quantizer.quantize([[0xe4, 0xe4, 0xe4], [0x20, 0x30, 0xa0]])
+        assert block_ids.tolist() == [mcpi.block.WOOL.id] * 2
+        assert block_data.tolist() == [0, 11]  # white and blue
+
+    def test_dither(self):
+        quantizer = ColorQuantizer([mcpi.block.WOOL])
+        positions = np.stack(np.meshgrid(np.arange(8), np.arange(8), np.arange(8), indexing='ij'), axis=-1)
+        positions = positions.reshape(-1, 3)
+        # A gray between the white and the black wool
+        rgb = np.full((len(positions), 3), 0x7a)
+
+        assert len(np.unique(quantizer.quantize(rgb)[1])) == 1
+        for method in [ORDERED_DITHERING, FLOYD_STEINBERG_DITHERING]:
+            block_ids, block_data = quantizer.dither(positions, rgb, method)
+            assert len(block_ids) == len(positions)
+            assert len(np.unique(block_data)) > 1
+
+        with self.assertRaises(RuntimeError):
+            quantizer.dither(positions, rgb, "unknown")
+
+    def test_floyd_steinberg(self):
+        quantizer = ColorQuantizer()
+        random = np.random.default_rng(0)
+        positions = np.stack(np.meshgrid(np.arange(12), np.arange(5), np.arange(9), indexing='ij'), axis=-1)
+        positions = positions.reshape(-1, 3)
+        positions = positions[random.random(len(positions)) < 0.7] + np.array([-3, 2, 5])
+        rgb = random.integers(0, 256, (len(positions), 3))
+
+        block_ids, block_data = quantizer.dither(positions, rgb, FLOYD_STEINBERG_DITHERING)
+
+        # Same blocks than diffusing the error voxel by voxel, from the bottom layer row by row
+        voxels = {tuple(position): index for index, position in enumerate(positions.tolist())}
+        colors = rgb.astype(np.float64)
+        candidates = np.empty(len(positions), dtype=np.int64)
+        for voxel in np.lexsort((positions[:, 0], positions[:, 2], positions[:, 1])).tolist():
+            color = np.clip(colors[voxel], 0, 255)
+            candidates[voxel] = quantizer.candidates(np.rint(color)[None, :])[0]
+            error = color - quantizer.colors[candidates[voxel]]
+            x, y, z = positions[voxel].tolist()
+            for (dx, dy, dz), weight in FLOYD_STEINBERG_WEIGHTS:
+                neighbour = voxels.get((x + dx, y + dy, z + dz))
+                if neighbour is not None:
+                    colors[neighbour] += weight * error
+
+        assert (block_ids == quantizer.block_ids[candidates]).all()
+        assert (block_data == quantizer.block_data[candidates]).all()
+
+    def test_bayer_thresholds(self):
+        positions = np.stack(np.meshgrid(np.arange(4), np.arange(4), np.arange(4), indexing='ij'), axis=-1)
+        thresholds = bayer_thresholds(positions.reshape(-1, 3))
+        assert sorted(thresholds.tolist()) == [i / 64 - 0.5 for i in range(0, 64)]
+
+    def test_vox_quantizer(self):
+        vox = Vox(Vec3(0, 0, 0))
+        vox.file_path = "vox/vxs.vox"
+        vox.quantizer = ColorQuantizer([CONCRETE])
+        vox.dithering = ORDERED_DITHERING
+        vox.create()
+
+        block = vox._blocks_memory.find_block_at_pos(Vec3(1, 0, 0))
+        assert block.id == CONCRETE.id
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import unittest
+
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.house import House
+from mcthings.pyramid import Pyramid
+from mcthings.renderers.cuboids_planner import plan_cuboids
+from mcthings.sparse_blocks_memory import SparseBlocksMemory
+from mcthings.vox import Vox
+
+
+class TestCuboidsPlanner(unittest.TestCase):
+    """Test the split of memories in cuboids"""
+
+    @staticmethod
+    def cuboids_blocks(cuboids):
+        # Expand the cuboids to the blocks they render
+        blocks = {}
+        for cuboid in cuboids:
+            for x in range(cuboid.init_pos.x, cuboid.end_pos.x + 1):
+                for y in range(cuboid.init_pos.y, cuboid.end_pos.y + 1):
+                    for z in range(cuboid.init_pos.z, cuboid.end_pos.z + 1):
+                        assert (x, y, z) not in blocks
+                        blocks[(x, y, z)] = (cuboid.id, cuboid.data)
+        return blocks
+
+    @staticmethod
+    def memory_blocks(memory):
+        blocks = {}
+        for block in memory.blocks:
+            blocks[(block.pos.x, block.pos.y, block.pos.z)] = (block.id, block.data if block.data else 0)
+        return blocks
+
+    def test_cuboid(self):
+        mem = BlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(9, 4, 9), 1)
+        cuboids = plan_cuboids(mem)
+        assert len(cuboids) == 1
+        assert cuboids[0].size() == 500
+
+        assert plan_cuboids(BlocksMemory()) == []
+
+    def test_things(self):
+        house = House(Vec3(0, 0, 0))
+        house.create()
+        cuboids = plan_cuboids(house._blocks_memory)
+        assert self.cuboids_blocks(cuboids) == self.memory_blocks(house._blocks_memory)
+        assert len(cuboids) < len(house._blocks_memory.blocks) / 4
+
+        pyramid = Pyramid(Vec3(0, 0, 0))
+        pyramid.create()
+        cuboids = plan_cuboids(pyramid._blocks_memory)
+        assert self.cuboids_blocks(cuboids) == self.memory_blocks(pyramid._blocks_memory)
+        assert len(cuboids) == pyramid.height
+
+        vox = Vox(Vec3(0, 0, 0))
+        vox.file_path = "vox/alien_engi1a.vox"
+        vox.create()
+        cuboids = plan_cuboids(vox._blocks_memory)
+        assert self.cuboids_blocks(cuboids) == self.memory_blocks(vox._blocks_memory)
+
+    def test_sparse(self):
+        mem = SparseBlocksMemory()
+        mem.set_blocks(Vec3(-10, 0, 0), Vec3(40, 0, 0), 1)
+        mem.set_block(Vec3(100, 100, 100), 35, 4)
+        cuboids = plan_cuboids(mem)
+        assert self.cuboids_blocks(cuboids) == self.memory_blocks(mem)
+        # One cuboid for each section
+        assert len(cuboids) == 5
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
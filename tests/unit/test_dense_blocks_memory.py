@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.dense_blocks_memory import DenseBlocksMemory
+from mcthings.schematic import Schematic
+from mcthings.sparse_blocks_memory import SparseBlocksMemory
+from mcthings.vox import Vox
+
+
+class TestDenseBlocksMemory(unittest.TestCase):
+    """Test DenseBlocksMemory"""
+
+    @staticmethod
+    def load_vox(memory):
+        # Copy the blocks from a not cuboid vox model
+        alien = Vox(Vec3(0, 0, 0))
+        alien.file_path = "vox/alien_engi1a.vox"
+        alien.create()
+        for block in alien._blocks_memory.blocks:
+            memory.set_block(Vec3(block.pos.x, block.pos.y, block.pos.z), block.id, block.data)
+
+        return memory
+
+    @staticmethod
+    def blocks_set(memory):
+        return set((b.pos.x, b.pos.y, b.pos.z, b.id, b.data) for b in memory.blocks)
+
+    def test_set_block(self):
+        mem = DenseBlocksMemory()
+        assert mem.find_init_end_pos() == (None, None)
+
+        mem.set_block(Vec3(1, 0, 0), 1, 0)
+        mem.set_block(Vec3(-5, 3, 10), 35, 14)
+        assert len(mem.blocks) == 2
+
+        block = mem.find_block_at_pos(Vec3(-5, 3, 10))
+        assert block.id == 35 and block.data == 14
+        assert mem.find_block_at_pos(Vec3(0, 0, 0)) is None
+        assert mem.find_block_at_pos(Vec3(100, 0, 0)) is None
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert init_pos == Vec3(-5, 0, 0)
+        assert end_pos == Vec3(1, 3, 10)
+
+    def test_set_blocks(self):
+        mem = DenseBlocksMemory()
+        # 3 x 2 x 2 = 12 blocks
+        mem.set_blocks(Vec3(2, 1, 1), Vec3(0, 0, 0), 1)
+        assert len(mem.blocks) == 12
+        assert mem.is_cuboid()
+        assert mem.memory_equal()
+
+        # The last block written in a position is the one kept
+        mem.set_blocks(Vec3(1, 0, 0), Vec3(1, 1, 1), 0)
+        assert len(mem.blocks) == 12
+        assert mem.find_block_at_pos(Vec3(1, 1, 1)).id == 0
+        assert not mem.memory_equal()
+
+    def test_is_cuboid(self):
+        assert not self.load_vox(DenseBlocksMemory()).is_cuboid()
+
+    def test_rotate(self):
+        for degrees in [90, 180, 270]:
+            mem = self.load_vox(BlocksMemory())
+            dense_mem = self.load_vox(DenseBlocksMemory())
+
+            mem.rotate(degrees, Vec3(3, 0, 2))
+            dense_mem.rotate(degrees, Vec3(3, 0, 2))
+
+            assert self.blocks_set(mem) == self.blocks_set(dense_mem)
+
+    def test_flip_x(self):
+        for position in [Vec3(0, 0, 0), Vec3(4, 0, 0), Vec3(30, 0, 0)]:
+            mem = self.load_vox(BlocksMemory())
+            dense_mem = self.load_vox(DenseBlocksMemory())
+
+            mem.flip_x(position)
+            dense_mem.flip_x(position)
+
+            assert mem.find_init_end_pos() == dense_mem.find_init_end_pos()
+            assert len(self.blocks_set(dense_mem)) <= len(mem.blocks)
+
+    def test_flip_y_z(self):
+        for position in [Vec3(0, 0, 0), Vec3(4, 5, 3), Vec3(30, 30, 30)]:
+            mem = self.load_vox(BlocksMemory(final_state=True))
+            dense_mem = self.load_vox(DenseBlocksMemory())
+
+            mem.flip_y(position)
+            dense_mem.flip_y(position)
+            mem.flip_z(position)
+            dense_mem.flip_z(position)
+
+            assert self.blocks_set(mem) == self.blocks_set(dense_mem)
+
+    def test_translate(self):
+        mem = self.load_vox(BlocksMemory())
+        dense_mem = self.load_vox(DenseBlocksMemory())
+
+        mem.translate(Vec3(-7, 3, 20))
+        dense_mem.translate(Vec3(-7, 3, 20))
+
+        assert self.blocks_set(mem) == self.blocks_set(dense_mem)
+        assert mem.find_init_end_pos() == dense_mem.find_init_end_pos()
+
+    def test_to_nbt(self):
+        mem = self.load_vox(BlocksMemory())
+        dense_mem = self.load_vox(DenseBlocksMemory())
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert mem.to_nbt(init_pos, end_pos) == dense_mem.to_nbt(init_pos, end_pos)
+
+        # A region bigger than the memory is filled with air
+        blocks_bytes, data_bytes = dense_mem.to_nbt(Vec3(-1, -1, -1), end_pos)
+        assert len(blocks_bytes) == (end_pos.x + 2) * (end_pos.y + 2) * (end_pos.z + 2)
+        assert blocks_bytes[0] == 0
+
+    def test_save_load(self):
+        mem = self.load_vox(BlocksMemory(final_state=True))
+
+        with tempfile.TemporaryDirectory() as memory_dir:
+            file_path = os.path.join(memory_dir, "alien.mem")
+            mem.save(file_path)
+
+            # The arrays are mapped from the file
+            dense_mem = DenseBlocksMemory.load(file_path)
+            assert isinstance(dense_mem._ids, np.memmap)
+            assert self.blocks_set(dense_mem) == self.blocks_set(mem)
+            assert dense_mem.find_init_end_pos() == mem.find_init_end_pos()
+
+            # Changes in memory are not written to the file
+            dense_mem.set_block(Vec3(0, 0, 0), 1)
+            dense_mem.set_block(Vec3(-5, 0, 0), 1)
+            assert self.blocks_set(DenseBlocksMemory.load(file_path)) == self.blocks_set(mem)
+
+            # Positions relative to a base position
+            mem.save(file_path, Vec3(1, 2, 3))
+            for memory_class in [BlocksMemory, SparseBlocksMemory, DenseBlocksMemory]:
+                loaded_mem = memory_class.load(file_path, Vec3(11, 12, 13))
+                mem_init, mem_end = mem.find_init_end_pos()
+                assert loaded_mem.find_init_end_pos() == (mem_init + Vec3(10, 10, 10), mem_end + Vec3(10, 10, 10))
+                assert len(loaded_mem.blocks) == len(mem.blocks)
+
+            DenseBlocksMemory().save(file_path)
+            assert DenseBlocksMemory.load(file_path).is_empty()
+
+    def test_schematic(self):
+        alien = Schematic(Vec3(0, 0, 0))
+        alien.file_path = "schematics/alien_engi1a.schematic"
+        alien.create()
+
+        assert isinstance(alien._blocks_memory, DenseBlocksMemory)
+        assert alien._blocks_memory.is_cuboid()
+        assert alien._blocks_memory.find_init_end_pos() == alien.find_bounding_box()
+
+        # Load the schematic in a list memory changing the air blocks
+        class ListSchematic(Schematic):
+            blocks_memory_class = BlocksMemory
+            change_blocks = {0: 20}
+
+        list_alien = ListSchematic(Vec3(0, 0, 0))
+        list_alien.file_path = alien.file_path
+        list_alien.create()
+
+        ids, data = alien._blocks_memory.to_arrays(alien.position, alien.end_position)
+        ids[ids == 0] = 20
+        list_ids, list_data = list_alien._blocks_memory.to_arrays(alien.position, alien.end_position)
+        assert (ids == list_ids).all() and (data == list_data).all()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
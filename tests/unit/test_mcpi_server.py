@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import time
+import unittest
+
+import mcpi.block
+from mcpi.minecraft import Minecraft
+from mcpi.vec3 import Vec3
+
+from mcthings.house import House
+from mcthings.renderers.raspberry_pi import RaspberryPi
+from mcthings.scene import Scene
+from mcthings.sphere import Sphere
+from mcthings.world import World
+from mcpi_server import McpiServer
+
+
+class TestMcpiServer(unittest.TestCase):
+    """Test the mcpi protocol server with the world in memory"""
+
+    def setUp(self):
+        self.server = McpiServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_commands(self):
+        mc = Minecraft.create(port=self.server.port)
+        mc.setBlock(1, 2, 3, mcpi.block.WOOL.id, 14)
+        mc.setBlocks(0, 0, 0, -1, 1, -1, mcpi.block.STONE.id)
+        mc.postToChat("Hello, world")
+
+        assert mc.getBlockWithData(1, 2, 3) == mcpi.block.Block(mcpi.block.WOOL.id, 14)
+        assert mc.getBlock(-1, 1, -1) == mcpi.block.STONE.id
+        assert list(mc.getBlocks(0, 0, 0, 1, 0, 0)) == [mcpi.block.STONE.id, mcpi.block.AIR.id]
+        assert mc.player.getTilePos() == Vec3(0, 0, 0)
+        assert self.server.world.chat == ["Hello, world"]
+        assert self.server.commands["world.setBlocks"] == 1
+
+    def test_renderer(self):
+        renderer = World.renderer
+        scene = Scene()
+        try:
+            World.renderer = RaspberryPi("localhost", self.server.port)
+            house = House(Vec3(0, 0, 0), scene=scene)
+            house.build()
+
+            blocks = list(World.renderer.get_blocks(house.position, house.end_position))
+            memory_blocks = self.server.world.get_blocks(house.position, house.end_position)
+            assert blocks == memory_blocks
+            assert World.renderer.get_block(house.position) == house.block.id
+            # The cuboids are rendered with setBlocks
+            assert self.server.commands["world.setBlocks"] > 0
+        finally:
+            World.renderer = renderer
+            World.scenes.remove(scene)
+
+    def test_move_sphere(self):
+        renderer = World.renderer
+        scene = Scene()
+        try:
+            World.renderer = RaspberryPi("localhost", self.server.port)
+            sphere = Sphere(Vec3(0, 0, 0), scene=scene)
+            sphere.build()
+            assert World.renderer.get_block(Vec3(sphere.radius, sphere.radius - 1, sphere.radius)) == \
+                sphere.block.id
+
+            sphere.move(Vec3(20, 0, 0))
+
+            # The Sphere is drawn again in the new position
+            assert sphere.end_position == Vec3(20 + 2 * sphere.radius, 2 * sphere.radius, 2 * sphere.radius)
+            assert World.renderer.get_block(Vec3(20 + sphere.radius, sphere.radius - 1, sphere.radius)) == \
+                sphere.block.id
+        finally:
+            World.renderer = renderer
+            World.scenes.remove(scene)
+
+    def test_latency(self):
+        self.server.latency = 0.02
+        mc = Minecraft.create(port=self.server.port)
+
+        start = time.time()
+        for i in range(0, 3):
+            mc.getBlock(0, 0, 0)
+        assert time.time() - start >= 3 * 0.02
+
+    def test_bandwidth(self):
+        self.server.bandwidth = 1000
+        mc = Minecraft.create(port=self.server.port)
+
+        start = time.time()
+        mc.getBlocks(0, 0, 0, 9, 4, 0)  # 50 blocks: about 125 bytes
+        assert time.time() - start >= 0.1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
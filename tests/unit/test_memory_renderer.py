@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import unittest
+
+import mcpi.block
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.house import House
+from mcthings.renderers.memory import MemoryRenderer
+from mcthings.scene import Scene
+from mcthings.utils import extract_region, extract_region_with_data
+from mcthings.wall import Wall
+from mcthings.world import World
+
+
+class TestMemoryRenderer(unittest.TestCase):
+    """Test the MemoryRenderer"""
+
+    def setUp(self):
+        self.renderer = World.renderer
+        World.renderer = MemoryRenderer()
+        self.scene = Scene()
+
+    def tearDown(self):
+        World.renderer = self.renderer
+        World.scenes.remove(self.scene)
+
+    def test_render(self):
+        wall = Wall(Vec3(-5, 0, -5), scene=self.scene)
+        wall.block = mcpi.block.WOOL
+        wall.build()
+
+        end_pos = Vec3(-5 + wall.length - 1, wall.height - 1, -5 + wall.width - 1)
+        assert World.renderer.get_block(Vec3(-5, 0, -5)) == mcpi.block.WOOL.id
+        assert World.renderer.get_block(end_pos) == mcpi.block.WOOL.id
+        assert World.renderer.get_block(end_pos + Vec3(0, 1, 0)) == mcpi.block.AIR.id
+        assert World.renderer.stats.blocks == wall.length * wall.width * wall.height
+
+        wall.unbuild()
+        assert World.renderer.get_block(Vec3(-5, 0, -5)) == mcpi.block.AIR.id
+
+    def test_block_data(self):
+        memory = BlocksMemory()
+        memory.set_block(Vec3(1, 2, 3), mcpi.block.WOOL.id, 14)
+        memory.set_block(Vec3(1, 2, 3), mcpi.block.WOOL.id, 11)
+        World.renderer.render(memory)
+
+        # The last block rendered in a position is the one kept
+        assert World.renderer.get_block_with_data(Vec3(1, 2, 3)) == mcpi.block.Block(mcpi.block.WOOL.id, 11)
+
+    def test_get_blocks(self):
+        memory = BlocksMemory()
+        memory.set_block(Vec3(1, 0, 0), mcpi.block.STONE.id)
+        memory.set_block(Vec3(0, 1, 0), mcpi.block.DIRT.id)
+        memory.set_block(Vec3(0, 0, 1), mcpi.block.WOOL.id)
+        World.renderer.render(memory)
+
+        # Same order than the server: y -> x -> z
+        blocks = World.renderer.get_blocks(Vec3(1, 1, 1), Vec3(0, 0, 0))
+        assert blocks == [0, mcpi.block.WOOL.id, mcpi.block.STONE.id, 0, mcpi.block.DIRT.id, 0, 0, 0]
+
+    def test_extract_region(self):
+        house = House(Vec3(10, 0, 10), scene=self.scene)
+        house.build()
+        init_pos, end_pos = house.position, house.end_position
+
+        # The blocks extracted from the renderer are the blocks in memory
+        blocks_bytes, data_bytes = extract_region(init_pos, end_pos)
+        blocks_with_data_bytes, data_bytes = extract_region_with_data(init_pos, end_pos)
+        memory_blocks_bytes, memory_data_bytes = house._blocks_memory.to_nbt(init_pos, end_pos)
+        assert blocks_bytes == memory_blocks_bytes
+        assert blocks_with_data_bytes == memory_blocks_bytes
+        assert data_bytes == memory_data_bytes
+
+    def test_plan_stats(self):
+        World.renderer = MemoryRenderer(plan=True)
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        wall.build()
+
+        assert World.renderer.stats.blocks == wall.length * wall.width * wall.height
+        assert World.renderer.stats.commands == 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import socket
+import threading
+import time
+import unittest
+
+from mcpi.vec3 import Vec3
+
+from mcthings.house import House
+from mcthings.renderers.raspberry_pi import RaspberryPi, _Server
+
+
+class RecordServer:
+    """ TCP server recording the data received in all the connections (it answers 0 to getBlock) """
+
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(("localhost", 0))
+        self.socket.listen()
+        self.port = self.socket.getsockname()[1]
+        self.received = []
+        self.writes = 0
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            connection, address = self.socket.accept()
+            threading.Thread(target=self.read, args=(connection,), daemon=True).start()
+
+    def read(self, connection):
+        pending = b""
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                break
+            self.writes += 1
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.startswith(b"world.getBlock("):
+                    connection.sendall(b"0\n")
+                else:
+                    self.received.append(line + b"\n")
+
+    def lines(self, expected):
+        # Wait until the expected lines are received
+        for i in range(0, 100):
+            lines = b"".join(self.received).splitlines()
+            if len(lines) >= expected:
+                break
+            time.sleep(0.01)
+        return lines
+
+
+class TestRaspberryPi(unittest.TestCase):
+    """Test the RaspberryPi renderer without a Minecraft server"""
+
+    def test_batch(self):
+        record_server = RecordServer()
+        server = _Server("localhost", record_server.port, batch_size=3)
+
+        for x in range(0, 5):
+            server.send(b"world.setBlock", x, 0, 0, 1, 0)
+        # Only full batches are sent until the flush
+        assert len(record_server.lines(3)) == 3
+        server.flush()
+
+        lines = record_server.lines(5)
+        assert lines[4] == b"world.setBlock(4,0,0,1,0)"
+        assert record_server.writes <= 2
+
+    def test_render(self):
+        record_server = RecordServer()
+        renderer = RaspberryPi("localhost", record_server.port)
+        stats = []
+        renderer.stats_hook = stats.append
+
+        house = House(Vec3(0, 0, 0))
+        house.create()
+        renderer.render(house._blocks_memory)
+
+        lines = record_server.lines(stats[0].commands)
+        assert len(lines) == stats[0].commands
+        assert stats[0].blocks == len(house._blocks_memory.blocks)
+        assert all(line.startswith(b"world.setBlock") for line in lines)
+
+    def test_render_connections(self):
+        record_server = RecordServer()
+        renderer = RaspberryPi("localhost", record_server.port, connections=3)
+        stats = []
+        renderer.stats_hook = stats.append
+
+        house = House(Vec3(0, 0, 0))
+        house.width = house.length = 20
+        house.create()
+        renderer.render(house._blocks_memory)
+
+        # All the commands are executed when render finishes
+        lines = b"".join(record_server.received).splitlines()
+        assert len(lines) == stats[0].commands
+        assert len(renderer.servers) == 3
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.renderers.renderer import Renderer
+from mcthings.schematic import Schematic, SCHEMATIC_CACHE_SIZE, _parse_schematic, load_schematic
+from mcthings.schematic_reader import SchematicReader
+from mcthings.world import World
+
+
+class RecordRenderer(Renderer):
+    """ Renderer recording the blocks rendered """
+
+    def __init__(self):
+        self.blocks = []
+
+    def render(self, blocks_memory):
+        self.blocks += [(block.pos.x, block.pos.y, block.pos.z, block.id, block.data)
+                        for block in blocks_memory.blocks]
+
+
+class TestSchematic(unittest.TestCase):
+    """Test Schematic"""
+
+    def setUp(self):
+        _parse_schematic.cache_clear()
+
+    @staticmethod
+    def create_schematic(file_path, position=Vec3(0, 0, 0)):
+        schematic = Schematic(position)
+        schematic.file_path = file_path
+        schematic.create()
+
+        return schematic
+
+    def test_parse_once(self):
+        # The same schematic pasted in a row of positions
+        for x in range(0, 5):
+            schematic = self.create_schematic("schematics/alien_engi1a.schematic", Vec3(x * 20, 0, 0))
+            schematic.find_bounding_box()
+
+        assert _parse_schematic.cache_info().misses == 1
+
+    def test_file_changed(self):
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "model.schematic")
+            shutil.copy("schematics/alien_engi1a.schematic", file_path)
+            alien = self.create_schematic(file_path)
+
+            cuboid = BlocksMemory()
+            cuboid.set_blocks(Vec3(0, 0, 0), Vec3(2, 3, 4), 1)
+            cuboid.to_schematic(file_path)
+            cuboid_schematic = self.create_schematic(file_path)
+
+            assert _parse_schematic.cache_info().misses == 2
+            assert alien.end_position != cuboid_schematic.end_position
+            assert cuboid_schematic.find_bounding_box() == cuboid.find_init_end_pos()
+
+    def test_lru(self):
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            for i in range(0, SCHEMATIC_CACHE_SIZE + 1):
+                file_path = os.path.join(schematic_dir, "model%i.schematic" % i)
+                shutil.copy("schematics/alien_engi1a.schematic", file_path)
+                self.create_schematic(file_path)
+
+            assert _parse_schematic.cache_info().currsize == SCHEMATIC_CACHE_SIZE
+
+            # The first schematic was evicted
+            self.create_schematic(os.path.join(schematic_dir, "model0.schematic"))
+            assert _parse_schematic.cache_info().misses == SCHEMATIC_CACHE_SIZE + 2
+
+    def test_reader_layers(self):
+        file_path = "schematics/alien_engi1a.schematic"
+        schematic = load_schematic(file_path)
+        reader = SchematicReader(file_path)
+
+        assert reader.size == schematic.size
+        for count in [1, 4]:
+            layers = list(reader.layers(count))
+            assert len(layers) == -(-schematic.size.y // count)
+            assert [layer[0] for layer in layers] == list(range(0, schematic.size.y, count))
+            assert (np.concatenate([layer[1] for layer in layers]) == schematic.block_ids).all()
+            assert (np.concatenate([layer[2] for layer in layers]) == schematic.block_data).all()
+
+    def test_build_stream_layers(self):
+        renderer = World.renderer
+        try:
+            World.renderer = RecordRenderer()
+            schematic = Schematic(Vec3(3, 4, 5))
+            schematic.file_path = "schematics/alien_engi1a.schematic"
+            schematic.build()
+            blocks = World.renderer.blocks
+
+            World.renderer = RecordRenderer()
+            stream_schematic = Schematic(Vec3(3, 4, 5))
+            stream_schematic.file_path = schematic.file_path
+            stream_schematic.stream_layers = 2
+            stream_schematic.build()
+
+            assert sorted(World.renderer.blocks) == sorted(blocks)
+            assert stream_schematic.end_position == schematic.end_position
+            assert stream_schematic._blocks_memory.is_empty()
+        finally:
+            World.renderer = renderer
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from mcpi.vec3 import Vec3
+from nbt import nbt
+
+from mcthings import schematic_formats
+from mcthings.block_names import block_name
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.schematic_formats import encode_varints, pack_bits
+from mcthings.vox import Vox
+
+
+class TestSchematicFormats(unittest.TestCase):
+    """Test the Sponge and Litematica schematic formats"""
+
+    @staticmethod
+    def load_vox():
+        vox = Vox(Vec3(0, 0, 0))
+        vox.file_path = "vox/alien_engi1a.vox"
+        vox.create()
+
+        return vox._blocks_memory
+
+    @staticmethod
+    def decode_varints(varints):
+        values = []
+        value = shift = 0
+        for byte in varints:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                values.append(value)
+                value = shift = 0
+        return values
+
+    @staticmethod
+    def unpack_bits(longs, bits, count):
+        packed = int.from_bytes(np.array(longs, dtype='<i8').tobytes(), 'little')
+        return [(packed >> (bits * i)) & ((1 << bits) - 1) for i in range(0, count)]
+
+    @staticmethod
+    def expected_names(mem):
+        init_pos, end_pos = mem.find_init_end_pos()
+        ids, data = mem.to_block_arrays(init_pos, end_pos)
+        # Blocks in x -> z -> y order
+        return [block_name(block_id, block_data) for block_id, block_data in
+                zip(ids.transpose(1, 2, 0).reshape(-1).tolist(), data.transpose(1, 2, 0).reshape(-1).tolist())]
+
+    def test_block_name(self):
+        assert block_name(0) == "minecraft:air"
+        assert block_name(35, 14) == "minecraft:red_wool"
+        assert block_name(17, 4 | 2) == "minecraft:birch_log"
+        assert block_name(1, 5) == "minecraft:andesite"
+        assert block_name(2000) == "minecraft:stone"
+
+    def test_encode_varints(self):
+        values = np.array([0, 1, 127, 128, 300, 16384, 2097151], dtype=np.uint32)
+        varints = encode_varints(values)
+        assert varints[3:5] == bytearray([0x80, 0x01])
+        assert self.decode_varints(varints) == values.tolist()
+        assert encode_varints(np.array([1, 2], dtype=np.uint32)) == bytearray([1, 2])
+
+    def test_pack_bits(self):
+        values = np.arange(0, 100) % 32
+        assert self.unpack_bits(pack_bits(values, 5), 5, 100) == values.tolist()
+        assert len(pack_bits(values, 5)) == 8  # 500 bits
+
+    def test_sponge(self):
+        mem = self.load_vox()
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "alien.schem")
+            mem.to_schematic(file_path)
+            schematic = nbt.NBTFile(file_path, 'rb')
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert (schematic["Width"].value, schematic["Height"].value, schematic["Length"].value) == \
+               tuple(end_pos - init_pos + Vec3(1, 1, 1))
+        palette = {tag.value: tag.name for tag in schematic["Palette"].tags}
+        assert schematic["PaletteMax"].value == len(palette)
+        names = [palette[index] for index in self.decode_varints(schematic["BlockData"].value)]
+        assert names == self.expected_names(mem)
+
+    def test_sponge_v3(self):
+        mem = self.load_vox()
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "alien.schem")
+            schematic_formats.SPONGE_VERSION = 3
+            try:
+                mem.to_schematic(file_path)
+            finally:
+                schematic_formats.SPONGE_VERSION = 2
+            schematic = nbt.NBTFile(file_path, 'rb')["Schematic"]
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert schematic["Version"].value == 3
+        assert (schematic["Width"].value, schematic["Height"].value, schematic["Length"].value) == \
+               tuple(end_pos - init_pos + Vec3(1, 1, 1))
+        blocks = schematic["Blocks"]
+        palette = {tag.value: tag.name for tag in blocks["Palette"].tags}
+        names = [palette[index] for index in self.decode_varints(blocks["Data"].value)]
+        assert names == self.expected_names(mem)
+
+    def test_litematic(self):
+        mem = self.load_vox()
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "alien.litematic")
+            mem.to_schematic(file_path)
+            schematic = nbt.NBTFile(file_path, 'rb')
+
+        region = schematic["Regions"]["mcthings"]
+        palette = [tag["Name"].value for tag in region["BlockStatePalette"].tags]
+        assert palette[0] == "minecraft:air"
+        bits = max(2, (len(palette) - 1).bit_length())
+        expected_names = self.expected_names(mem)
+        indexes = self.unpack_bits(region["BlockStates"].value, bits, len(expected_names))
+        assert [palette[index] for index in indexes] == expected_names
+        assert schematic["Metadata"]["TotalBlocks"].value == len([name for name in expected_names
+                                                                  if name != "minecraft:air"])
+
+    def test_big_ids(self):
+        mem = BlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(1, 1, 1), 300)
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            # Only the formats with a palette can store ids bigger than a byte
+            with self.assertRaises(RuntimeError):
+                mem.to_schematic(os.path.join(schematic_dir, "big.schematic"))
+            mem.to_schematic(os.path.join(schematic_dir, "big.schem"))
+
+    def test_uniform_size(self):
+        mem = BlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(31, 31, 31), 1)
+
+        sizes = {}
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            for extension in ["schematic", "schem", "litematic"]:
+                file_path = os.path.join(schematic_dir, "cube." + extension)
+                mem.to_schematic(file_path)
+                schematic = nbt.NBTFile(file_path, 'rb')
+                sizes[extension] = len(schematic["Regions"]["mcthings"]["BlockStates"].value) * 8 \
+                    if extension == "litematic" else len(schematic["BlockData" if extension == "schem" else "Blocks"])
+
+        # Two bits per block in Litematica format
+        assert sizes["litematic"] == 32 * 32 * 32 // 4
+        assert sizes["schem"] == sizes["schematic"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
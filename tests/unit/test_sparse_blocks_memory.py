@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import unittest
+
+from mcpi.vec3 import Vec3
+
+from mcthings.blocks_memory import BlocksMemory
+from mcthings.sparse_blocks_memory import SparseBlocksMemory, SECTION_SIZE
+from mcthings.vox import Vox
+
+
+class TestSparseBlocksMemory(unittest.TestCase):
+    """Test SparseBlocksMemory"""
+
+    @staticmethod
+    def load_vox(memory, position=Vec3(0, 0, 0)):
+        # Copy the blocks from a not cuboid vox model
+        alien = Vox(position)
+        alien.file_path = "vox/alien_engi1a.vox"
+        alien.create()
+        for block in alien._blocks_memory.blocks:
+            memory.set_block(Vec3(block.pos.x, block.pos.y, block.pos.z), block.id, block.data)
+
+        return memory
+
+    @staticmethod
+    def blocks_set(memory):
+        return set((b.pos.x, b.pos.y, b.pos.z, b.id, b.data) for b in memory.blocks)
+
+    def test_set_block(self):
+        mem = SparseBlocksMemory()
+        assert mem.find_init_end_pos() == (None, None)
+
+        mem.set_block(Vec3(1, 0, 0), 1, 0)
+        mem.set_block(Vec3(-5, 3, 100), 35, 14)
+        assert len(mem.blocks) == 2
+        # Only the sections with blocks are allocated
+        assert len(list(mem.iter_sections())) == 2
+
+        block = mem.find_block_at_pos(Vec3(-5, 3, 100))
+        assert block.id == 35 and block.data == 14
+        assert mem.find_block_at_pos(Vec3(0, 0, 0)) is None
+        assert mem.find_block_at_pos(Vec3(1000, 0, 0)) is None
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert init_pos == Vec3(-5, 0, 0)
+        assert end_pos == Vec3(1, 3, 100)
+
+    def test_set_blocks(self):
+        mem = SparseBlocksMemory()
+        # A cuboid crossing several sections
+        mem.set_blocks(Vec3(-3, 0, 10), Vec3(20, 1, 40), 1)
+        assert len(mem.blocks) == 24 * 2 * 31
+        assert mem.is_cuboid()
+        assert mem.memory_equal()
+
+        # The last block written in a position is the one kept
+        mem.set_blocks(Vec3(1, 0, 10), Vec3(1, 1, 11), 0)
+        assert len(mem.blocks) == 24 * 2 * 31
+        assert mem.find_block_at_pos(Vec3(1, 1, 11)).id == 0
+        assert not mem.memory_equal()
+
+        # The blocks of all the sections are compared
+        mem = SparseBlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(SECTION_SIZE, 0, 0), 1)
+        assert mem.memory_equal()
+        mem.set_block(Vec3(SECTION_SIZE, 0, 0), 1, 2)
+        assert not mem.memory_equal()
+
+    def test_iter_sections(self):
+        mem = SparseBlocksMemory()
+        mem.set_blocks(Vec3(0, 0, 0), Vec3(SECTION_SIZE * 2, SECTION_SIZE, 0), 1)
+
+        keys = [section.key for section in mem.iter_sections()]
+        assert keys == [(0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0), (1, 1, 0), (2, 1, 0)]
+
+        section = next(mem.iter_sections())
+        init_pos, end_pos = section.find_init_end_pos()
+        assert init_pos == Vec3(0, 0, 0)
+        assert end_pos == Vec3(SECTION_SIZE - 1, SECTION_SIZE - 1, 0)
+        assert section.count() == SECTION_SIZE * SECTION_SIZE
+
+    def test_rotate(self):
+        for degrees in [90, 180, 270]:
+            mem = self.load_vox(BlocksMemory())
+            sparse_mem = self.load_vox(SparseBlocksMemory())
+
+            mem.rotate(degrees, Vec3(3, 0, 2))
+            sparse_mem.rotate(degrees, Vec3(3, 0, 2))
+
+            assert self.blocks_set(mem) == self.blocks_set(sparse_mem)
+            assert mem.find_init_end_pos() == sparse_mem.find_init_end_pos()
+
+    def test_flip_x(self):
+        for position in [Vec3(0, 0, 0), Vec3(4, 0, 0), Vec3(30, 0, 0)]:
+            mem = self.load_vox(BlocksMemory())
+            sparse_mem = self.load_vox(SparseBlocksMemory())
+
+            mem.flip_x(position)
+            sparse_mem.flip_x(position)
+
+            assert mem.find_init_end_pos() == sparse_mem.find_init_end_pos()
+
+    def test_flip_y_z_translate(self):
+        position = Vec3(4, 5, 3)
+        mem = self.load_vox(BlocksMemory(final_state=True))
+        sparse_mem = self.load_vox(SparseBlocksMemory())
+
+        for memory in [mem, sparse_mem]:
+            memory.flip_y(position)
+            memory.flip_z(position)
+            memory.translate(Vec3(-SECTION_SIZE - 1, 2, 5))
+
+        assert self.blocks_set(mem) == self.blocks_set(sparse_mem)
+
+    def test_to_nbt(self):
+        position = Vec3(-10, 5, -20)
+        mem = self.load_vox(BlocksMemory(), position)
+        sparse_mem = self.load_vox(SparseBlocksMemory(), position)
+
+        init_pos, end_pos = mem.find_init_end_pos()
+        assert mem.to_nbt(init_pos, end_pos) == sparse_mem.to_nbt(init_pos, end_pos)
+
+    def test_set_arrays(self):
+        position = Vec3(-10, 5, -20)
+        mem = self.load_vox(BlocksMemory(final_state=True), position)
+        init_pos, end_pos = mem.find_init_end_pos()
+        ids, data = mem.to_arrays(init_pos, end_pos)
+
+        sparse_mem = SparseBlocksMemory()
+        sparse_mem.set_arrays(init_pos, ids, data)
+
+        assert sparse_mem.find_init_end_pos() == (init_pos, end_pos)
+        assert len(sparse_mem.blocks) == len(mem.blocks)
+        sparse_ids, sparse_data = sparse_mem.to_arrays(init_pos, end_pos)
+        assert (sparse_ids == ids).all() and (sparse_data == data).all()
+
+    def test_diff(self):
+        old_mem = SparseBlocksMemory()
+        old_mem.set_blocks(Vec3(0, 0, 0), Vec3(SECTION_SIZE, 1, 1), 1)
+        empty_mem = SparseBlocksMemory()
+        empty_mem.set_blocks(Vec3(0, 0, 0), Vec3(SECTION_SIZE, 1, 1), 0)
+
+        # The cuboid moved one block in the x axis
+        new_mem = SparseBlocksMemory()
+        new_mem.set_blocks(Vec3(1, 0, 0), Vec3(SECTION_SIZE + 1, 1, 1), 1)
+
+        diff_mem = new_mem.diff(old_mem, empty_mem)
+
+        assert len(diff_mem.blocks) == 8
+        assert diff_mem.find_init_end_pos() == (Vec3(0, 0, 0), Vec3(SECTION_SIZE + 1, 1, 1))
+        assert diff_mem.find_block_at_pos(Vec3(0, 1, 1)).id == 0
+        assert diff_mem.find_block_at_pos(Vec3(SECTION_SIZE + 1, 1, 1)).id == 1
+        assert diff_mem.find_block_at_pos(Vec3(1, 1, 1)) is None
+
+        assert new_mem.diff(new_mem, empty_mem).is_empty()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
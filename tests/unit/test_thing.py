@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# Licensed under the terms of http://www.apache.org/licenses/LICENSE-2.0
+# Author (©): Alvaro del Castillo
+
+import logging
+import os
+import tempfile
+import unittest
+
+import mcpi.block
+from mcpi.vec3 import Vec3
+
+from mcthings.building import Building
+from mcthings.decorators.light_decorator import LightDecorator
+from mcthings.house import House
+from mcthings.line import Line
+from mcthings.renderers.memory import MemoryRenderer
+from mcthings.renderers.renderer import Renderer
+from mcthings.scene import Scene
+from mcthings.schematic import Schematic
+from mcthings.wall import Wall
+from mcthings.world import World
+
+
+class WorldRenderer(Renderer):
+    """ Renderer keeping the rendered blocks in a dict """
+
+    def __init__(self):
+        self.world = {}
+        self.rendered = 0
+
+    def render(self, blocks_memory):
+        for block in blocks_memory.blocks:
+            self.world[(block.pos.x, block.pos.y, block.pos.z)] = block.id
+            self.rendered += 1
+
+    def blocks(self):
+        return {pos for pos, block_id in self.world.items() if block_id != 0}
+
+
+class TestThing(unittest.TestCase):
+    """Test Thing"""
+
+    def setUp(self):
+        self.renderer = World.renderer
+        World.renderer = WorldRenderer()
+        self.scene = Scene()
+
+    def tearDown(self):
+        World.renderer = self.renderer
+        World.scenes.remove(self.scene)
+
+    def test_move(self):
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        wall.build()
+        World.renderer.rendered = 0
+
+        wall.move(Vec3(1, 0, 0))
+
+        # Only the removed and the new columns are rendered
+        assert World.renderer.rendered == 2 * wall.height * wall.width
+
+        moved_wall = Wall(Vec3(1, 0, 0), scene=self.scene)
+        moved_wall.create()
+        assert World.renderer.blocks() == {(block.pos.x, block.pos.y, block.pos.z)
+                                           for block in moved_wall._blocks_memory.blocks}
+
+    def test_move_schematic(self):
+        schematic = Schematic(Vec3(0, 0, 0), scene=self.scene)
+        schematic.file_path = "schematics/alien_engi1a.schematic"
+        schematic.build()
+        World.renderer.rendered = 0
+
+        schematic.move(Vec3(1, 0, 0))
+
+        # Only the blocks that change are rendered
+        assert World.renderer.rendered < len(schematic._blocks_memory.blocks)
+        moved_blocks = World.renderer.blocks()
+
+        # The streamed schematics are unbuilt and built again
+        World.renderer = WorldRenderer()
+        streamed = Schematic(Vec3(0, 0, 0), scene=self.scene)
+        streamed.file_path = schematic.file_path
+        streamed.stream_layers = 2
+        streamed.build()
+        assert streamed._blocks_memory.is_empty()
+
+        streamed.move(Vec3(1, 0, 0))
+
+        assert World.renderer.blocks() == moved_blocks
+
+    def test_move_line(self):
+        World.renderer = MemoryRenderer()
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        line = Line(Vec3(0, wall.height, 0), scene=self.scene)
+        line.block = mcpi.block.STONE
+        wall.build()
+        line.build()
+
+        # The new position overlaps the old one: the Line must not read its own blocks
+        line.move(Vec3(1, wall.height, 0))
+
+        assert line._block_empty.id == wall.block.id
+        assert World.renderer.get_block(Vec3(0, wall.height - 1, 0)) == wall.block.id
+        assert World.renderer.get_block(Vec3(1, wall.height - 1, 0)) == mcpi.block.STONE.id
+
+    def test_scene_move(self):
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        wall_top = Wall(Vec3(0, wall.height, 0), scene=self.scene)
+        self.scene.build()
+        World.renderer.rendered = 0
+
+        self.scene.move(Vec3(0, 1, 0))
+
+        assert World.renderer.rendered == 2 * wall.length * wall.width
+        assert wall_top.position == Vec3(0, wall.height + 1, 0)
+        assert self.scene.position == Vec3(0, 1, 0)
+        assert min(pos[1] for pos in World.renderer.blocks()) == 1
+
+    def test_scene_move_line(self):
+        World.renderer = MemoryRenderer()
+        wall = Wall(Vec3(0, 0, 0), scene=self.scene)
+        line = Line(Vec3(0, wall.height, 0), scene=self.scene)
+        line.block = mcpi.block.STONE
+        self.scene.build()
+        assert line._block_empty.id == wall.block.id
+
+        self.scene.move(Vec3(20, 0, 0))
+
+        # The Line reads the land from the Wall already moved
+        assert line._block_empty.id == wall.block.id
+        assert World.renderer.get_block(Vec3(20, wall.height - 1, 0)) == mcpi.block.STONE.id
+        assert World.renderer.get_block(Vec3(20, 0, 0)) == wall.block.id
+        assert World.renderer.get_block(Vec3(0, 0, 0)) == mcpi.block.AIR.id
+
+    def test_save_load_memory(self):
+        building = Building(Vec3(0, 0, 0), scene=self.scene)
+        building.create()
+
+        with tempfile.TemporaryDirectory() as memory_dir:
+            file_path = os.path.join(memory_dir, "building.mem")
+            building.save_memory(file_path)
+
+            cached_building = Building(Vec3(10, 0, 0), scene=self.scene)
+            cached_building.load_memory(file_path)
+
+        building.move(Vec3(10, 0, 0))
+        snapshot = building.memory_snapshot()
+        cached_snapshot = cached_building.memory_snapshot()
+        assert cached_snapshot.find_init_end_pos() == snapshot.find_init_end_pos()
+        assert len(cached_snapshot.blocks) == len(snapshot.blocks)
+
+    def test_to_schematic_decorators(self):
+        World.renderer = MemoryRenderer()
+        house = House(Vec3(0, 0, 0), scene=self.scene)
+        house.add_decorator(LightDecorator)
+        house.build()
+        house.decorate()
+
+        with tempfile.TemporaryDirectory() as schematic_dir:
+            file_path = os.path.join(schematic_dir, "house.schematic")
+            world_blocks = house.to_schematic(file_path)["Blocks"].value
+            memory_blocks = house.to_schematic(file_path, from_memory=True)["Blocks"].value
+            scene_blocks = self.scene.to_schematic(file_path, from_memory=True)["Blocks"].value
+
+        # The torch of the decorator is exported from the world and from memory
+        assert world_blocks.count(mcpi.block.TORCH.id) == 1
+        assert len(world_blocks) - world_blocks.count(0) == \
+            len([block for block in house.memory_snapshot(decorations=True).blocks if block.id])
+        assert memory_blocks == world_blocks
+        assert scene_blocks == world_blocks
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    unittest.main(warnings='ignore')
@@ -6,12 +6,16 @@
 import logging
 import unittest
 
+import numpy as np
 from mcpi.vec3 import Vec3
 from nbt import nbt
 
 from mcthings.blocks import Blocks
+from mcthings.dense_blocks_memory import DenseBlocksMemory
+from mcthings.renderers.memory import MemoryRenderer
 from mcthings.schematic import Schematic
-from mcthings.utils import find_min_max_cuboid_vertex, size_region
+from mcthings.utils import extract_region, find_min_max_cuboid_vertex, size_region
+from mcthings.world import World
 
 
 class TestUtils(unittest.TestCase):
@@ -33,6 +37,30 @@ class TestUtils(unittest.TestCase):
         assert v_min == Vec3(0, 0, 0)
         assert v_max == Vec3(1, 1, 1)
 
+    def test_extract_region(self):
+        renderer = World.renderer
+        World.renderer = MemoryRenderer()
+        try:
+            ids = np.arange(0, 2 * 3 * 4, dtype=np.uint16).reshape(2, 3, 4)
+            memory = DenseBlocksMemory()
+            memory.set_arrays(Vec3(1, 2, 3), ids, np.zeros(ids.shape, dtype=np.uint8))
+            World.renderer.render(memory)
+
+            blocks_bytes, data_bytes = extract_region(Vec3(1, 2, 3), Vec3(2, 4, 6))
+
+            # The ids must fit in one byte
+            big_id_memory = DenseBlocksMemory()
+            big_id_memory.set_block(Vec3(1, 2, 3), 300)
+            World.renderer.render(big_id_memory)
+            with self.assertRaises(RuntimeError):
+                extract_region(Vec3(1, 2, 3), Vec3(2, 4, 6))
+        finally:
+            World.renderer = renderer
+
+        # Schematic order: x -> z -> y
+        assert blocks_bytes == bytearray(ids.transpose(1, 2, 0).astype(np.uint8).tobytes())
+        assert data_bytes == bytearray(ids.size)
+
     def test_size_region(self):
         # Load a schematic file with a know size and check this method
         schematic = Schematic(Vec3(0, 0, 0))
@@ -4,16 +4,72 @@
 # Author (©): Alvaro del Castillo
 
 import logging
+import os
+import struct
+import tempfile
 import unittest
 
+import mcpi.block
+import numpy as np
 from mcpi.vec3 import Vec3
+from nbt import nbt
 
-from mcthings.vox import Vox
+from mcthings.color_quantizer import CONCRETE
+from mcthings.vox import Vox, VOXEL_DTYPE, vox_rotation, nearest_colors
+
+
+def vox_chunk(chunk_id, content=b"", children=b""):
+    return chunk_id + struct.pack("<ii", len(content), len(children)) + content + children
+
+
+def vox_dict(entries):
+    content = struct.pack("<i", len(entries))
+    for key, value in entries.items():
+        for string in [key, value]:
+            content += struct.pack("<i", len(string)) + string.encode("utf-8")
+    return content
+
+
+def vox_transform(node_id, child_id, layer_id, frame):
+    return vox_chunk(b"nTRN", struct.pack("<i", node_id) + vox_dict({}) +
+                     struct.pack("<4i", child_id, -1, layer_id, 1) + vox_dict(frame))
+
+
+def vox_shape(node_id, model_id):
+    return vox_chunk(b"nSHP", struct.pack("<i", node_id) + vox_dict({}) +
+                     struct.pack("<ii", 1, model_id) + vox_dict({}))
+
+
+def write_vox_scene(file_path, translation="10 0 0", root_frame=None):
+    """ Two models in a scene graph: model 1 placed twice, the second time in a hidden layer """
+
+    chunks = b""
+    for voxels in [[(0, 0, 0, 1)], [(0, 0, 0, 2), (1, 0, 0, 2)]]:
+        chunks += vox_chunk(b"SIZE", struct.pack("<3i", 2, 2, 2))
+        chunks += vox_chunk(b"XYZI", struct.pack("<i", len(voxels)) +
+                            b"".join(struct.pack("<4B", *voxel) for voxel in voxels))
+    chunks += vox_transform(0, 1, -1, root_frame or {})
+    chunks += vox_chunk(b"nGRP", struct.pack("<i", 1) + vox_dict({}) + struct.pack("<4i", 3, 2, 4, 6))
+    chunks += vox_transform(2, 3, 0, {})
+    chunks += vox_shape(3, 0)
+    chunks += vox_transform(4, 5, 0, {"_t": translation, "_r": "1"})
+    chunks += vox_shape(5, 1)
+    chunks += vox_transform(6, 7, 1, {"_t": "20 0 0"})
+    chunks += vox_shape(7, 1)
+    chunks += vox_chunk(b"LAYR", struct.pack("<i", 0) + vox_dict({}) + struct.pack("<i", -1))
+    chunks += vox_chunk(b"LAYR", struct.pack("<i", 1) + vox_dict({"_hidden": "1"}) + struct.pack("<i", -1))
+
+    with open(file_path, "wb") as vox_file:
+        vox_file.write(b"VOX " + struct.pack("<i", 150) + vox_chunk(b"MAIN", children=chunks))
 
 
 class TestVox(unittest.TestCase):
     """Test Vox Thing"""
 
+    @staticmethod
+    def blocks_set(vox):
+        return set((b.pos.x, b.pos.y, b.pos.z, b.id, b.data) for b in vox._blocks_memory.blocks)
+
     def test_parse_vox_file(self):
 
         # Old format
@@ -66,6 +122,147 @@ class TestVox(unittest.TestCase):
         assert color.hex_str == 'ee0000ff'
         assert color.minecraft() == 14  # red
 
+    def test_palette_blocks(self):
+        vox = Vox(Vec3(0, 0, 0))
+        vox.file_path = "vox/vxs.vox"
+        vox.parse_vox_file()
+
+        # The block of all the palette colors is found at once
+        block_ids, block_data = vox.palette_blocks()
+        assert len(block_ids) == len(block_data) == len(vox.palette)
+        for color_index in [0, 10, 100]:
+            assert block_data[color_index] == vox.palette[color_index].minecraft()
+
+        vox.color_block = CONCRETE
+        vox.parse_vox_file()
+        block_ids, block_data = vox.palette_blocks()
+        assert block_ids[vox.voxels[0].color_index] == CONCRETE.id
+        assert block_data[vox.voxels[0].color_index] == 14  # red
+
+    def test_nearest_colors(self):
+        colors = np.array([[0xe4, 0xe4, 0xe4], [0x18, 0x14, 0x14], [0xff, 0x00, 0x00]])
+        assert nearest_colors(colors).tolist() == [0, 15, 14]
+        assert nearest_colors(colors, mcpi.block.STAINED_GLASS).tolist() == [0, 15, 14]
+
+    def test_voxels_array(self):
+        vox = Vox(Vec3(0, 0, 0))
+        vox.file_path = "vox/alien_engi1a.vox"
+        vox.parse_vox_file()
+
+        # The voxels are decoded in a numpy record array
+        assert vox.voxels.dtype == VOXEL_DTYPE
+        assert vox.voxels.color_index.min() >= 0
+        assert vox.voxels.x.max() < 256
+
+    def test_bad_file(self):
+        with tempfile.TemporaryDirectory() as vox_dir:
+            file_path = os.path.join(vox_dir, "bad.vox")
+            with open(file_path, "wb") as vox_file:
+                vox_file.write(b"VOX " + struct.pack("<i", 150) + b"MAIN" + struct.pack("<ii", 0, 100))
+
+            vox = Vox(Vec3(0, 0, 0))
+            vox.file_path = file_path
+            with self.assertRaises(RuntimeError):
+                vox.parse_vox_file()
+
+    def test_scene_graph(self):
+        with tempfile.TemporaryDirectory() as vox_dir:
+            file_path = os.path.join(vox_dir, "scene.vox")
+            write_vox_scene(file_path)
+
+            vox = Vox(Vec3(0, 0, 0))
+            vox.file_path = file_path
+            vox.create()
+
+            # The model in the hidden layer is not created
+            assert len(vox.models) == 2
+            assert [instance.model_index for instance in vox.instances] == [0, 1]
+            assert vox._blocks_memory.find_block_at_pos(Vec3(0, 0, 0)) is not None
+            # Model 1 is rotated (x -> y) and translated
+            assert vox._blocks_memory.find_block_at_pos(Vec3(10, 0, 0)) is not None
+            assert vox._blocks_memory.find_block_at_pos(Vec3(10, 0, 1)) is not None
+            assert vox._blocks_memory.find_block_at_pos(Vec3(11, 0, 0)) is None
+            assert vox._blocks_memory.find_block_at_pos(Vec3(20, 0, 0)) is None
+
+    def test_negative_translation(self):
+        with tempfile.TemporaryDirectory() as vox_dir:
+            file_path = os.path.join(vox_dir, "scene.vox")
+            write_vox_scene(file_path, translation="-10 0 0")
+
+            vox = Vox(Vec3(0, 0, 0))
+            vox.file_path = file_path
+            vox.create()
+
+            # The position is not changed by the model translated before it
+            assert vox.position == Vec3(0, 0, 0)
+            assert vox._blocks_memory.find_block_at_pos(Vec3(0, 0, 0)) is not None
+            assert vox._blocks_memory.find_block_at_pos(Vec3(-10, 0, 0)) is not None
+            assert vox.find_bounding_box()[0].x == -10
+
+            schematic_path = os.path.join(vox_dir, "scene.schematic")
+            vox.to_schematic(schematic_path, from_memory=True)
+            schematic = nbt.NBTFile(schematic_path, 'rb')
+            assert schematic["Width"].value == vox.end_position.x + 10 + 1
+            assert len([block for block in schematic["Blocks"].value if block]) == 3
+
+            # Creating it again keeps the blocks in the same place
+            blocks = self.blocks_set(vox)
+            vox.reset()
+            vox.create()
+            assert vox.position == Vec3(0, 0, 0)
+            assert self.blocks_set(vox) == blocks
+
+    def test_scene_position(self):
+        # The first model of the scene is built in the same place than the files without scene graph
+        position = Vec3(5, 2, -3)
+        for file_path in ["vox/alien_engi1a.vox", "vox/chr_beardo3-default-palette.vox", "vox/vxs.vox"]:
+            vox = Vox(position)
+            vox.file_path = file_path
+            vox.create()
+
+            assert vox.position == position
+            expected = set((position.x + int(voxel.x), position.y + int(voxel.z), position.z + int(voxel.y))
+                           for voxel in vox.voxels)
+            assert set((block.pos.x, block.pos.y, block.pos.z) for block in vox._blocks_memory.blocks) == expected
+
+        # Transforms of the first node, rotation included, don't move the blocks
+        with tempfile.TemporaryDirectory() as vox_dir:
+            blocks = []
+            for root_frame in [{}, {"_t": "7 -3 2"}, {"_t": "7 -3 2", "_r": "17"}]:
+                file_path = os.path.join(vox_dir, "scene.vox")
+                write_vox_scene(file_path, root_frame=root_frame)
+                vox = Vox(position)
+                vox.file_path = file_path
+                vox.create()
+                assert vox.position == position
+                assert vox._blocks_memory.find_block_at_pos(position) is not None
+                blocks.append(self.blocks_set(vox))
+
+            assert blocks[0] == blocks[1] == blocks[2]
+
+    def test_lazy_models(self):
+        with tempfile.TemporaryDirectory() as vox_dir:
+            file_path = os.path.join(vox_dir, "scene.vox")
+            write_vox_scene(file_path)
+
+            vox = Vox(Vec3(0, 0, 0))
+            vox.file_path = file_path
+            vox.model_indexes = [1]
+            vox.create()
+
+            # Only the requested models are decoded
+            assert vox.models[0]._voxels is None
+            assert vox._blocks_memory.find_block_at_pos(Vec3(0, 0, 0)) is None
+
+            model_memory = vox.model_memory(1)
+            assert model_memory is vox.model_memory(1)
+            assert model_memory.find_block_at_pos(Vec3(1, 0, 0)) is not None
+            assert model_memory.find_init_end_pos() == (Vec3(0, 0, 0), Vec3(1, 0, 0))
+
+    def test_vox_rotation(self):
+        assert (vox_rotation(4) == [[1, 0, 0], [0, 1, 0], [0, 0, 1]]).all()
+        assert (vox_rotation(1 | 16) == [[0, -1, 0], [1, 0, 0], [0, 0, 1]]).all()
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')